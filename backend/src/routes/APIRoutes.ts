@@ -247,9 +247,10 @@ router.post("/search/query-summary", async (req: Request, res: Response): Promis
     }
 
     // update articles with scraped content in database
-    const bulkOperations = enriched_articles.map((article: any) => ({
+    // (articles python didn't fetch a body for come back without "content")
+    const bulkOperations = enriched_articles.filter((article: any) => article.content).map((article: any) => ({
         updateOne: {
-            filter: { url: article.url, content: "" },
+            filter: { url: article.url, content: { $in: [null, ""] } },
             update: { $set: { content: article.content } },
             upsert: false // don't create a new document if it doesn't exist
         }
@@ -822,9 +823,10 @@ router.post('/summarize/articles', async (req: Request, res: Response): Promise<
         const { title, summary, enriched_articles } = response.data;
 
         // update articles with scraped content in database
-        const bulkOperations = enriched_articles.map((article: any) => ({
+        // (articles python didn't fetch a body for come back without "content")
+        const bulkOperations = enriched_articles.filter((article: any) => article.content).map((article: any) => ({
             updateOne: {
-                filter: { url: article.url, content: { $exists: false } },
+                filter: { url: article.url, content: { $in: [null, ""] } },
                 update: { $set: { content: article.content } },
                 upsert: false
             }
@@ -1,43 +1,86 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, Response, stream_with_context
 import os
-from utils.openai_utils import generate_summary_individual, generate_summary_collection, daily_news_summary, generate_podcast_collection, generate_audio_from_article, filter_irrelevant_articles
+from utils.openai_utils import generate_summary_individual, generate_summary_collection, generate_audio_from_article, stream_audio_from_article, filter_irrelevant_articles
 from utils.newsapi import user_search, get_sources, fetch_search_results, get_topics_articles
-from utils.exa import get_contents
+from utils.exa import get_contents, backfill_contents, content_cache
 from utils.crawl import crawl_all as daily_crawl_all
 from utils.crawl import crawl_location as daily_crawl_location
-from utils.features import get_source_and_bias, char_length, estimate_reading_time
+from utils.enrichment import ENRICHED_FIELDS
 from collections import Counter
 import logging
 import json
-import pandas as pd
 import re
-from datetime import datetime
+import time
 from threading import Thread
-from utils.dashboard_topics import news_pipeline
+from utils.digest import build_digest, get_digest
+from utils.prompt_budget import build_articles_prompt, default_priorities, COLLECTION_TOKEN_BUDGET
+from utils.compression import compress_articles
+from utils.prompt_templates import get_usage_stats
+from utils.openai_governor import governor, LLMError, LLMRateLimitError
+from utils.podcast_jobs import podcast_jobs, DONE, FAILED
+from utils.audio_delivery import serve_audio_file
+from utils.vector_index import rerank, vector_index
+from utils.relevance import rank_relevant, LLM_FALLBACK
+from utils.storage import snapshot_age, snapshot_info
+from utils.ttl_cache import TTLCache
+from utils.responses import OrjsonProvider, shape_options, shape_articles, shape_clusters, paginate, compress_response
+from utils.search_index import find_article
+from utils.http_cache import (conditional_response, DAILY_NEWS_CACHE_CONTROL, LOCAL_NEWS_CACHE_CONTROL,
+                              LOCAL_SEARCH_CACHE_CONTROL, SOURCES_CACHE_CONTROL, TOPICS_CACHE_CONTROL, NO_STORE, Uncacheable)
 
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.logger.setLevel(logging.DEBUG)
 
+# NewsAPI results for cities without local sources, per city
+LOCAL_FALLBACK_TTL = int(os.environ.get("BITEWISE_LOCAL_FALLBACK_TTL", "1800"))
+local_fallback_cache = TTLCache(ttl=LOCAL_FALLBACK_TTL)
+# NewsAPI's source list barely changes; one fetch a day
+sources_cache = TTLCache(ttl=24 * 3600, maxsize=4)
+
 @app.before_request
 def log_request_info():
     logging.debug(f"Headers: {request.headers}")
     logging.debug(f"Body: {request.data}")
 
-@app.route('/daily-news', methods=['POST'])
+@app.after_request
+def compress(response):
+    return compress_response(response, request.headers.get("Accept-Encoding"))
+
+# model provider failures surface as typed errors instead of being parsed as summaries
+@app.errorhandler(LLMError)
+def handle_llm_error(error):
+    app.logger.error(f"LLM call failed: {error}")
+    response = jsonify({"error": str(error)})
+    response.status_code = error.status_code
+    if isinstance(error, LLMRateLimitError) and error.retry_after:
+        response.headers["Retry-After"] = str(int(error.retry_after) + 1)
+    return response
+
+# options come from the JSON body on POST and the query string on GET
+def request_data():
+    if request.method == 'GET':
+        return request.args.to_dict()
+    return request.get_json(silent=True) or {}
+
+# GET as well as POST so browsers and intermediary caches can reuse responses
+@app.route('/daily-news', methods=['GET', 'POST'])
 def refresh_daily_news():
-    last_modified_timestamp = os.path.getmtime("data/articles_data.json")
-    last_modified_date = datetime.fromtimestamp(last_modified_timestamp)
-    current_time = datetime.now()
-    time_difference = current_time - last_modified_date
-    if time_difference.total_seconds() > 12 * 3600:
+    # age of the published snapshot, shared by every node
+    age = snapshot_age("articles_data.json")
+    if age is None or age > 12 * 3600:
         Thread(target=daily_crawl_all).start()
-        return jsonify({"message": "Crawl initiated"}), 202
-    return refresh_helper()
-
-@app.route('/local-news', methods=['POST'])
+        response = jsonify({"message": "Crawl initiated"})
+        response.headers["Cache-Control"] = NO_STORE
+        return response, 202
+    options = shape_options(request_data())
+    version = snapshot_info("articles_data.json")["version"]
+    return conditional_response(("daily-news", version, options), DAILY_NEWS_CACHE_CONTROL, lambda: refresh_helper(options=options))
+
+@app.route('/local-news', methods=['GET', 'POST'])
 def refresh_local_news():
-    data = request.get_json()
+    data = request_data()
     city = data.get("location", None)
     print("city: ", city)
     if not city:
@@ -48,81 +91,69 @@ def refresh_local_news():
         local_sources_data = json.load(file)
     if city not in local_sources_data.keys():
         app.logger.info(f"City '{city}' not found in local sources, using search route.")
-        search_preferences = {
-            "from_date": "",
-            "to_date": "",
-            "read_time": [],
-            "bias": [],
-            "clustering": False,
-        }
-        search_results = user_search(question=city, user_preferences=search_preferences)
-        formatted_results = []
-        for item in search_results:
-            formatted_results.append({
-                "url": item["url"],
-                "title": item["title"],
-                "source": item["source"]["name"],
-                "content": item["content"],
-                "imageUrl": item.get("urlToImage", ""),
-                "authors": [item["author"]] if item["author"] else [],
-                "time": item.get("publishedAt", "unknown")
-            })
-        with open("data/search_results.json", "w", encoding="utf-8") as file:
-            json.dump(formatted_results, file, ensure_ascii=False, indent=4)
-        return refresh_helper('search_results.json')
+        # the fetch time versions the cache entry, and with it the response's ETag
+        fetched_at, formatted_results = local_fallback_cache.get_or_set(city.strip().lower(), lambda: (time.time(), fetch_city_articles(city)))
+        options = shape_options(data)
+        # records go straight to clustering; no shared file, so concurrent cities can't mix
+        return conditional_response(("local-news", "search", city.strip().lower(), fetched_at, options), LOCAL_SEARCH_CACHE_CONTROL,
+                                    lambda: refresh_helper(articles=formatted_results, options=options))
     else:
-        last_modified_timestamp = os.path.getmtime("data/local_articles_data.json")
-        last_modified_date = datetime.fromtimestamp(last_modified_timestamp)
-        current_time = datetime.now()
-        time_difference = current_time - last_modified_date
-        if time_difference.total_seconds() > 12 * 3600:
+        age = snapshot_age("local_articles_data.json")
+        if age is None or age > 12 * 3600:
             Thread(target=daily_crawl_location).start()
-        return refresh_helper('local_articles_data.json', city)
+        options = shape_options(data)
+        info = snapshot_info("local_articles_data.json")
+        return conditional_response(("local-news", info and info["version"], city, options), LOCAL_NEWS_CACHE_CONTROL,
+                                    lambda: refresh_helper('local_articles_data.json', city, options=options))
+
+# search results for a city, in the crawl snapshot's record format
+def fetch_city_articles(city):
+    search_preferences = {
+        "from_date": "",
+        "to_date": "",
+        "read_time": [],
+        "bias": [],
+        "clustering": False,
+    }
+    search_results = user_search(question=city, user_preferences=search_preferences)
+    formatted_results = []
+    for item in search_results:
+        formatted_results.append({
+            "url": item["url"],
+            "title": item["title"],
+            "source": item["source"]["name"],
+            "content": item["content"],
+            "imageUrl": item.get("urlToImage", ""),
+            "authors": [item["author"]] if item["author"] else [],
+            "time": item.get("publishedAt", "unknown"),
+            # already enriched by user_search
+            **{field: item[field] for field in ENRICHED_FIELDS if field in item},
+        })
+    return formatted_results
 
 # helper function to refresh news and cluster to find main topics
-def refresh_helper(file_path='articles_data.json', city=None):
-    # get filepath for daily newws data
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    json_file_path = os.path.join(current_dir, 'data', file_path)
-
-    # get trending topics
-    cluster_dict = news_pipeline(json_file_path, city)
-
-    # add additional information (source, bias, readtime)
-    for cluster_id, articles in cluster_dict["clustered_articles"].items():
-        for article in articles:
-            # source and bias
-            article["source"], article["biasRating"] = get_source_and_bias(article.get("source", {}))
-            article["readTime"] = estimate_reading_time(char_length(article.get("content", None)))
-
-    # take 3 articles from each cluster for overall summary
-    top_clusters = sorted(cluster_dict["clustered_articles"].items(), key=lambda x: len(x[1]), reverse=True)
-    top_articles = []
-    max_articles_per_cluster = 3
-    for cluster, articles in top_clusters:
-        print(f"Cluster ID: {cluster}, Articles Count: {len(articles)}")
-        top_articles.extend(articles[:max_articles_per_cluster])
-
-    # **Generate summary from daily news articles**
-    articles_text = "\n\n".join([
-        f"### {article.get('title', 'Untitled')} ###\n{article.get('content', '')}" for article in top_articles
-    ])
-
-    daily_summary = daily_news_summary(articles_text)  # Calling the summary function
+def refresh_helper(file_path='articles_data.json', city=None, articles=None, options=None):
+    if articles is not None:
+        digest = build_digest(articles, city)
+    else:
+        # clustered and summarized once per snapshot version, by whichever node crawled it
+        digest = get_digest(file_path, city)
+        if digest is None:
+            # being built in the background; not cached, so the client's retry gets it once ready
+            return jsonify({"message": "Summarizing the latest crawl"}), 202
 
     # **Build the final response**
+    clusters, pagination = shape_clusters(digest["clusters"], options or shape_options(None))
     response = {
-        "overall_summary": daily_summary.to_dict() if isinstance(daily_summary, pd.Series) else daily_summary,
-        "clusters": [
-            {
-                "cluster_id": cluster_id,
-                "title": cluster_articles[0].get("title", "Untitled"),  
-                "articles": [article.to_dict() if isinstance(article, pd.Series) else article for article in cluster_articles]
-            }
-            for cluster_id, cluster_articles in top_clusters
-        ]
+        "overall_summary": digest["overall_summary"],
+        "clusters": clusters
     }
+    if pagination:
+        response["pagination"] = pagination
 
+    if digest.get("summary_failed"):
+        # served, but not kept under the snapshot's tag
+        raise Uncacheable(jsonify(response))
     return jsonify(response)  
 
 
@@ -141,31 +172,54 @@ def search():
         
         search_results = user_search(query, search_preferences)
         search_results = [] if search_results is None else search_results
+        search_results = rerank(query, search_results)
         if len(search_results) > 0:
             print("search results not empty")
         else:
             print ("search results empty")
         
+        options = shape_options(data)
+        page, pagination = paginate(search_results, options["page"], options["page_size"])
         response = {
             "query": query,
-            "results": search_results,
+            "results": shape_articles(page, options),
         }
+        if pagination:
+            response["pagination"] = pagination
 
         return jsonify(response), 200
     except Exception as e:
         app.logger.error(f"Unexpected error: {str(e)}")
         return {"error": "Internal Server Error"}, 500
 
+# one article's full body, for clients that loaded the dashboard in summary mode
+@app.route('/article', methods=['GET'])
+def article_body():
+    url = request.args.get("url")
+    if not url or not url.startswith(("http://", "https://")):
+        return jsonify({"error": "An http(s) url is required"}), 400
+    # only bodies we already hold; fetching arbitrary caller-supplied urls would make this an open proxy
+    article = find_article(url) or content_cache.get(url)
+    if article is None:
+        return jsonify({"error": "Article not found"}), 404
+    return jsonify({"url": url, "title": article.get("title"), "content": article.get("content") or ""}), 200
+
 # this will only be called once to get sources
-@app.route('/sources', methods=['POST'])
+@app.route('/sources', methods=['GET', 'POST'])
 def headline_sources():
     filename = "data/sources.json"
-    response_sources = get_sources(filename)
+    fetched_at, response_sources = sources_cache.get_or_set("us", lambda: (time.time(), get_sources()))
+    if response_sources is None:
+        # NewsAPI failed; try again on the next call rather than serving the failure all day
+        sources_cache.clear()
+        response = jsonify({"sources": None, "filename": filename})
+        response.headers["Cache-Control"] = NO_STORE
+        return response, 200
     response = {
         "sources": response_sources,
         "filename": filename
     }
-    return jsonify(response), 200
+    return conditional_response(("sources", fetched_at), SOURCES_CACHE_CONTROL, lambda: jsonify(response))
 
 # For summarizing a single article
 # also need to add in caching article summary later...
@@ -183,20 +237,19 @@ def summarize_article():
     # app.logger.info(f"url: {url}, title: {title}, full_content: {full_content}")
     
     # only retrieve full content if we didn't already get it
+    readability = article.get("readability")
     if not full_content:
         fetched_data = get_contents({url: {"title": title, "content": None}})
         full_content = fetched_data[url]["content"]
+        readability = None
 
     # generate summary
     ai_preferences = data.get('ai_preferences')
     if not ai_preferences:
         return jsonify({"error": "AI preferences are required"}), 400
 
-    summary_output_full = generate_summary_individual(full_content, ai_preferences)
-    if "error" in summary_output_full:
-        summary_output = summary_output_full["error"]
-    else:
-        summary_output = summary_output_full["summary"]
+    summary_output_full = generate_summary_individual(full_content, ai_preferences, readability)
+    summary_output = summary_output_full["summary"]
     if "**Reading Difficulty**:" in summary_output:
         summary, difficulty = summary_output.split("**Reading Difficulty**:", 1)
         summary = summary.replace("**Summary**:", "").strip()
@@ -225,17 +278,24 @@ def summarize_articles():
     if not articles:
         return jsonify({"error": "Articles are required"}), 400
     
-    # dict mapping urls to summary
+    # only articles with a prompt priority make it into the summary, so by
+    # default only their bodies are fetched; the rest are returned as supplied
+    # (or from the content cache) and can be fetched in the background.
+    # Callers that store the bodies must skip entries without "content".
+    priorities = default_priorities(len(articles))
     is_dashboard = data.get('is_dashboard', False)
     if not is_dashboard:
-        contents_mapping = get_contents(articles)
-    else:
-        contents_mapping = articles
-        
+        prompt_urls = [url for url, weight in zip(articles, priorities) if weight > 0]
+        if data.get('lazy', True):
+            get_contents(articles, urls=prompt_urls)
+            if data.get('backfill', False):
+                backfill_contents(articles, [url for url, weight in zip(articles, priorities) if weight == 0])
+        else:
+            get_contents(articles)
+
     # enrich articles with full scraped content
     enriched_articles = []
-    for url, article_data in articles.items():
-        article_result = contents_mapping.get(url, None)
+    for url, article_result in articles.items():
         enriched_articles.append({
             "url": url,
             "title": article_result.get("title", ""),
@@ -247,15 +307,19 @@ def summarize_articles():
             "authors": article_result.get("authors", ""),
             "time": article_result.get("time", ""),
             "sentiment": article_result.get("sentiment", ""),
-    })
-
-    # only use the first 10 articles for summarization (3 full, next 7 thirds) @Sanya verify
-    articles_text = "\n\n".join([
-    f"### {article['title']} ###\n{article['content']}" if i < 3 
-    else f"### {article['title']} ###\n{article['content'][:len(article['content']) // 3]}" 
-    for i, article in enumerate(enriched_articles[:10])
-    ])
-    # articles_text = "\n\n".join([f"### {article['title']} ###\n{article['content']}" for article in enriched_articles[:7]])
+        })
+        # no body was fetched (outside the prompt, or the fetch failed): leave the
+        # key out rather than send "", so the caller doesn't store an empty body
+        if not is_dashboard and not enriched_articles[-1]["content"]:
+            del enriched_articles[-1]["content"]
+
+    # compress to key sentences, then pack the first 10 articles into the token budget, weighting the first 3 highest
+    articles_text, usage = build_articles_prompt(
+        compress_articles(enriched_articles),
+        token_budget=COLLECTION_TOKEN_BUDGET,
+        priorities=priorities,
+    )
+    app.logger.info(f"Collection summary prompt: {usage['total_tokens']}/{usage['budget']} tokens across {len(usage['articles'])} articles")
     summary_output = generate_summary_collection(articles_text, ai_preferences)
     
     # Default values in case of failure
@@ -292,6 +356,15 @@ def generate_audio():
     audio_path = generate_audio_from_article(summary, filename)
     return jsonify({"audio_path": audio_path}), 200
 
+# Streams TTS audio for a summary while the remaining chunks are still being synthesized
+@app.route('/generate-audio/stream', methods=['POST'])
+def stream_audio():
+    data = request.get_json()
+    summary = data.get('summary')
+    if not summary:
+        return jsonify({"error": "Article summary is required"}), 400
+    return Response(stream_with_context(stream_audio_from_article(summary)), mimetype="audio/mpeg")
+
 
 # For generating a podcast from multiple articles
 @app.route('/generate-podcast', methods=['POST'])
@@ -301,16 +374,49 @@ def generate_podcast():
     if not articles:
         return jsonify({"error": "Articles are required"}), 400
     
-    articles_formatted = {url: {"url": url, "content": None} for url in articles}
-    articles_content = get_contents(articles_formatted)  # calls exa to scrape links
-    result = generate_podcast_collection(articles_content)
-    if not result.get("s3_url"):
-        return jsonify({"error": "Failed to upload podcast to S3"}), 500
-    return jsonify(result), 200
-
+    # runs in the podcast worker pool; identical article sets share one generation
+    job = podcast_jobs.wait(podcast_jobs.submit(articles))
+    if job.status != DONE:
+        return jsonify({"error": job.error or "Failed to generate podcast"}), 500
+    return jsonify(job.result), 200
+
+# Submits a podcast generation job and returns immediately
+@app.route('/podcast-jobs', methods=['POST'])
+def submit_podcast_job():
+    data = request.get_json()
+    articles = data.get('articles')
+    if not articles:
+        return jsonify({"error": "Articles are required"}), 400
+    job = podcast_jobs.submit(articles)
+    return jsonify(podcast_jobs.status(job)), 200 if job.status == DONE else 202
+
+@app.route('/podcast-jobs/<job_id>', methods=['GET'])
+def podcast_job_status(job_id):
+    job = podcast_jobs.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(podcast_jobs.status(job)), 200
+
+@app.route('/podcast-jobs/<job_id>/result', methods=['GET'])
+def podcast_job_result(job_id):
+    job = podcast_jobs.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    if job.status == FAILED:
+        return jsonify({"error": job.error}), 500
+    if job.status != DONE:
+        return jsonify(podcast_jobs.status(job)), 202
+    return jsonify(job.result), 200
+
+# podcast audio: byte ranges, strong ETags and immutable caching, from local disk or S3
 @app.route('/audio/<filename>', methods=['GET'])
 def serve_audio(filename):
-    return send_from_directory("data/podcasts/audio", filename, mimetype="audio/mpeg")
+    return serve_audio_file("data/podcasts/audio", "podcasts", filename)
+
+# TTS summary audio, always stored in S3
+@app.route('/audio/summaries/<filename>', methods=['GET'])
+def serve_summary_audio(filename):
+    return serve_audio_file("data/tts", "ai-summaries", filename)
 
 
 @app.route('/user/preferences', methods=['GET'])
@@ -343,9 +449,15 @@ def topic_search():
         return jsonify({"error": "Missing 'topics' in request data"}), 400
         
     # print("topics in app.py: " + topics)
-    results = get_topics_articles(topics, search_preferences)
-
-    return jsonify(results), 200
+    # topics are answered from the embedding index, so the snapshots it was built from version the response
+    version = [(name, snapshot) for name, snapshot, _ in vector_index.built_version() or ()]
+    if not version:
+        # no index yet, so every topic comes from NewsAPI; nothing to version the response by
+        response = jsonify(get_topics_articles(topics, search_preferences))
+        response.headers["Cache-Control"] = NO_STORE
+        return response
+    return conditional_response(("search-topics", version, topics, search_preferences), TOPICS_CACHE_CONTROL,
+                                lambda: jsonify(get_topics_articles(topics, search_preferences)))
 
 
 @app.route('/irrelevant-articles', methods=['POST'])
@@ -355,10 +467,32 @@ def filter_irrelevant():
     query = data.get('query')
     if not articles:
         return jsonify({"error": "Articles are required"}), 400
-    relevant_indices = filter_irrelevant_articles(articles, query)
+    if not isinstance(query, str) or not query.strip():
+        return jsonify({"error": "Query is required"}), 400
+    # scored locally by embedding similarity; the LLM filter is opt-in per request
+    if data.get('use_llm'):
+        relevant_indices = filter_irrelevant_articles(articles, query)
+    else:
+        try:
+            relevant_indices = rank_relevant(articles, query)
+        except (ImportError, OSError) as e:
+            if not LLM_FALLBACK:
+                raise
+            app.logger.warning(f"Local relevance model unavailable, falling back to LLM: {e}")
+            relevant_indices = filter_irrelevant_articles(articles, query)
     app.logger.info("Articles were filtered: ", relevant_indices)
     return jsonify({"relevant_indices": relevant_indices}), 200
 
+# token usage and provider prompt-cache hits per prompt template version
+@app.route('/metrics/prompts', methods=['GET'])
+def prompt_metrics():
+    return jsonify(get_usage_stats()), 200
+
+# per-model call latency, queue wait, errors and retries from the OpenAI governor
+@app.route('/metrics/openai', methods=['GET'])
+def openai_metrics():
+    return jsonify(governor.metrics()), 200
+
 if __name__ == '__main__':
     app.run(port=5000)
 
@@ -0,0 +1,76 @@
+"""
+Benchmark seek-heavy audio playback against the /audio endpoints.
+
+Each simulated player fetches the file size, then issues random byte-range
+requests the way browsers do when scrubbing. Compare runs with
+BITEWISE_AUDIO_REDIRECT unset (bytes proxied through Flask) and set to true
+(redirect to presigned URLs) to see how much work leaves the Python workers.
+
+usage: python benchmarks/audio_seek_bench.py http://127.0.0.1:5000/audio/<file>.mp3 --clients 32 --seeks 50
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+
+def content_length(url):
+    response = requests.get(url, headers={"Range": "bytes=0-0"}, allow_redirects=True, timeout=10)
+    response.raise_for_status()
+    content_range = response.headers.get("Content-Range", "")
+    if "/" in content_range:
+        return int(content_range.rsplit("/", 1)[1])
+    return int(response.headers["Content-Length"])
+
+def run_player(url, size, seeks, window, seed):
+    rng = random.Random(seed)
+    session = requests.Session()
+    latencies = []
+    transferred = 0
+    errors = 0
+    for _ in range(seeks):
+        start = rng.randrange(0, max(1, size - window))
+        headers = {"Range": f"bytes={start}-{min(size, start + window) - 1}"}
+        began = time.perf_counter()
+        try:
+            response = session.get(url, headers=headers, timeout=30)
+            if response.status_code != 206:
+                errors += 1
+            transferred += len(response.content)
+        except requests.RequestException:
+            errors += 1
+        latencies.append(time.perf_counter() - began)
+    return latencies, transferred, errors
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("url")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seeks", type=int, default=25, help="range requests per client")
+    parser.add_argument("--window", type=int, default=256 * 1024, help="bytes fetched per seek")
+    args = parser.parse_args()
+
+    size = content_length(args.url)
+    print(f"{args.url}: {size} bytes, {args.clients} clients x {args.seeks} seeks")
+
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as executor:
+        runs = list(executor.map(
+            lambda seed: run_player(args.url, size, args.seeks, args.window, seed),
+            range(args.clients),
+        ))
+    elapsed = time.perf_counter() - began
+
+    latencies = sorted(latency for run in runs for latency in run[0])
+    transferred = sum(run[1] for run in runs)
+    errors = sum(run[2] for run in runs)
+    print(f"requests: {len(latencies)}  errors: {errors}  elapsed: {elapsed:.2f}s")
+    print(f"throughput: {len(latencies) / elapsed:.1f} req/s, {transferred / elapsed / 1e6:.1f} MB/s")
+    print(f"latency p50: {percentile(latencies, 0.5) * 1000:.1f} ms  p95: {percentile(latencies, 0.95) * 1000:.1f} ms  max: {latencies[-1] * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Measure sharded crawl throughput against a local mock news site.
+
+Starts an HTTP server that serves --sites fake outlets, each with an RSS
+feed of --articles fresh stories and a fixed --latency per article page, then
+runs the SQLite work queue crawl with 1, 2, 4, ... workers and reports
+articles per second. With network-bound seeds throughput should grow roughly
+linearly with the worker count.
+
+usage: python benchmarks/crawl_queue_bench.py --sites 16 --articles 10 --latency 0.05 --workers 1 2 4 8
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+VOCABULARY = ("council budget transit school housing police park river bridge election mayor storm "
+              "hospital library festival court zoning wildfire vote tax market stadium union").split()
+
+def story_body(path):
+    # distinct text per story so near-duplicate detection keeps them all
+    rng = random.Random(path)
+    return "".join("<p>" + " ".join(rng.choice(VOCABULARY) for _ in range(60)) + ".</p>" for _ in range(4))
+
+def mock_site_handler(articles, latency):
+
+    class MockSite(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            parts = self.path.strip("/").split("/")
+            site = parts[0] if parts and parts[0] else ""
+            if self.path.endswith("robots.txt"):
+                self.send_response(404)
+                self.end_headers()
+                return
+            if parts[-1] == "rss.xml":
+                published = datetime.now(timezone.utc).strftime("%a, %d %b %Y %H:%M:%S GMT")
+                items = "".join(
+                    f"<item><title>{site} story {i}</title><link>http://{self.headers['Host']}/{site}/story-{i}</link><pubDate>{published}</pubDate></item>"
+                    for i in range(articles)
+                )
+                body = f"<rss><channel>{items}</channel></rss>"
+            elif len(parts) == 1:
+                body = f'<html><head><link rel="alternate" type="application/rss+xml" href="/{site}/rss.xml"></head><body></body></html>'
+            else:
+                time.sleep(latency)
+                body = f"<html><head><title>{site} {parts[-1]}</title></head><body><article>{story_body(self.path)}</article></body></html>"
+            payload = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    return MockSite
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sites", type=int, default=16)
+    parser.add_argument("--articles", type=int, default=10, help="stories per site feed")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per article page")
+    parser.add_argument("--cities", type=int, default=4)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), mock_site_handler(args.articles, args.latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    workdir = tempfile.mkdtemp(prefix="crawl-bench-")
+    # keep discovery state and published snapshots out of data/; spawned workers inherit the environment
+    os.environ["BITEWISE_DISCOVERY_STATE_PATH"] = os.path.join(workdir, "discovery_state.json")
+    os.environ["BITEWISE_STORAGE"] = "local"
+    os.environ["BITEWISE_STORAGE_DIR"] = os.path.join(workdir, "store")
+    from utils.crawl_queue import crawl_sharded
+
+    sources = {f"City {c}": [] for c in range(args.cities)}
+    for site in range(args.sites):
+        sources[f"City {site % args.cities}"].append(f"{base}/site{site}/")
+    sources_path = os.path.join(workdir, "sources.json")
+    with open(sources_path, "w") as f:
+        json.dump(sources, f)
+
+    print(f"{args.sites} sites x {args.articles} articles, {args.latency * 1000:.0f} ms per page\n")
+    results = []
+    for workers in args.workers:
+        output_path = os.path.join(workdir, f"local_{workers}.json")
+        began = time.perf_counter()
+        total = crawl_sharded(sources_path, workers, os.path.join(workdir, f"queue_{workers}.sqlite3"), output_path, run_id=f"bench-{workers}")
+        elapsed = time.perf_counter() - began
+        results.append((workers, total, elapsed))
+
+    print(f"\n{'workers':>8} {'articles':>9} {'seconds':>8} {'articles/s':>11} {'speedup':>8}")
+    for workers, total, elapsed in results:
+        print(f"{workers:>8} {total:>9} {elapsed:>8.2f} {total / elapsed:>11.1f} {results[0][2] / elapsed:>8.2f}")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
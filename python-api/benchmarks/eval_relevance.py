@@ -0,0 +1,87 @@
+"""
+Evaluate the local relevance scorer against LLM labels on saved search results.
+
+Each dataset is a saved NewsAPI-shaped result list plus the query that produced
+it. The first run asks gpt-4o-mini (the old /irrelevant-articles filter) which
+titles are relevant and caches the labels, so later runs are fully offline.
+Prints precision/recall/F1 across thresholds and the local scoring latency,
+to pick BITEWISE_RELEVANCE_THRESHOLD.
+
+usage: python benchmarks/eval_relevance.py --dataset data/newsapi/ex1_donald_trump.json "donald trump" [--cross-encoder]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from utils.relevance import similarity_scores, cross_encoder_scores  # noqa: E402
+
+LABELS_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "relevance", "llm_labels.json")
+
+
+def load_items(path):
+    with open(path, "r", encoding="utf-8") as f:
+        results = json.load(f)
+    return [{"index": i, "text": result.get("title") or ""} for i, result in enumerate(results)]
+
+def llm_labels(path, query, items, cache):
+    key = f"{os.path.basename(path)}::{query}"
+    if key not in cache:
+        from utils.openai_utils import filter_irrelevant_articles
+        relevant = set(filter_irrelevant_articles(items, query))
+        cache[key] = [item["index"] in relevant for item in items]
+    return np.array(cache[key], dtype=bool)
+
+def metrics(predicted, labels):
+    true_positives = int((predicted & labels).sum())
+    precision = true_positives / max(1, int(predicted.sum()))
+    recall = true_positives / max(1, int(labels.sum()))
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return precision, recall, f1
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", nargs=2, action="append", metavar=("PATH", "QUERY"), required=True)
+    parser.add_argument("--cross-encoder", action="store_true", help="score with the cross-encoder alone, to pick its cut for the reranking stage")
+    parser.add_argument("--labels", default=LABELS_PATH, help="cache of LLM labels")
+    args = parser.parse_args()
+
+    cache = {}
+    if os.path.exists(args.labels):
+        with open(args.labels, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+
+    all_scores, all_labels, latencies = [], [], []
+    for path, query in args.dataset:
+        items = load_items(path)
+        labels = llm_labels(path, query, items, cache)
+        texts = [item["text"] for item in items]
+        began = time.perf_counter()
+        scores = cross_encoder_scores(query, texts) if args.cross_encoder else similarity_scores(query, texts)
+        latencies.append(time.perf_counter() - began)
+        all_scores.append(scores)
+        all_labels.append(labels)
+        print(f"{path} ({query!r}): {len(items)} articles, {int(labels.sum())} relevant per LLM, scored in {latencies[-1] * 1000:.1f} ms")
+
+    os.makedirs(os.path.dirname(args.labels), exist_ok=True)
+    with open(args.labels, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+
+    scores = np.concatenate(all_scores)
+    labels = np.concatenate(all_labels)
+    thresholds = np.linspace(-5, 5, 41) if args.cross_encoder else np.linspace(0.0, 0.7, 29)
+    best = None
+    print(f"\n{'threshold':>10} {'precision':>10} {'recall':>8} {'f1':>6} {'kept':>6}")
+    for threshold in thresholds:
+        predicted = scores >= threshold
+        precision, recall, f1 = metrics(predicted, labels)
+        print(f"{threshold:>10.3f} {precision:>10.3f} {recall:>8.3f} {f1:>6.3f} {int(predicted.sum()):>6}")
+        if best is None or f1 > best[1]:
+            best = (threshold, f1)
+    print(f"\nbest threshold: {best[0]:.3f} (F1 {best[1]:.3f}); mean scoring latency {np.mean(latencies) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
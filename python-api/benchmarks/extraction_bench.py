@@ -0,0 +1,113 @@
+"""
+Compare article extraction engines on saved HTML pages.
+
+A fixture is <name>.html plus an optional <name>.json holding the expected
+{"url", "title", "authors", "content"}. Speed is measured on every page;
+accuracy (exact title match, author recall, body token F1) only where the
+expected JSON exists.
+
+Fixtures are not checked in. --save downloads pages into the fixture
+directory and writes the newspaper3k output as a starting point for the
+expected JSON; correct those by hand before trusting the accuracy numbers.
+
+usage: python benchmarks/extraction_bench.py [--fixtures DIR] [--engines lxml newspaper] [--repeat 3]
+       python benchmarks/extraction_bench.py --save https://example.com/some-article ...
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from utils.extraction import ENGINES, extract_newspaper, fetch_html  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "extraction")
+
+
+def tokens(text):
+    return re.findall(r"\w+", (text or "").lower())
+
+def token_f1(predicted, expected):
+    predicted_counts, expected_counts = Counter(tokens(predicted)), Counter(tokens(expected))
+    overlap = sum((predicted_counts & expected_counts).values())
+    if not overlap:
+        return 0.0
+    precision = overlap / sum(predicted_counts.values())
+    recall = overlap / sum(expected_counts.values())
+    return 2 * precision * recall / (precision + recall)
+
+def load_fixtures(directory):
+    fixtures = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".html"):
+            continue
+        base = os.path.join(directory, name[:-len(".html")])
+        with open(base + ".html", "r", encoding="utf-8") as f:
+            page = f.read()
+        expected = None
+        if os.path.exists(base + ".json"):
+            with open(base + ".json", "r", encoding="utf-8") as f:
+                expected = json.load(f)
+        fixtures.append((name, page, expected))
+    return fixtures
+
+def save_fixtures(urls, directory):
+    os.makedirs(directory, exist_ok=True)
+    for url in urls:
+        base = os.path.join(directory, hashlib.sha1(url.encode("utf-8")).hexdigest()[:12])
+        page = fetch_html(url)
+        with open(base + ".html", "w", encoding="utf-8") as f:
+            f.write(page)
+        draft = extract_newspaper(page, url)
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump({"url": url, "title": draft["title"], "authors": draft["authors"], "content": draft["content"]}, f, ensure_ascii=False, indent=4)
+        print(f"saved {url} -> {base}.html")
+
+def run_engine(engine, fixtures, repeat):
+    extractor = ENGINES[engine]
+    elapsed = 0.0
+    title_hits, author_recall, body_f1, scored = 0, 0.0, 0.0, 0
+    for name, page, expected in fixtures:
+        url = (expected or {}).get("url", "https://example.com/" + name)
+        began = time.perf_counter()
+        for _ in range(repeat):
+            result = extractor(page, url)
+        elapsed += (time.perf_counter() - began) / repeat
+        if expected:
+            scored += 1
+            title_hits += (result["title"] or "").strip() == (expected.get("title") or "").strip()
+            wanted = set(expected.get("authors") or [])
+            author_recall += len(wanted & set(result["authors"] or [])) / len(wanted) if wanted else 1.0
+            body_f1 += token_f1(result["content"], expected.get("content"))
+    return elapsed, scored, title_hits, author_recall, body_f1
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", default=FIXTURES_DIR)
+    parser.add_argument("--engines", nargs="+", default=sorted(ENGINES))
+    parser.add_argument("--repeat", type=int, default=3, help="extractions per page when timing")
+    parser.add_argument("--save", nargs="+", metavar="URL", help="download pages as new fixtures and exit")
+    args = parser.parse_args()
+
+    if args.save:
+        save_fixtures(args.save, args.fixtures)
+        return
+
+    if not os.path.isdir(args.fixtures):
+        sys.exit(f"no fixtures in {args.fixtures}; add some with --save URL ...")
+    fixtures = load_fixtures(args.fixtures)
+    print(f"{len(fixtures)} pages, {sum(1 for fixture in fixtures if fixture[2])} with expected output\n")
+    print(f"{'engine':<12} {'ms/page':>8} {'pages/s':>8} {'title':>6} {'authors':>8} {'body F1':>8}")
+    for engine in args.engines:
+        elapsed, scored, title_hits, author_recall, body_f1 = run_engine(engine, fixtures, args.repeat)
+        per_page = elapsed / max(1, len(fixtures))
+        denominator = max(1, scored)
+        print(f"{engine:<12} {per_page * 1000:>8.1f} {1 / per_page if per_page else 0:>8.1f} "
+              f"{title_hits / denominator:>6.2f} {author_recall / denominator:>8.2f} {body_f1 / denominator:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Bulk source/bias lookups: the source registry against the old lookup.
+
+The workload mixes what the pipeline actually resolves: seed URLs from
+sources.txt, article URLs on those outlets (www., edition., news. and other
+subdomains), NewsAPI {"id", "name"} sources and unknown local outlets. The
+old lookup matched only exact normalized seed URLs against the hardcoded
+mapping and NewsAPI names against bias.csv; both are reproduced here with
+plain dicts so the comparison is lookup cost and hit rate, not pandas.
+
+usage: python benchmarks/source_lookup_bench.py [--lookups 200000] [--repeat 3]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from utils.sources import SOURCE_DOMAINS, SourceRegistry, load_ratings, BIAS_RATINGS, UNKNOWN_BIAS  # noqa: E402
+
+SEEDS_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "scraping", "sources.txt")
+SUBDOMAINS = ("www.", "", "edition.", "news.", "amp.", "m.")
+NEWSAPI_SOURCES = [
+    {"id": "cnn", "name": "CNN"}, {"id": "the-washington-post", "name": "The Washington Post"},
+    {"id": "associated-press", "name": "Associated Press"}, {"id": "fox-news", "name": "Fox News"},
+    {"id": "nbc-news", "name": "NBC News"}, {"id": None, "name": "Yahoo Entertainment"},
+    {"id": "reuters", "name": "Reuters"}, {"id": None, "name": "Forbes"}, {"id": "bbc-news", "name": "BBC News"},
+]
+
+
+def legacy_lookup(ratings):
+    # features.get_source_and_bias and newsapi's bias lookup before the registry
+    seeds = {f"https://www.{host}/" if host.count(".") == 1 else f"https://{host}/": name for host, name in SOURCE_DOMAINS.items()}
+    translation = dict(BIAS_RATINGS, Unknown=UNKNOWN_BIAS)
+
+    def lookup(source, url=None):
+        if isinstance(source, dict):
+            name = source.get("name")
+            return name, translation.get(ratings.get(name, "Unknown"), UNKNOWN_BIAS)
+        source = source.strip().lower()
+        if not source.endswith('/'):
+            source += '/'
+        name = seeds.get(source, "UNKNOWN")
+        return name, translation.get(ratings.get(name, "Unknown"), UNKNOWN_BIAS)
+    return lookup
+
+def workload(size, rng):
+    with open(SEEDS_PATH) as f:
+        seeds = [line.strip() for line in f if line.strip()]
+    hosts = list(SOURCE_DOMAINS)
+    items = []
+    for _ in range(size):
+        kind = rng.random()
+        if kind < 0.15:
+            items.append((rng.choice(seeds), None))
+        elif kind < 0.6:
+            host = rng.choice(hosts)
+            url = f"https://{rng.choice(SUBDOMAINS)}{host}/2025/06/{rng.randrange(10**6)}/story.html"
+            items.append((rng.choice(seeds), url))
+        elif kind < 0.85:
+            source = rng.choice(NEWSAPI_SOURCES)
+            items.append((source, f"https://{rng.choice(hosts)}/a/{rng.randrange(10**6)}"))
+        else:
+            items.append((f"https://www.localpaper{rng.randrange(500)}.com/", f"https://www.localpaper{rng.randrange(500)}.com/news/{rng.randrange(10**6)}"))
+    return items
+
+def run(lookup, items, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        began = time.perf_counter()
+        results = [lookup(source, url) for source, url in items]
+        best = min(best, time.perf_counter() - began)
+    resolved = sum(bias != UNKNOWN_BIAS for _, bias in results) / len(results)
+    return best, resolved
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lookups", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    ratings = load_ratings()
+    began = time.perf_counter()
+    registry = SourceRegistry(ratings)
+    build = time.perf_counter() - began
+    items = workload(args.lookups, random.Random(args.seed))
+    print(f"registry: {len(registry.names)} sources, {len(registry.by_host)} hosts, {len(registry.by_name)} names, built in {build * 1000:.1f} ms\n")
+
+    print(f"{'lookup':>10} {'seconds':>8} {'lookups/s':>11} {'with bias':>10}")
+    for label, lookup in (("legacy", legacy_lookup(ratings)), ("registry", registry.resolve)):
+        elapsed, resolved = run(lookup, items, args.repeat)
+        print(f"{label:>10} {elapsed:>8.3f} {len(items) / elapsed:>11,.0f} {resolved:>10.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import hashlib
+import os
+from threading import Lock
+from flask import Response, redirect, request, send_from_directory
+from botocore.exceptions import ClientError
+from .audio_store import s3_client, S3_BUCKET
+
+# Audio files are written once under a unique name and never modified, so they
+# can be cached by browsers and CDNs indefinitely and validated by content hash.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+PRESIGNED_URL_EXPIRY = 300  # seconds
+# redirect players to a presigned object-store URL so audio bytes skip the Python workers
+REDIRECT_TO_PRESIGNED = os.environ.get("BITEWISE_AUDIO_REDIRECT", "false").lower() == "true"
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_etag_lock = Lock()
+_etag_cache = {}  # (path, mtime_ns, size) -> sha256
+
+
+def file_etag(path):
+    stat = os.stat(path)
+    cache_key = (path, stat.st_mtime_ns, stat.st_size)
+    with _etag_lock:
+        if cache_key in _etag_cache:
+            return _etag_cache[cache_key]
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    etag = digest.hexdigest()
+    with _etag_lock:
+        _etag_cache[cache_key] = etag
+    return etag
+
+def serve_local_audio(directory, filename):
+    # werkzeug handles Range/If-Range/If-None-Match once conditional=True and an etag are given
+    path = os.path.join(directory, filename)
+    response = send_from_directory(
+        directory,
+        filename,
+        mimetype="audio/mpeg",
+        conditional=True,
+        etag=file_etag(path),
+        max_age=31536000,
+    )
+    response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    response.headers["Accept-Ranges"] = "bytes"
+    return response
+
+def serve_s3_audio(key):
+    if REDIRECT_TO_PRESIGNED:
+        url = s3_client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": S3_BUCKET, "Key": key},
+            ExpiresIn=PRESIGNED_URL_EXPIRY,
+        )
+        response = redirect(url, code=302)
+        # the redirect target expires, so only cache the redirect for part of its lifetime
+        response.headers["Cache-Control"] = f"private, max-age={PRESIGNED_URL_EXPIRY // 2}"
+        return response
+
+    try:
+        head = s3_client.head_object(Bucket=S3_BUCKET, Key=key)
+    except ClientError:
+        return Response(status=404)
+    etag = head["ETag"].strip('"')
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+    size = head["ContentLength"]
+    # a Range for another version of the file (If-Range mismatch) gets the whole file
+    use_range = request.range is not None and request.if_range.etag in (None, etag)
+    byte_range = request.range.range_for_length(size) if use_range else None
+    if use_range and byte_range is None:
+        response = Response(status=416)
+        response.headers["Content-Range"] = f"bytes */{size}"
+        response.headers["Accept-Ranges"] = "bytes"
+        return response
+    params = {"Bucket": S3_BUCKET, "Key": key}
+    if byte_range:
+        start, stop = byte_range
+        params["Range"] = f"bytes={start}-{stop - 1}"
+    body = s3_client.get_object(**params)["Body"]
+
+    response = Response(body.iter_chunks(STREAM_CHUNK_SIZE), mimetype="audio/mpeg", direct_passthrough=True)
+    if byte_range:
+        response.status_code = 206
+        response.headers["Content-Range"] = f"bytes {start}-{stop - 1}/{size}"
+        response.content_length = stop - start
+    else:
+        response.content_length = size
+    response.set_etag(etag)
+    response.headers["Accept-Ranges"] = "bytes"
+    response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+def serve_audio_file(directory, key_prefix, filename):
+    # files still on local disk are served directly, everything else comes from S3
+    if os.path.isfile(os.path.join(directory, filename)):
+        return serve_local_audio(directory, filename)
+    return serve_s3_audio(f"{key_prefix}/{filename}")
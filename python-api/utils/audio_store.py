@@ -0,0 +1,112 @@
+import os
+import boto3
+from . import config
+
+S3_BUCKET = os.environ.get("BITEWISE_S3_BUCKET", "bitewise-podcasts")
+S3_REGION = "us-east-1"
+# point at a local S3-compatible server (MinIO, moto_server, ...) for testing
+S3_ENDPOINT_URL = os.environ.get("BITEWISE_S3_ENDPOINT_URL")
+S3_BASE_URL = f"{S3_ENDPOINT_URL.rstrip('/')}/{S3_BUCKET}" if S3_ENDPOINT_URL else f"https://{S3_BUCKET}.s3.amazonaws.com"
+
+# S3 requires multipart parts of at least 5 MB (except the last); this is also
+# the most audio we ever hold in memory for one upload
+PART_SIZE = 8 * 1024 * 1024
+
+s3_client = boto3.client(
+    's3',
+    aws_access_key_id=config.AWS_ACCESS_KEY_ID,
+    aws_secret_access_key=config.AWS_SECRET_ACCESS_KEY,
+    region_name=S3_REGION,
+    endpoint_url=S3_ENDPOINT_URL,
+)
+
+
+def public_url(key):
+    return f"{S3_BASE_URL}/{key}"
+
+
+class S3StreamUpload:
+    """
+    File-like writer that streams bytes into S3 without touching local disk.
+    Data is buffered up to one part; objects that never fill a part are sent
+    with a single put_object, larger ones as a multipart upload.
+    """
+    def __init__(self, key, content_type="audio/mpeg", part_size=PART_SIZE, client=None, bucket=S3_BUCKET):
+        self.key = key
+        self.content_type = content_type
+        self.part_size = part_size
+        self.client = client or s3_client
+        self.bucket = bucket
+        self.buffer = bytearray()
+        self.upload_id = None
+        self.parts = []
+
+    def write(self, data):
+        self.buffer.extend(data)
+        while len(self.buffer) >= self.part_size:
+            self._upload_part(bytes(self.buffer[:self.part_size]))
+            del self.buffer[:self.part_size]
+
+    def _upload_part(self, body):
+        if self.upload_id is None:
+            response = self.client.create_multipart_upload(Bucket=self.bucket, Key=self.key, ContentType=self.content_type)
+            self.upload_id = response["UploadId"]
+        part_number = len(self.parts) + 1
+        response = self.client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=body,
+        )
+        self.parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+
+    def close(self):
+        if self.upload_id is None:
+            self.client.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self.buffer), ContentType=self.content_type)
+        else:
+            if self.buffer:
+                self._upload_part(bytes(self.buffer))
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self.upload_id,
+                MultipartUpload={"Parts": self.parts},
+            )
+        self.buffer = bytearray()
+        return public_url(self.key)
+
+    def abort(self):
+        if self.upload_id is not None:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+        self.buffer = bytearray()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        return False
+
+
+def upload_stream(chunks, key, content_type="audio/mpeg"):
+    """
+    Upload an iterable of byte chunks to S3 as they arrive.
+    Returns the public URL.
+    """
+    with S3StreamUpload(key, content_type) as upload:
+        for chunk in chunks:
+            upload.write(chunk)
+        return upload.close()
+
+def upload_file_streaming(file_path, key, content_type="audio/mpeg"):
+    # read in part-sized blocks so memory stays bounded regardless of file size
+    def read_blocks():
+        with open(file_path, "rb") as source:
+            while True:
+                block = source.read(PART_SIZE)
+                if not block:
+                    break
+                yield block
+    return upload_stream(read_blocks(), key, content_type)
@@ -0,0 +1,47 @@
+from threading import Lock, Thread
+
+
+class BackgroundIndex:
+    """
+    A structure derived from the crawl snapshots (search index, embeddings),
+    rebuilt on a background thread whenever the snapshot version moves.
+    get() never waits for a build: it returns the latest finished one, which
+    may be for the previous version, or None until the first build is done.
+    `version()` names the current snapshots; `build(version)` returns the
+    structure for them.
+    """
+    def __init__(self, name, version, build):
+        self.name = name
+        self.version = version
+        self.build = build
+        self._lock = Lock()
+        self._build_lock = Lock()  # one build at a time; builds may share output files
+        self._value = None
+        self._built = None         # version _value was built from
+        self._pending = None       # version a build thread is working on
+
+    def get(self):
+        version = self.version()
+        with self._lock:
+            if version != self._built and version != self._pending:
+                self._pending = version
+                Thread(target=self._run, args=(version,), name=f"build-{self.name}", daemon=True).start()
+            return self._value
+
+    def built_version(self):
+        """The snapshot version get() currently answers from, or None."""
+        with self._lock:
+            return self._built
+
+    def _run(self, version):
+        with self._build_lock:
+            try:
+                value = self.build(version)
+            except Exception as e:
+                # left pending until the version moves again, rather than retried on every request
+                print(f"Building {self.name} failed: {e}")
+                return
+            with self._lock:
+                self._value, self._built = value, version
+                if self._pending == version:
+                    self._pending = None
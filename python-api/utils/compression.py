@@ -0,0 +1,85 @@
+import math
+import re
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from .prompt_budget import split_sentences
+
+# extractive compression tuning
+COMPRESSION_RATIO = 0.4
+MIN_SENTENCES = 3
+MIN_SENTENCE_WORDS = 4
+LEAD_BONUS = 0.1  # news leads carry the story, favor early sentences slightly
+
+# lines the crawler picks up that never belong in a summary prompt
+boilerplate_pattern = re.compile(
+    r"(sign up|subscribe|newsletter|advertisement|click here|read more|all rights reserved|"
+    r"cookie|privacy policy|terms of (use|service)|follow us|share this|getty images|"
+    r"copyright ©|download the app|watch:|listen:|related:)",
+    re.IGNORECASE,
+)
+
+
+def clean_sentences(text):
+    """
+    Split text into sentences and drop crawler boilerplate: very short
+    fragments, repeated captions and common site chrome.
+    """
+    seen = set()
+    sentences = []
+    for sentence in split_sentences(text):
+        if len(sentence.split()) < MIN_SENTENCE_WORDS:
+            continue
+        if boilerplate_pattern.search(sentence):
+            continue
+        key = re.sub(r'\W+', ' ', sentence.lower()).strip()
+        if key in seen:
+            continue
+        seen.add(key)
+        sentences.append(sentence)
+    return sentences
+
+def select_sentences(sentence_vectors, ratio=COMPRESSION_RATIO, min_sentences=MIN_SENTENCES):
+    """
+    Centroid scoring: rank sentences by cosine similarity to the article's
+    mean TF-IDF vector (rows are already L2-normalized) plus a lead bonus.
+    Returns the indices to keep, in original order.
+    """
+    count = sentence_vectors.shape[0]
+    keep = max(min_sentences, math.ceil(count * ratio))
+    if count <= keep:
+        return list(range(count))
+
+    centroid = np.asarray(sentence_vectors.mean(axis=0)).ravel()
+    norm = np.linalg.norm(centroid)
+    if norm == 0:
+        return list(range(keep))
+    scores = sentence_vectors @ (centroid / norm)
+    scores = np.asarray(scores).ravel() + LEAD_BONUS * (1 - np.arange(count) / count)
+
+    top = np.argpartition(-scores, keep - 1)[:keep]
+    return sorted(top.tolist())
+
+def compress_articles(articles, ratio=COMPRESSION_RATIO, min_sentences=MIN_SENTENCES):
+    """
+    Shrink each article's content to its most informative sentences.
+    IDF weights are fit once over every sentence in the batch so that
+    phrases shared by all articles (site chrome, bylines) score low.
+    Returns new article dicts; the inputs are left untouched.
+    """
+    article_sentences = [clean_sentences(article.get("content") or "") for article in articles]
+    all_sentences = [sentence for sentences in article_sentences for sentence in sentences]
+
+    try:
+        vectorizer = TfidfVectorizer(stop_words="english", sublinear_tf=True)
+        matrix = vectorizer.fit_transform(all_sentences)
+    except ValueError:  # empty batch or nothing but stopwords
+        return [dict(article, content=" ".join(sentences)) for article, sentences in zip(articles, article_sentences)]
+
+    compressed = []
+    offset = 0
+    for article, sentences in zip(articles, article_sentences):
+        rows = matrix[offset:offset + len(sentences)]
+        offset += len(sentences)
+        kept = select_sentences(rows, ratio, min_sentences) if sentences else []
+        compressed.append(dict(article, content=" ".join(sentences[i] for i in kept)))
+    return compressed
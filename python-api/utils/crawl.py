@@ -1,17 +1,32 @@
 import os
 import requests
-from bs4 import BeautifulSoup
 import time
 import re
 import json
+import shutil
+import uuid
 import concurrent.futures
-import time
+import copy
+from datetime import datetime, timezone
+from itertools import chain
+from threading import Lock
 from PIL import Image
 from io import BytesIO
-from newspaper import Article as NewsArticle
+from collections import Counter
+from .extraction import ENGINES, DEFAULT_ENGINE, apply_fallback, fetch_html
+from .junk_filter import check_candidate, check_page, check_length
+from .discovery import discover_articles, record_crawled, load_state, save_state, parse_date, MAX_ITEM_AGE
+from .dedup import dedupe_records, canonicalize_url
+from .snapshot_io import JsonlSpool, publish_json_array, publish_json_object, read_json_array, read_json_object
+from .storage import publish_snapshot, snapshot_path, acquire_lease, release_lease
+from .deadline import Deadline, DeadlineExceeded, request_timeout, CRAWL_BUDGET, SEED_BUDGET
+from .enrichment import enrich_records, readability
 
 
 class Article:
+    # slots keep per-article overhead to the fields themselves while seeds are in flight
+    __slots__ = ("url", "authors", "imageUrl", "title", "source", "content", "time", "readability")
+
     def __init__(self, url, source):
         self.url = url
         self.authors = None
@@ -20,6 +35,7 @@ class Article:
         self.source = source
         self.content = None
         self.time = None
+        self.readability = None
 
     def __hash__(self):
         return hash(self.url)
@@ -29,16 +45,83 @@ class Article:
             return False
         return self.url == other.url
 
+    def to_record(self, city=None):
+        record = {
+            "url": self.url,
+            "title": self.title,
+            "source": self.source,
+            "content": self.content,
+            "imageUrl": self.imageUrl,
+            "authors": self.authors,
+            "time": self.time.strftime('%Y-%m-%dT%H:%M:%S') if self.time else "unknown",
+            "readability": self.readability,
+            "crawledAt": datetime.now(timezone.utc).isoformat(),
+        }
+        if city:
+            record["city"] = city
+        return record
+
 current_dir = os.path.dirname(__file__)
 sources_path = os.path.join(current_dir, '../data/scraping/sources.txt')
 seeds_path = os.path.normpath(sources_path)
 local_sources_path = os.path.join(current_dir, '../data/scraping/local_sources.json')
+data_dir = os.path.normpath(os.path.join(current_dir, '../data'))
+spool_dir = os.path.join(data_dir, 'crawl_spool')
+
+# one crawl of each kind per process; /daily-news and /local-news start one on every stale hit.
+# The storage lease extends that to the fleet: the first node to see a stale snapshot crawls it.
+crawl_all_lock = Lock()
+crawl_location_lock = Lock()
+CRAWL_LEASE_MARGIN = 1800   # seconds past the crawl budget for dedupe, publishing and digests
+
+def run_spool_dir(kind):
+    # per run, so a crawl never appends to another crawl's spool
+    return os.path.join(spool_dir, f"{kind}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}")
+
+def start_index_builds():
+    # the search and embedding indexes start on a new snapshot as soon as it is published,
+    # rather than when the first request after it notices; both build on background threads
+    from .search_index import search_index
+    from .vector_index import vector_index
+    search_index.get()
+    vector_index.get()
+
+# Discovery skips what earlier crawls handled, so a run only finds what is new;
+# each snapshot is this run's records plus the previous snapshot's, minus
+# anything older than MAX_ITEM_AGE.
+def carried_over(records, crawled_urls, cutoff, now):
+    """
+    The previous snapshot's records that stay: not crawled again this run and
+    published after `cutoff`. Undated records age by when they were first
+    crawled; older snapshots without crawledAt are stamped `now` the first
+    time they are carried.
+    """
+    for record in records:
+        if canonicalize_url(record.get("url")) in crawled_urls:
+            continue
+        record.setdefault("crawledAt", now)
+        published = parse_date(record.get("time")) or parse_date(record["crawledAt"])
+        if published is not None and published >= cutoff:
+            yield record
+
+def merged_records(spool, read_previous):
+    """
+    read_records for dedupe_records: this run's spooled records (or None)
+    followed by what carries over from `read_previous()` (or None).
+    """
+    now = datetime.now(timezone.utc)
+    crawled_urls = {canonicalize_url(record.get("url")) for record in spool.records()} if spool else set()
+
+    def read():
+        previous = carried_over(read_previous(), crawled_urls, now - MAX_ITEM_AGE, now.isoformat()) if read_previous else ()
+        return chain(spool.records() if spool else (), previous)
+    return read
 
 # set of crawlable urls
 robots_allowance = set()
 
 # 1) check for robots.txt; parse
-def check_robots_txt(base_url, current_url, user_agent="minicrawl"):
+def check_robots_txt(base_url, current_url, user_agent="minicrawl", deadline=None):
     robots_file = base_url.rstrip('/') + '/robots.txt'
     crawl_delay = 0.0
     active_agent = None
@@ -46,7 +129,7 @@ def check_robots_txt(base_url, current_url, user_agent="minicrawl"):
     found_rule = False
 
     try:
-        response = requests.get(robots_file, timeout=5)
+        response = requests.get(robots_file, timeout=request_timeout(deadline, read=5))
         if response.status_code == 200:
             user_agent_pattern = re.compile(r"^User-agent: (.+)$", re.IGNORECASE)
             allow_pattern = re.compile(r"^Allow: (.+)$", re.IGNORECASE)
@@ -99,129 +182,246 @@ def normalize_url(rule, host_url):
     return host_url.rstrip("/") + rule
 
 # 2) scrape and parse html. find all outgoing links and add to data structure
-def fetch_page(url):
+def fetch_page(url, deadline=None):
     try:
-        response = requests.get(url)
+        response = requests.get(url, timeout=request_timeout(deadline))
         response.raise_for_status()
         return response.text
     except requests.exceptions.RequestException as e:
         print(f"Error fetching {url}: {e}")
         return None
 
-def extract_links(html, base_url, delay=0.5):
-    soup = BeautifulSoup(html, 'html.parser')
-    articles = set()  # use a set to avoid duplicates
-
-    for a_tag in soup.find_all('a', href=True):
-        if len(articles) > 30:  # max 30 articles per source
-            break
-
-        link = a_tag['href']
-        if link.startswith('/'):
-            link = base_url + link  # handle relative links
-            
-        title = a_tag.get_text(strip=True)  # TODO: fix title -- extract h1 from scraping article
-        if len(link) - len(base_url) < 30 or len(title) < 30:  # avoid non-article links
+def extract_links(candidates, base_url, delay=0.5, deadline=None, articles=None, rejects=None, crawled=None):
+    # appends to `articles` as it goes so a caller that gives up waiting still has the partial list;
+    # `rejects` counts junk pages dropped, by reason; `crawled` collects the urls handled either way
+    # (not those whose fetch failed, so they are tried again next crawl)
+    articles = [] if articles is None else articles
+    rejects = Counter() if rejects is None else rejects
+    crawled = set() if crawled is None else crawled
+    seen = set()
+
+    for candidate in candidates:
+        link = candidate["url"]
+        if link in seen:
             continue
-
+        if deadline and deadline.expired():
+            print(f"Deadline reached for {base_url} after {len(articles)} articles")
+            break
+        seen.add(link)
         article = Article(url=link, source=base_url)
 
-        # parse article
-        parsed_article = NewsArticle(link)
-        parsed_article.download()
-        parsed_article.parse()
-        article.title = parsed_article.title
-        article.authors = parsed_article.authors
-        article.time = parsed_article.publish_date
-        article.content = parsed_article.text
-        article.imageUrl = parsed_article.top_image
-        articles.add(article)
-
-        print(f"{link}, {title}")
+        # newsletter, puzzle, video... links are skipped without a request
+        reason = check_candidate(link, candidate["title"])
+        if reason:
+            rejects[reason] += 1
+            crawled.add(link)
+            continue
 
-        time.sleep(delay)  # be polite and avoid overloading the server
+        # parse article: fast pass, junk check, then the slow fallback only for pages we keep
+        try:
+            html = fetch_html(link, deadline=deadline)
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching {link}: {e}")
+            continue
+        except DeadlineExceeded:
+            break
+        extracted = ENGINES[DEFAULT_ENGINE](html, link)
+        reason = check_page(link, extracted["title"] or candidate["title"], extracted["content"])
+        if not reason:
+            extracted = apply_fallback(extracted, html, link)
+            reason = check_length(extracted["content"])
+        crawled.add(link)
+        if reason:
+            rejects[reason] += 1
+            continue
+        article.title = extracted["title"] or candidate["title"]
+        article.authors = extracted["authors"]
+        article.time = extracted["time"] or candidate["time"]
+        article.content = extracted["content"]
+        article.imageUrl = extracted["imageUrl"]
+        # the slow feature (textstat, ~1s), scored here so it counts against the seed's deadline
+        article.readability = readability(article.content)
+        articles.append(article)
+
+        print(f"{link}, {article.title}")
+
+        # be polite and avoid overloading the server
+        if deadline:
+            deadline.sleep(delay)
+        else:
+            time.sleep(delay)
 
     return articles
 
-# process single seed with timeout
-def process_seed(seed, timeout=120):
+# process single seed under its deadline; `entry` (the seed's discovery state),
+# `articles` and `rejects` are filled in place
+def process_seed(seed, entry, deadline=None, articles=None, rejects=None):
+    articles = [] if articles is None else articles
+    rejects = Counter() if rejects is None else rejects
     try:
         print(f"-------------------------> crawling: {seed}")
-        delay, allowed = check_robots_txt(seed, seed)
+        delay, allowed = check_robots_txt(seed, seed, deadline=deadline)
         if allowed == 1:
-            html = fetch_page(seed)
-            if not html:
-                return set()
-            links = extract_links(html, base_url=seed, delay=delay)
-            return links
+            candidates = discover_articles(seed, entry, deadline=deadline)
+            crawled = set()
+            try:
+                extract_links(candidates, base_url=seed, delay=delay, deadline=deadline, articles=articles, rejects=rejects, crawled=crawled)
+            finally:
+                record_crawled(entry, candidates, crawled)
+    except DeadlineExceeded:
+        print(f"Deadline reached for {seed} after {len(articles)} articles")
     except Exception as e:
         print(f"Error processing {seed}: {e}")
-    return set()
+    if rejects:
+        print(f"Rejected {sum(rejects.values())} non-article pages from {seed}: {dict(rejects)}")
+    return articles
 
 
-# crawl websites inputted by sources
-def crawl_seeds(sources, city=None):
-    articles_list = []
+# crawl websites inputted by sources; yields article records seed by seed
+def crawl_seeds(sources, city=None, deadline=None):
+    discovery_state = load_state()
+    deadline = deadline or Deadline(CRAWL_BUDGET)
+    # one worker for all seeds; a seed that overruns is cancelled and abandoned instead of joined
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    crawled = []
 
     for seed in sources:
-        all_links = set()
+        if deadline.expired():
+            print(f"Crawl deadline reached, skipping remaining {len(sources) - sources.index(seed)} seeds.")
+            break
+        seed_deadline = deadline.child(SEED_BUDGET)
+        seed_articles = []
+        rejects = Counter()
+        # the worker gets its own copy of the seed's entry, taken back only if it finishes;
+        # an abandoned worker may still be writing to it while the state is saved
+        entry = copy.deepcopy(discovery_state.get(seed, {}))
+        crawled.append(seed)
 
         try:
-            with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
-                future = executor.submit(process_seed, seed)
-                links = future.result(timeout=120)  # timeout of 2 min
-                all_links.update(links)
+            future = executor.submit(process_seed, seed, entry, seed_deadline, seed_articles, rejects)
+            # the worker stops itself at the deadline; the grace covers one in-flight read timeout
+            future.result(timeout=seed_deadline.remaining() + request_timeout()[1])
+            discovery_state[seed] = entry
         except concurrent.futures.TimeoutError:
-            print(f"Timeout reached for seed: {seed}. Skipping to the next.")
+            print(f"Timeout reached for seed: {seed}. Keeping {len(seed_articles)} partial results.")
+            seed_deadline.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
         except Exception as e:
             print(f"Unexpected error: {e}. Continuing to the next seed.")
-
-        # store articles in a list
-        for article in all_links:
-            articles_data = {
-                "url": article.url,
-                "title": article.title,
-                "source": article.source,
-                "content": article.content,
-                "imageUrl": article.imageUrl,
-                "authors": article.authors,
-                "time": article.time.strftime('%Y-%m-%dT%H:%M:%S') if article.time else "unknown"
-
-            }
-            if city:
-                articles_data["city"] = city
-
-            articles_list.append(articles_data)
-
-    return articles_list
-
-def crawl_all():
-    with open(seeds_path, 'r') as file:
-        seeds = file.read()
-        seed_list = [seed.rstrip('/') + '/' for seed in seeds.splitlines()]
-
-    articles = crawl_seeds(sources=seed_list)
-    if articles:
-        with open("data/articles_data.json", 'w', encoding='utf-8') as json_file:
-            json.dump(articles, json_file, ensure_ascii=False, indent=4)
-    print(f"Crawling complete for all sources. Crawled {len(articles)} articles.")
+        # latest crawl's counts, reported by `python -m utils.junk_filter report`;
+        # set here rather than by the worker, which may outlive the seed
+        discovery_state.setdefault(seed, {})["junk_rejects"] = dict(rejects)
+
+        # the cheap features are computed once here and stored with the snapshot;
+        # readability came from the worker, and is None for anything it didn't get to
+        for record in enrich_records([article.to_record(city) for article in list(seed_articles)], score_readability=False):
+            yield record
+
+    executor.shutdown(wait=False, cancel_futures=True)
+    # only this crawl's seeds: other workers may be saving theirs to the same file
+    save_state({seed: discovery_state[seed] for seed in crawled if seed in discovery_state})
+
+def crawl_all(deadline=None):
+    if not crawl_all_lock.acquire(blocking=False):
+        print("Crawl of all sources already running; not starting another.")
+        return
+    lease = acquire_lease("crawl-all", CRAWL_BUDGET + CRAWL_LEASE_MARGIN)
+    if lease is None:
+        crawl_all_lock.release()
+        print("Another node is crawling all sources; not starting another.")
+        return
+    run_dir = run_spool_dir("all")
+    try:
+        with open(seeds_path, 'r') as file:
+            seeds = file.read()
+            seed_list = [seed.rstrip('/') + '/' for seed in seeds.splitlines()]
+
+        # spool records to disk as they arrive, then dedupe and publish in two streaming passes
+        with JsonlSpool(os.path.join(run_dir, "articles.jsonl")) as spool:
+            for record in crawl_seeds(sources=seed_list, deadline=deadline or Deadline(CRAWL_BUDGET)):
+                spool.write(record)
+        # published even when nothing was new, so the snapshot's age says when we last crawled
+        output_path = os.path.join(data_dir, "articles_data.json")
+        previous_path = snapshot_path("articles_data.json")
+        read_previous = (lambda: read_json_array(previous_path)) if previous_path else None
+        count = publish_json_array(dedupe_records(merged_records(spool, read_previous)), output_path)
+        if count:
+            publish_snapshot("articles_data.json", output_path)
+            start_index_builds()
+            # clustering and the daily summary, once for the fleet; imported here
+            # because it pulls in BERTopic, which crawl_queue workers never need
+            from .digest import publish_digests
+            publish_digests("articles_data.json")
+        print(f"Crawling complete for all sources. Crawled {spool.count} new articles, {count} in the snapshot.")
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+        release_lease("crawl-all", lease)
+        crawl_all_lock.release()
 
 # crawl local sources
-def crawl_location():
-    # get local news sources
-    with open(local_sources_path, "r") as file:
-        data = json.load(file)
-    all_articles = {}
-    for city, sources in data.items():
-        print(f"Crawling sources for {city}...")
-        articles = crawl_seeds(sources, city=city)
-        if articles:
-            all_articles[city] = articles
-
-    if all_articles:   
-        with open("data/local_articles_data.json", 'w', encoding='utf-8') as json_file:
-            json.dump(all_articles, json_file, ensure_ascii=False, indent=4)
-    print(f"completed crawling all local sources. Crawled {len(all_articles)} cities.")
+def crawl_location(deadline=None):
+    if not crawl_location_lock.acquire(blocking=False):
+        print("Crawl of local sources already running; not starting another.")
+        return
+    try:
+        # get local news sources
+        with open(local_sources_path, "r") as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        crawl_location_lock.release()
+        raise
+    # each city gets the full budget, so the lease covers all of them
+    lease = acquire_lease("crawl-local", CRAWL_BUDGET * len(data) + CRAWL_LEASE_MARGIN)
+    if lease is None:
+        crawl_location_lock.release()
+        print("Another node is crawling local sources; not starting another.")
+        return
+    run_dir = run_spool_dir("local")
+    try:
+        spools = {}
+        for i, (city, sources) in enumerate(data.items()):
+            print(f"Crawling sources for {city}...")
+            # a budget per city, so a slow city doesn't starve the ones after it;
+            # a caller's deadline still bounds the whole run
+            city_deadline = deadline.child(CRAWL_BUDGET) if deadline else Deadline(CRAWL_BUDGET)
+            with JsonlSpool(os.path.join(run_dir, f"crawled-{i}.jsonl")) as spool:
+                for record in crawl_seeds(sources, city=city, deadline=city_deadline):
+                    spool.write(record)
+            if spool.count:
+                spools[city] = spool
+            else:
+                spool.remove()
+
+        # the previous snapshot's cities, spooled so each can be read twice by the dedupe;
+        # cities with nothing new this run carry over what is still recent
+        previous = {}
+        previous_path = snapshot_path("local_articles_data.json")
+        if previous_path:
+            for city, records in read_json_object(previous_path):
+                if city in data:
+                    with JsonlSpool(os.path.join(run_dir, f"previous-{len(previous)}.jsonl")) as spool:
+                        for record in records:
+                            spool.write(record)
+                    previous[city] = spool
+        cities = [city for city in data if city in spools or city in previous]
+
+        output_path = os.path.join(data_dir, "local_articles_data.json")
+        count = publish_json_object(
+            ((city, dedupe_records(merged_records(spools.get(city), previous[city].records if city in previous else None)))
+             for city in cities),
+            output_path,
+        )
+        if count:
+            publish_snapshot("local_articles_data.json", output_path)
+            start_index_builds()
+            from .digest import publish_digests
+            publish_digests("local_articles_data.json", cities=cities)
+        print(f"completed crawling all local sources. {len(spools)} cities with new articles, {count} articles across {len(cities)} cities.")
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+        release_lease("crawl-local", lease)
+        crawl_location_lock.release()
 
 def main():
     crawl_all()
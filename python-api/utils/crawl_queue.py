@@ -0,0 +1,281 @@
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from itertools import chain
+from threading import Event, Thread
+from .crawl import crawl_seeds
+from .deadline import Deadline, SEED_BUDGET
+from .dedup import dedupe_records
+from .snapshot_io import JsonlSpool, read_jsonl, read_json_object, publish_json_object
+from .storage import publish_snapshot, snapshot_path
+
+# Sharded crawl for large source lists such as all_local_sources.json. Every
+# (city, seed) pair becomes a task in a SQLite work queue; worker processes,
+# on this machine or on others sharing the data directory, lease tasks, keep
+# the lease alive with heartbeats while crawling, and spool results to one
+# JSONL file per task attempt. A lease that stops heartbeating expires and the task
+# is handed to another worker, up to MAX_ATTEMPTS times. When the queue
+# drains, the spools are deduped and merged into the per-city snapshot.
+
+current_dir = os.path.dirname(__file__)
+QUEUE_PATH = os.path.normpath(os.path.join(current_dir, '../data/crawl_spool/queue.sqlite3'))
+ALL_LOCAL_SOURCES_PATH = os.path.normpath(os.path.join(current_dir, '../data/scraping/all_local_sources.json'))
+LOCAL_SNAPSHOT_PATH = os.path.normpath(os.path.join(current_dir, '../data/local_articles_data.json'))
+
+LEASE_SECONDS = 60
+HEARTBEAT_SECONDS = LEASE_SECONDS / 3
+MAX_ATTEMPTS = 3
+IDLE_POLL_SECONDS = 1.0
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+class CrawlQueue:
+    def __init__(self, path=QUEUE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self.connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id INTEGER PRIMARY KEY,
+                    run_id TEXT NOT NULL,
+                    city TEXT NOT NULL,
+                    seed TEXT NOT NULL,
+                    state TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    lease_owner TEXT,
+                    lease_expires REAL,
+                    articles INTEGER,
+                    spool TEXT,
+                    error TEXT,
+                    UNIQUE (run_id, city, seed)
+                )""")
+            db.execute("CREATE INDEX IF NOT EXISTS tasks_by_state ON tasks (run_id, state, lease_expires)")
+
+    @contextmanager
+    def connect(self):
+        # autocommit connection; leases take the write lock explicitly with BEGIN IMMEDIATE
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def spool_dir(self, run_id):
+        return os.path.join(os.path.dirname(self.path), run_id)
+
+    def spool_path(self, run_id, task_id, worker_id):
+        # per worker, so a worker whose lease expired never writes into the new owner's file
+        return os.path.join(self.spool_dir(run_id), f"{task_id}-{worker_id}.jsonl")
+
+    def enqueue(self, run_id, sources_by_city):
+        with self.connect() as db:
+            db.executemany(
+                "INSERT OR IGNORE INTO tasks (run_id, city, seed) VALUES (?, ?, ?)",
+                [(run_id, city, seed) for city, seeds in sources_by_city.items() for seed in seeds],
+            )
+        return self.progress(run_id)
+
+    def lease(self, run_id, worker_id):
+        """Claim the next pending or expired task; returns (id, city, seed) or None."""
+        now = time.time()
+        with self.connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                # workers that kept dying on a task have used up its retries
+                db.execute(
+                    "UPDATE tasks SET state = ?, error = 'lease expired' WHERE run_id = ? AND state = ? AND lease_expires < ? AND attempts >= ?",
+                    (FAILED, run_id, LEASED, now, MAX_ATTEMPTS),
+                )
+                row = db.execute(
+                    """SELECT id, city, seed FROM tasks
+                       WHERE run_id = ? AND (state = ? OR (state = ? AND lease_expires < ?))
+                       ORDER BY attempts, id LIMIT 1""",
+                    (run_id, PENDING, LEASED, now),
+                ).fetchone()
+                if row:
+                    db.execute(
+                        "UPDATE tasks SET state = ?, lease_owner = ?, lease_expires = ?, attempts = attempts + 1 WHERE id = ?",
+                        (LEASED, worker_id, now + LEASE_SECONDS, row[0]),
+                    )
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        return row
+
+    def heartbeat(self, task_id, worker_id):
+        """Extend the lease; False means it expired and another worker owns the task now."""
+        with self.connect() as db:
+            updated = db.execute(
+                "UPDATE tasks SET lease_expires = ? WHERE id = ? AND lease_owner = ? AND state = ?",
+                (time.time() + LEASE_SECONDS, task_id, worker_id, LEASED),
+            ).rowcount
+        return updated == 1
+
+    def complete(self, task_id, worker_id, articles, spool):
+        with self.connect() as db:
+            db.execute(
+                "UPDATE tasks SET state = ?, articles = ?, spool = ?, lease_expires = NULL WHERE id = ? AND lease_owner = ? AND state = ?",
+                (DONE, articles, spool, task_id, worker_id, LEASED),
+            )
+
+    def fail(self, task_id, worker_id, error):
+        # back to pending for another attempt, or failed for good
+        with self.connect() as db:
+            db.execute(
+                """UPDATE tasks SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END,
+                   error = ?, lease_owner = NULL, lease_expires = NULL
+                   WHERE id = ? AND lease_owner = ?""",
+                (MAX_ATTEMPTS, FAILED, PENDING, str(error)[:500], task_id, worker_id),
+            )
+
+    def progress(self, run_id):
+        with self.connect() as db:
+            rows = db.execute("SELECT state, COUNT(*) FROM tasks WHERE run_id = ? GROUP BY state", (run_id,)).fetchall()
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+    def finished(self, run_id):
+        counts = self.progress(run_id)
+        return counts[PENDING] == 0 and counts[LEASED] == 0
+
+    def completed_tasks(self, run_id):
+        with self.connect() as db:
+            return db.execute(
+                "SELECT city, spool FROM tasks WHERE run_id = ? AND state = ? AND articles > 0 ORDER BY city, id",
+                (run_id, DONE),
+            ).fetchall()
+
+
+def keep_alive(queue, task_id, worker_id, stop, lost):
+    while not stop.wait(HEARTBEAT_SECONDS):
+        if not queue.heartbeat(task_id, worker_id):
+            lost.set()
+            return
+
+def run_worker(run_id, queue_path=QUEUE_PATH, worker_id=None):
+    """Lease and crawl tasks until the run has nothing pending or leased."""
+    queue = CrawlQueue(queue_path)
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    crawled = 0
+    while True:
+        task = queue.lease(run_id, worker_id)
+        if task is None:
+            if queue.finished(run_id):
+                break
+            time.sleep(IDLE_POLL_SECONDS)  # other workers hold the rest; wait for their leases
+            continue
+
+        task_id, city, seed = task
+        stop, lost = Event(), Event()
+        heartbeat = Thread(target=keep_alive, args=(queue, task_id, worker_id, stop, lost), daemon=True)
+        heartbeat.start()
+        try:
+            with JsonlSpool(queue.spool_path(run_id, task_id, worker_id)) as spool:
+                for record in crawl_seeds([seed], city=city, deadline=Deadline(SEED_BUDGET)):
+                    spool.write(record)
+            if lost.is_set():
+                print(f"[{worker_id}] lease on {seed} expired; leaving it to the new owner")
+                spool.remove()
+            else:
+                queue.complete(task_id, worker_id, spool.count, spool.path)
+                crawled += spool.count
+        except Exception as e:
+            print(f"[{worker_id}] {seed} failed: {e}")
+            queue.fail(task_id, worker_id, e)
+        finally:
+            stop.set()
+            heartbeat.join()
+    print(f"[{worker_id}] queue drained, crawled {crawled} articles")
+    return crawled
+
+def merge_run(run_id, queue_path=QUEUE_PATH, output_path=LOCAL_SNAPSHOT_PATH):
+    """
+    Dedupe each city's task spools into the snapshot. Cities this run found
+    nothing for keep their previous articles.
+    """
+    queue = CrawlQueue(queue_path)
+    spools = {}
+    for city, spool in queue.completed_tasks(run_id):
+        spools.setdefault(city, []).append(spool)
+
+    def city_records(paths):
+        return lambda: (record for path in paths for record in read_jsonl(path))
+
+    kept = []
+
+    def carried_over():
+        # streamed from the published snapshot, which may come from another node's run
+        previous_path = snapshot_path(os.path.basename(output_path))
+        if not previous_path:
+            return
+        for city, articles in read_json_object(previous_path):
+            if city not in spools:
+                kept.append(city)
+                yield city, articles
+
+    groups = chain(((city, dedupe_records(city_records(paths))) for city, paths in spools.items()), carried_over())
+    total = publish_json_object(groups, output_path)
+    publish_snapshot(os.path.basename(output_path), output_path)
+    print(f"Merged run {run_id}: {len(spools)} crawled cities, {len(kept)} carried over, {total} articles")
+    return total
+
+def crawl_sharded(sources_path=ALL_LOCAL_SOURCES_PATH, workers=4, queue_path=QUEUE_PATH, output_path=LOCAL_SNAPSHOT_PATH, run_id=None):
+    """Enqueue every seed, crawl with local worker processes, then merge."""
+    with open(sources_path, "r") as file:
+        sources_by_city = json.load(file)
+    run_id = run_id or time.strftime("run-%Y%m%d-%H%M%S")
+    queue = CrawlQueue(queue_path)
+    print(f"Run {run_id}: {queue.enqueue(run_id, sources_by_city)}")
+
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=run_worker, args=(run_id, queue_path)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    print(f"Run {run_id}: {queue.progress(run_id)}")
+    return merge_run(run_id, queue_path, output_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded crawl over a SQLite work queue")
+    parser.add_argument("command", choices=["run", "enqueue", "work", "merge", "status"])
+    parser.add_argument("--run-id")
+    parser.add_argument("--sources", default=ALL_LOCAL_SOURCES_PATH)
+    parser.add_argument("--queue", default=QUEUE_PATH)
+    parser.add_argument("--output", default=LOCAL_SNAPSHOT_PATH)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        crawl_sharded(args.sources, args.workers, args.queue, args.output, args.run_id)
+        return
+    if not args.run_id:
+        parser.error(f"{args.command} needs --run-id")
+    queue = CrawlQueue(args.queue)
+    if args.command == "enqueue":
+        with open(args.sources, "r") as file:
+            print(queue.enqueue(args.run_id, json.load(file)))
+    elif args.command == "work":
+        # start one of these per core on each node sharing the data directory
+        run_worker(args.run_id, args.queue)
+    elif args.command == "merge":
+        merge_run(args.run_id, args.queue, args.output)
+    else:
+        print(queue.progress(args.run_id))
+
+if __name__ == "__main__":
+    main()
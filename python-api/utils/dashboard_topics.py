@@ -9,6 +9,8 @@ from nltk.tokenize import word_tokenize
 from nltk.corpus import wordnet as wn
 from nltk.stem import WordNetLemmatizer
 from sklearn.feature_extraction.text import CountVectorizer
+from .dedup import dedupe_articles
+from .enrichment import ENRICHED_FIELDS
 
 nltk.download('wordnet')
 import os
@@ -20,15 +22,19 @@ stop_words = set(stopwords.words('english'))
 NUM_TOPICS = 5
 
 
-# loads data and returns a pandas dataframe
-def load_data(file, city=None):
-    with open(file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-        if city:
-            articles = data.get(city, [])
-            article_data = pd.DataFrame(articles)
-        else:
-            article_data = pd.DataFrame(data)
+# loads data and returns a pandas dataframe; `source` is a snapshot path or
+# the already loaded records (a list, or {city: [articles]})
+def load_data(source, city=None):
+    if isinstance(source, (list, dict)):
+        data = source
+    else:
+        with open(source, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    if city:
+        articles = data.get(city, [])
+        article_data = pd.DataFrame(articles)
+    else:
+        article_data = pd.DataFrame(data)
     return article_data 
 
 def clean_df(article_df):
@@ -40,6 +46,11 @@ def clean_df(article_df):
     article_data = article_data.drop_duplicates(subset=['title', 'source'], keep='first')
     article_data = article_data.dropna(subset=['content'])
 
+    # collapse near-duplicates (tracking-param URLs, republished wire stories)
+    article_data = pd.DataFrame(dedupe_articles(article_data.to_dict(orient="records")))
+    if article_data.empty:
+        return article_data
+
     def clean_text(text):
         if not isinstance(text, str):
             return ""
@@ -132,13 +143,15 @@ def find_rep_article(filtered_topics, topic_model, article_data):
         if representative_docs is None:
             representative_docs = []
         rep_articles_info = article_data[article_data['snippet'].isin(representative_docs)]
-        rep_articles_info = rep_articles_info[["url", "title", "source", "content", "imageUrl", "authors", "time"]]
+        rep_articles_info = rep_articles_info[["url", "title", "source", "content", "imageUrl", "authors", "time", "alternateSources"]]
         representative_articles[topic] = rep_articles_info.to_dict(orient="records")
 
     return representative_articles
 
 def format_response(rep_article_urls, article_data):
-    fields_to_keep = ["url", "title", "source", "content", "imageUrl", "authors", "time"]
+    fields_to_keep = ["url", "title", "source", "content", "imageUrl", "authors", "time", "alternateSources"]
+    # ingest-time features, when the snapshot has them
+    fields_to_keep += [field for field in ENRICHED_FIELDS if field in article_data.columns]
     cluster_groups = {}
 
     # Organize articles by cluster
@@ -161,8 +174,11 @@ def format_response(rep_article_urls, article_data):
     return response
 
 
-def news_pipeline(file, city=None):
-    article_data = load_data(file, city)
+def news_pipeline(source, city=None):
+    article_data = load_data(source, city)
+    if article_data.empty:
+        # a city whose articles all aged out of the snapshot
+        return {"clustered_articles": {}}
     cleaned_data = clean_df(article_data)
     cleaned_data, topic_model = find_topics(cleaned_data)
     filtered_topics, cleaned_data = filter_topics(cleaned_data, topic_model) # applies num topics param
@@ -0,0 +1,61 @@
+import math
+import os
+import time
+from threading import Event
+
+# Deadlines passed down through the crawler. Every fetch takes its timeout
+# from the deadline it runs under and every loop checks it between steps, so
+# a crawl or a single seed stops on time and keeps what it already gathered.
+
+CONNECT_TIMEOUT = 3.05  # seconds; just over a TCP retransmit window
+READ_TIMEOUT = 10
+CRAWL_BUDGET = float(os.environ.get("BITEWISE_CRAWL_BUDGET", "3600"))   # whole crawl_all run, or one city of crawl_location
+SEED_BUDGET = float(os.environ.get("BITEWISE_SEED_BUDGET", "120"))      # one seed, discovery included
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Deadline:
+    def __init__(self, seconds=None, parent=None):
+        expires_at = time.monotonic() + seconds if seconds is not None else math.inf
+        self.parent = parent
+        self.expires_at = min(expires_at, parent.expires_at) if parent else expires_at
+        self._cancelled = Event()
+
+    def child(self, seconds):
+        """A deadline that ends after `seconds` or with this one, whichever is first."""
+        return Deadline(seconds, parent=self)
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def cancelled(self):
+        return self._cancelled.is_set() or (self.parent is not None and self.parent.cancelled())
+
+    def remaining(self):
+        if self.cancelled():
+            return 0.0
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def check(self):
+        if self.expired():
+            raise DeadlineExceeded()
+
+    def timeout(self, connect=CONNECT_TIMEOUT, read=READ_TIMEOUT):
+        """(connect, read) timeouts for requests, clipped to the time left."""
+        self.check()
+        remaining = self.remaining()
+        return (min(connect, remaining), min(read, remaining))
+
+    def sleep(self, seconds):
+        # wakes early when cancelled
+        self._cancelled.wait(min(seconds, self.remaining()))
+
+
+def request_timeout(deadline=None, connect=CONNECT_TIMEOUT, read=READ_TIMEOUT):
+    return deadline.timeout(connect, read) if deadline else (connect, read)
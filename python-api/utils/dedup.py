@@ -0,0 +1,167 @@
+import re
+import zlib
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import numpy as np
+
+# Near-duplicate detection for crawled and searched articles: URL
+# canonicalization catches the same page behind tracking params, and MinHash
+# over word shingles with an LSH index catches wire stories republished by
+# several outlets. Duplicates collapse into one canonical article that lists
+# its alternate sources.
+
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+BANDS = 16                  # 16 bands x 4 rows: pairs above ~0.5 Jaccard become candidates
+ROWS = NUM_PERM // BANDS
+SIMILARITY_THRESHOLD = 0.6  # estimated Jaccard needed to merge a candidate pair
+MAX_WORDS = 600             # leading words used for the signature
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_rng = np.random.RandomState(1)
+_perm_a = _rng.randint(1, 1 << 31, size=NUM_PERM).astype(np.uint64)
+_perm_b = _rng.randint(0, 1 << 31, size=NUM_PERM).astype(np.uint64)
+
+tracking_params = re.compile(r"^(utm_\w+|fbclid|gclid|dclid|mc_cid|mc_eid|cmpid|cmp|smid|smtyp|ito|ocid|taid|sr_share|ref|ref_src|src|share|partner|via|outputtype|_ga)$", re.IGNORECASE)
+
+
+def canonicalize_url(url):
+    """Normalize scheme/host, drop tracking params, fragments and AMP suffixes."""
+    if not url:
+        return url
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    for prefix in ("www.", "m.", "amp."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    path = re.sub(r"/{2,}", "/", parts.path)
+    path = re.sub(r"/(amp|index\.html?)/?$", "", path) or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True) if not tracking_params.match(key))
+    return urlunsplit(("https", host, path, urlencode(query), ""))
+
+def source_label(article):
+    source = article.get("source")
+    if isinstance(source, dict):
+        return source.get("name")
+    return source
+
+def shingles(text, size=SHINGLE_SIZE):
+    words = re.findall(r"\w+", (text or "").lower())[:MAX_WORDS]
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def minhash_signature(shingle_set):
+    if not shingle_set:
+        return None
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingle_set), dtype=np.uint64, count=len(shingle_set))
+    # (a * x + b) mod p for every permutation at once; a, b < 2^31 and x < 2^32 so nothing overflows
+    permuted = (np.outer(hashes, _perm_a) + _perm_b) % MERSENNE_PRIME
+    return permuted.min(axis=0)
+
+
+class UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i, j):
+        root_i, root_j = self.find(i), self.find(j)
+        if root_i != root_j:
+            # keep the earlier article as root so output order stays stable
+            self.parent[max(root_i, root_j)] = min(root_i, root_j)
+
+
+def find_duplicate_groups(articles, text_fields=("title", "content"), threshold=SIMILARITY_THRESHOLD):
+    """
+    Group articles that share a canonical URL or have near-identical text.
+    Returns a list of index groups in order of first appearance.
+    """
+    # one pass over the articles, so a generator works and only URLs and signatures stay in memory
+    urls, signatures = [], []
+    for article in articles:
+        urls.append(canonicalize_url(article.get("url")))
+        signatures.append(minhash_signature(shingles(" ".join(str(article.get(field) or "") for field in text_fields))))
+    groups = UnionFind(len(urls))
+
+    by_url = {}
+    for i, url in enumerate(urls):
+        if url in by_url:
+            groups.union(by_url[url], i)
+        elif url:
+            by_url[url] = i
+
+    buckets = {}
+    for i, signature in enumerate(signatures):
+        if signature is None:
+            continue
+        for band in range(BANDS):
+            band_key = (band, signature[band * ROWS:(band + 1) * ROWS].tobytes())
+            for j in buckets.setdefault(band_key, []):
+                if groups.find(i) != groups.find(j) and np.mean(signatures[i] == signatures[j]) >= threshold:
+                    groups.union(i, j)
+            buckets[band_key].append(i)
+
+    grouped = {}
+    for i in range(len(urls)):
+        grouped.setdefault(groups.find(i), []).append(i)
+    return [grouped[root] for root in sorted(grouped)]
+
+def dedupe_articles(articles, text_fields=("title", "content"), threshold=SIMILARITY_THRESHOLD):
+    """
+    Collapse duplicates into one canonical article each. The canonical copy is
+    the one with the longest body; the others are listed under
+    "alternateSources" as {"url", "source"}. Every returned article has the
+    key, so it can be used as a DataFrame column.
+    """
+    deduped = []
+    for group in find_duplicate_groups(articles, text_fields, threshold):
+        canonical_index = max(group, key=lambda i: (len(articles[i].get("content") or ""), -i))
+        canonical = dict(articles[canonical_index])
+        alternates = list(canonical.get("alternateSources") or [])
+        for i in group:
+            if i != canonical_index:
+                alternates.append({"url": articles[i].get("url"), "source": source_label(articles[i])})
+                alternates.extend(articles[i].get("alternateSources") or [])
+        canonical["alternateSources"] = alternates
+        deduped.append(canonical)
+
+    if len(deduped) < len(articles):
+        print(f"Collapsed {len(articles)} articles into {len(deduped)} after near-duplicate detection")
+    return deduped
+
+def dedupe_records(read_records, text_fields=("title", "content"), threshold=SIMILARITY_THRESHOLD):
+    """
+    Streaming dedupe_articles for snapshots too large to hold in memory.
+    read_records() must return a fresh iterator over the same records each
+    call; it is read twice. Canonical articles are yielded at their own
+    position rather than the group's first.
+    """
+    details = []  # (body length, url, source, alternateSources) per record
+
+    def tracked():
+        for article in read_records():
+            details.append((len(article.get("content") or ""), article.get("url"), source_label(article), article.get("alternateSources") or []))
+            yield article
+
+    alternates = {}
+    for group in find_duplicate_groups(tracked(), text_fields, threshold):
+        canonical_index = max(group, key=lambda i: (details[i][0], -i))
+        merged = list(details[canonical_index][3])
+        for i in group:
+            if i != canonical_index:
+                merged.append({"url": details[i][1], "source": details[i][2]})
+                merged.extend(details[i][3])
+        alternates[canonical_index] = merged
+
+    if len(alternates) < len(details):
+        print(f"Collapsed {len(details)} articles into {len(alternates)} after near-duplicate detection")
+    for i, article in enumerate(read_records()):
+        if i in alternates:
+            yield dict(article, alternateSources=alternates[i])
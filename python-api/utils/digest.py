@@ -0,0 +1,171 @@
+import json
+import os
+import re
+from threading import Lock, Thread
+import numpy as np
+import pandas as pd
+from .dashboard_topics import news_pipeline
+from .enrichment import enrich_records
+from .compression import compress_articles
+from .prompt_budget import build_articles_prompt, DAILY_TOKEN_BUDGET
+from .openai_governor import LLMError
+from .openai_utils import daily_news_summary
+from .storage import DATA_DIR, get_storage, acquire_lease, release_lease, publish_snapshot, snapshot_info, snapshot_path
+from .ttl_cache import TTLCache
+
+# The dashboard digest: a snapshot's articles clustered into topics plus the
+# overall LLM summary, before any per-request shaping. The node that crawls a
+# snapshot builds its digest and publishes it next to it, tagged with the
+# snapshot version it came from, so the rest of the fleet serves BERTopic and
+# the daily summary from storage instead of recomputing them. A snapshot
+# without a digest (crawled by the CLI, or before digests existed) gets one
+# built in the background by the first node asked for it; requests get a 202
+# until it is published.
+
+MAX_ARTICLES_PER_CLUSTER = 3   # articles per cluster fed to the overall summary
+DIGEST_LEASE_SECONDS = 600
+UNPUBLISHED_TTL = 300          # seconds before a digest without a summary is built again
+DIGEST_TMP_DIR = os.path.join(DATA_DIR, 'cache', 'digests')
+
+_digests = TTLCache(ttl=12 * 3600, maxsize=32)  # digest version -> digest
+# digests whose summary failed aren't published; served from here until the summary is retried
+_unpublished = TTLCache(ttl=UNPUBLISHED_TTL, maxsize=32)  # (snapshot, city, version) -> digest
+_building_lock = Lock()
+_building = set()  # (snapshot, city, version) being built on this node
+
+
+def digest_name(snapshot_name, city=None):
+    base = snapshot_name[:-len(".json")] if snapshot_name.endswith(".json") else snapshot_name
+    if city is None:
+        return f"{base}.digest.json"
+    return f"{base}.{re.sub(r'[^a-z0-9]+', '-', city.lower()).strip('-')}.digest.json"
+
+def to_plain(value):
+    # pandas rows and numpy scalars from the clustering, as JSON-ready values
+    if isinstance(value, pd.Series):
+        return value.to_dict()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def build_digest(source, city=None):
+    """Cluster `source` (a snapshot path or loaded records) and summarize the top clusters."""
+    cluster_dict = news_pipeline(source, city)
+    if not cluster_dict["clustered_articles"]:
+        # nothing recent for this city; no summary call for an empty prompt
+        return {"overall_summary": "No recent articles to summarize.", "summary_failed": False, "clusters": []}
+
+    # source, bias and read time were computed at ingest; older snapshots get them here
+    for cluster_id, articles in cluster_dict["clustered_articles"].items():
+        for article in enrich_records(articles, score_readability=False):
+            article["source"] = article["sourceName"]
+
+    # take 3 articles from each cluster for overall summary
+    top_clusters = sorted(cluster_dict["clustered_articles"].items(), key=lambda x: len(x[1]), reverse=True)
+    top_articles = []
+    for cluster, articles in top_clusters:
+        print(f"Cluster ID: {cluster}, Articles Count: {len(articles)}")
+        top_articles.extend(articles[:MAX_ARTICLES_PER_CLUSTER])
+
+    articles_text, usage = build_articles_prompt(compress_articles(top_articles), token_budget=DAILY_TOKEN_BUDGET)
+    print(f"Daily summary prompt: {usage['total_tokens']}/{usage['budget']} tokens across {len(usage['articles'])} articles")
+    # the clusters are still worth serving when the summary call fails
+    summary_failed = False
+    try:
+        daily_summary = daily_news_summary(articles_text)
+    except LLMError as e:
+        print(f"Daily summary failed: {e}")
+        daily_summary = f"An error occurred: {str(e)}"
+        summary_failed = True
+
+    return {
+        "overall_summary": daily_summary.to_dict() if isinstance(daily_summary, pd.Series) else daily_summary,
+        "summary_failed": summary_failed,
+        "clusters": [
+            {
+                "cluster_id": cluster_id,
+                "title": cluster_articles[0].get("title", "Untitled"),
+                "articles": [article.to_dict() if isinstance(article, pd.Series) else article for article in cluster_articles],
+            }
+            for cluster_id, cluster_articles in top_clusters
+        ],
+    }
+
+def publish_digest(snapshot_name, city=None):
+    """Build the digest of the current version of `snapshot_name` and publish it; returns the digest."""
+    info = snapshot_info(snapshot_name)
+    if info is None:
+        return None
+    digest = build_digest(snapshot_path(snapshot_name), city)
+    if digest["summary_failed"]:
+        # not stored, so the next node to serve the snapshot tries the summary again
+        return digest
+    os.makedirs(DIGEST_TMP_DIR, exist_ok=True)
+    path = os.path.join(DIGEST_TMP_DIR, f"{digest_name(snapshot_name, city)}.{os.getpid()}")
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(digest, f, ensure_ascii=False, default=to_plain)
+        published = publish_snapshot(digest_name(snapshot_name, city), path, source_version=info["version"])
+    finally:
+        os.remove(path)
+    # served from the stored copy where possible, so every node returns the same JSON
+    return load_digest(snapshot_name, city, published) or digest
+
+def load_digest(snapshot_name, city=None, digest_info=None):
+    """The published digest of the current version of `snapshot_name`, or None."""
+    info = snapshot_info(snapshot_name)
+    digest_info = digest_info or snapshot_info(digest_name(snapshot_name, city))
+    if info is None or digest_info is None or digest_info.get("source_version") != info["version"]:
+        return None
+
+    def read():
+        with open(get_storage().local_path(digest_info["key"]), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return _digests.get_or_set(digest_info["version"], read)
+
+def get_digest(snapshot_name, city=None):
+    """
+    The digest for the current snapshot, or None while it is being built.
+    Never blocks on a build or a lease: a missing digest is built on a
+    background thread and published by whichever node takes the lease.
+    """
+    digest = load_digest(snapshot_name, city)
+    if digest is not None:
+        return digest
+    info = snapshot_info(snapshot_name)
+    if info is None:
+        return None
+    key = (snapshot_name, city, info["version"])
+    digest = _unpublished.get(key)
+    if digest is not None:
+        return digest
+    with _building_lock:
+        if key not in _building:
+            _building.add(key)
+            Thread(target=build_in_background, args=(snapshot_name, city, key), daemon=True).start()
+    return None
+
+def build_in_background(snapshot_name, city, key):
+    try:
+        lease = acquire_lease(digest_name(snapshot_name, city), DIGEST_LEASE_SECONDS)
+        if lease is None:
+            return  # another node is building it
+        try:
+            digest = publish_digest(snapshot_name, city)
+            if digest is not None and digest.get("summary_failed"):
+                _unpublished.set(key, digest)
+        finally:
+            release_lease(digest_name(snapshot_name, city), lease)
+    except Exception as e:
+        print(f"Building the digest of {snapshot_name} for {city or 'all sources'} failed: {e}")
+    finally:
+        with _building_lock:
+            _building.discard(key)
+
+def publish_digests(snapshot_name, cities=(None,)):
+    # after a crawl; a digest that fails is built on demand by the first node to serve it
+    for city in cities:
+        try:
+            publish_digest(snapshot_name, city)
+        except Exception as e:
+            print(f"Could not publish the digest of {snapshot_name} for {city or 'all sources'}: {e}")
@@ -0,0 +1,285 @@
+import fcntl
+import json
+import os
+import re
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from html.parser import HTMLParser
+from threading import Lock
+from urllib.parse import urljoin, urlsplit
+import requests
+from dateutil import parser as date_parser
+from lxml import etree
+from .deadline import request_timeout
+
+# Article discovery for crawl seeds. Feeds (RSS/Atom) and news sitemaps give
+# article URLs with publish dates, so only recent items get fetched. Seeds
+# without either fall back to the homepage links, read with a streaming parser
+# that only looks at <a> and <link> tags. Feed and sitemap locations are cached
+# per seed in a state file and rediscovered once a day.
+#
+# The state also remembers what earlier crawls handled: a watermark (the
+# newest publish date of a crawl that got through all its candidates) and the
+# most recently crawled URLs. Items at or below the watermark, or already
+# crawled, are not returned again.
+
+current_dir = os.path.dirname(__file__)
+STATE_PATH = os.environ.get("BITEWISE_DISCOVERY_STATE_PATH") or os.path.normpath(os.path.join(current_dir, '../data/scraping/discovery_state.json'))
+
+MAX_ARTICLES_PER_SEED = 30
+MAX_ITEM_AGE = timedelta(hours=int(os.environ.get("BITEWISE_DISCOVERY_MAX_AGE_HOURS", "48")))
+REDISCOVER_AFTER = timedelta(days=1)
+MAX_SITEMAPS = 3          # child sitemaps read from a sitemap index
+MAX_HOMEPAGE_LINKS = 300  # stop the streaming homepage parse after this many links
+MAX_SEEN_URLS = 100       # recently crawled URLs remembered per seed (items without dates, partial crawls)
+USER_AGENT = "Mozilla/5.0 (compatible; minicrawl)"
+
+FEED_TYPES = {"application/rss+xml", "application/atom+xml", "application/feed+json", "application/xml", "text/xml"}
+COMMON_FEED_PATHS = ("/feed", "/rss", "/feed/", "/rss.xml", "/index.xml", "/feeds/all.rss")
+
+
+class HomepageParser(HTMLParser):
+    """Collects feed <link>s and (href, text) of <a> tags; everything else is ignored."""
+    def __init__(self, base_url):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.feeds = []
+        self.links = []
+        self._href = None
+        self._text = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            href = dict(attrs).get("href")
+            if href:
+                self._href = urljoin(self.base_url, href)
+                self._text = []
+        elif tag == "link":
+            attributes = dict(attrs)
+            if "alternate" in (attributes.get("rel") or "").lower() and (attributes.get("type") or "").lower() in FEED_TYPES and attributes.get("href"):
+                self.feeds.append(urljoin(self.base_url, attributes["href"]))
+
+    def handle_data(self, data):
+        if self._href is not None:
+            self._text.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == "a" and self._href is not None:
+            self.links.append((self._href, " ".join("".join(self._text).split())))
+            self._href = None
+
+def scan_homepage(seed, deadline=None):
+    # feed the parser while the page downloads and stop once there are enough links
+    parser = HomepageParser(seed)
+    try:
+        with requests.get(seed, stream=True, timeout=request_timeout(deadline), headers={"User-Agent": USER_AGENT}) as response:
+            response.raise_for_status()
+            response.encoding = response.encoding or "utf-8"
+            for chunk in response.iter_content(chunk_size=16 * 1024, decode_unicode=True):
+                parser.feed(chunk)
+                if len(parser.links) >= MAX_HOMEPAGE_LINKS or (deadline and deadline.expired()):
+                    break
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching {seed}: {e}")
+    return list(dict.fromkeys(parser.feeds)), parser.links
+
+
+def parse_date(value):
+    if not value:
+        return None
+    try:
+        parsed = date_parser.parse(value.strip())
+    except (ValueError, OverflowError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+def local_name(element):
+    return etree.QName(element).localname if isinstance(element.tag, str) else ""
+
+def child_text(element, *names):
+    for child in element:
+        if local_name(child) in names and child.text:
+            return child.text.strip()
+    return None
+
+def fetch_xml(url, deadline=None):
+    try:
+        response = requests.get(url, timeout=request_timeout(deadline), headers={"User-Agent": USER_AGENT})
+        response.raise_for_status()
+        return etree.fromstring(response.content, parser=etree.XMLParser(recover=True, resolve_entities=False, no_network=True))
+    except (requests.exceptions.RequestException, etree.XMLSyntaxError) as e:
+        print(f"Error reading {url}: {e}")
+        return None
+
+def parse_feed(root):
+    """RSS <item>s and Atom <entry>s as {"url", "title", "time"}."""
+    items = []
+    if root is None:
+        return items
+    for element in root.iter():
+        name = local_name(element)
+        if name == "item":
+            url = child_text(element, "link") or child_text(element, "guid")
+            published = child_text(element, "pubDate", "date", "published")
+        elif name == "entry":
+            links = [child for child in element if local_name(child) == "link"]
+            preferred = [link for link in links if link.get("rel") in (None, "alternate")] or links
+            url = preferred[0].get("href") if preferred else None
+            published = child_text(element, "published", "updated")
+        else:
+            continue
+        if url and url.startswith("http"):
+            items.append({"url": url, "title": child_text(element, "title"), "time": parse_date(published)})
+    return items
+
+def parse_sitemap(root, depth=0, deadline=None):
+    """<url> entries of a (news) sitemap; follows a sitemap index one level down."""
+    items = []
+    if root is None:
+        return items
+    if local_name(root) == "sitemapindex":
+        children = [(child_text(sitemap, "loc"), parse_date(child_text(sitemap, "lastmod"))) for sitemap in root if local_name(sitemap) == "sitemap"]
+        # news sitemaps first, then the most recently modified
+        children.sort(key=lambda child: ("news" not in (child[0] or ""), -(child[1].timestamp() if child[1] else 0)))
+        if depth == 0:
+            for location, _ in children[:MAX_SITEMAPS]:
+                if location:
+                    items.extend(parse_sitemap(fetch_xml(location, deadline), depth=1))
+        return items
+    for entry in root:
+        if local_name(entry) != "url":
+            continue
+        url = child_text(entry, "loc")
+        published, title = None, None
+        for child in entry.iter():
+            if local_name(child) == "publication_date" and child.text:
+                published = child.text
+            elif local_name(child) == "title" and child.text:
+                title = child.text.strip()
+        if url:
+            items.append({"url": url, "title": title, "time": parse_date(published or child_text(entry, "lastmod"))})
+    return items
+
+def robots_sitemaps(seed, deadline=None):
+    root_url = f"{urlsplit(seed).scheme}://{urlsplit(seed).netloc}"
+    try:
+        response = requests.get(root_url + "/robots.txt", timeout=request_timeout(deadline), headers={"User-Agent": USER_AGENT})
+        if response.status_code != 200:
+            return []
+    except requests.exceptions.RequestException:
+        return []
+    sitemaps = re.findall(r"^Sitemap:\s*(\S+)", response.text, re.IGNORECASE | re.MULTILINE)
+    return sorted(set(sitemaps), key=lambda url: "news" not in url)[:MAX_SITEMAPS]
+
+def probe_feeds(seed, deadline=None):
+    for path in COMMON_FEED_PATHS:
+        url = urljoin(seed, path)
+        if parse_feed(fetch_xml(url, deadline)):
+            return [url]
+    return []
+
+
+_state_lock = Lock()
+
+@contextmanager
+def state_file_lock():
+    # crawl_queue workers in other processes share the state file
+    with open(STATE_PATH + ".lock", 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def load_state():
+    try:
+        with open(STATE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except json.JSONDecodeError as e:
+        # only cached locations; losing them costs one rediscovery per seed
+        print(f"Ignoring unreadable discovery state {STATE_PATH}: {e}")
+        return {}
+
+def save_state(entries):
+    """
+    Merge {seed: entry} into the state file. Re-reads the file under the lock,
+    so seeds other processes saved since this one loaded it are kept.
+    """
+    with _state_lock, state_file_lock():
+        state = load_state()
+        state.update(entries)
+        tmp_path = f"{STATE_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=4)
+        os.replace(tmp_path, STATE_PATH)
+
+def homepage_candidates(seed, links):
+    # the old length heuristics: article URLs are long and their anchor text is a headline
+    candidates = {}
+    for link, title in links:
+        if urlsplit(link).netloc != urlsplit(seed).netloc or len(link) - len(seed) < 30 or len(title) < 30:
+            continue
+        candidates.setdefault(link, {"url": link, "title": title, "time": None})
+    return list(candidates.values())
+
+def discover_articles(seed, entry, max_items=MAX_ARTICLES_PER_SEED, deadline=None):
+    """
+    Returns up to max_items [{"url", "title", "time"}] for a seed, newest first.
+    entry is the seed's dict from load_state(), updated in place.
+    """
+    links = None
+    discovered_at = entry.get("discovered_at")
+    if not discovered_at or datetime.now(timezone.utc) - datetime.fromisoformat(discovered_at) > REDISCOVER_AFTER:
+        feeds, links = scan_homepage(seed, deadline)
+        entry["feeds"] = feeds or probe_feeds(seed, deadline)
+        entry["sitemaps"] = robots_sitemaps(seed, deadline)
+        entry["discovered_at"] = datetime.now(timezone.utc).isoformat()
+
+    items = [item for feed in entry.get("feeds", []) for item in parse_feed(fetch_xml(feed, deadline))]
+    method = "feed"
+    if not items:
+        items = [item for sitemap in entry.get("sitemaps", []) for item in parse_sitemap(fetch_xml(sitemap, deadline), deadline=deadline)]
+        method = "sitemap"
+
+    if items:
+        cutoff = datetime.now(timezone.utc) - MAX_ITEM_AGE
+        fresh = {}
+        for item in items:
+            if item["time"] is None or item["time"] >= cutoff:
+                fresh.setdefault(item["url"], item)
+        items = sorted(fresh.values(), key=lambda item: item["time"].timestamp() if item["time"] else 0, reverse=True)
+    else:
+        if links is None:
+            _, links = scan_homepage(seed, deadline)
+        items = homepage_candidates(seed, links)
+        method = "homepage"
+    entry["method"] = method
+
+    entry["last_candidates"] = len(items)
+    items = unseen(entry, items)
+    print(f"Discovered {entry['last_candidates']} candidate articles for {seed} via {method}, {len(items)} new")
+    return items[:max_items]
+
+def unseen(entry, items):
+    # what an earlier crawl already handled: at or below the watermark, or recently crawled
+    watermark = parse_date(entry.get("watermark"))
+    seen = set(entry.get("seen", []))
+    return [item for item in items if item["url"] not in seen and not (watermark and item["time"] and item["time"] <= watermark)]
+
+def record_crawled(entry, candidates, crawled_urls):
+    """
+    Remember which of discover_articles' candidates this crawl handled. The
+    watermark only moves when every candidate was handled; a crawl cut short
+    by its deadline leaves older items for the next one, and the URLs it did
+    crawl are skipped through the seen list.
+    """
+    handled = [item["url"] for item in candidates if item["url"] in crawled_urls]
+    entry["seen"] = (handled + [url for url in entry.get("seen", []) if url not in crawled_urls])[:MAX_SEEN_URLS]
+    times = [item["time"] for item in candidates if item["time"]]
+    if times and len(handled) == len(candidates):
+        previous = parse_date(entry.get("watermark"))
+        entry["watermark"] = max(times + ([previous] if previous else [])).isoformat()
@@ -0,0 +1,98 @@
+import re
+import numpy as np
+import textstat
+from .sources import resolve_source
+
+# Ingest-time article features. Crawled records are enriched once as each seed
+# finishes and NewsAPI results once as they are aggregated, so the dashboard,
+# search and summary paths read stored fields instead of recomputing them per
+# request. Records from snapshots written before enrichment existed are
+# enriched on first read.
+#
+# Added fields: sourceName, biasRating, charLength, readTime, language and
+# readability ({fleschReadingEase, fleschKincaidGrade, textStandard}, or None
+# for text too short to score, e.g. NewsAPI's truncated content).
+#
+# Readability is the expensive one: textstat's text_standard takes around a
+# second per article, which is what every /summarize-article call used to pay.
+# The crawl scores it in each seed's worker, under that seed's deadline; paths
+# that enrich records on the fly keep whatever score a record already has and
+# otherwise leave it None, so the summary scores those itself as before.
+
+ENRICHED_FIELDS = ("sourceName", "biasRating", "charLength", "readTime", "readability", "language")
+SHORT_READ_CHARS = 2500          # under 2 minutes at 5 chars/word, 250 words/minute
+LONG_READ_CHARS = 8750           # over 7 minutes
+MIN_READABILITY_CHARS = 500
+READABILITY_SAMPLE_CHARS = 8000  # about what the individual summary prompt keeps
+LANGUAGE_SAMPLE_CHARS = 2000
+
+# NewsAPI truncates content to ~200 chars and appends "[+1234 chars]"
+TRUNCATION_MARKER = re.compile(r"\s*\[\+(\d+)\s+chars\]\s*$")
+WORD = re.compile(r"[a-zà-öø-ÿ']+")
+
+LANGUAGE_STOPWORDS = {
+    "en": {"the", "and", "of", "to", "in", "is", "that", "for", "it", "with", "was", "on", "as", "are", "be", "this", "by", "have", "from", "at"},
+    "es": {"el", "la", "de", "que", "y", "en", "los", "del", "se", "las", "por", "un", "para", "con", "una", "su", "al", "es", "lo", "como"},
+    "fr": {"le", "la", "les", "de", "des", "et", "du", "un", "une", "est", "que", "dans", "pour", "qui", "sur", "au", "pas", "avec", "il", "ce"},
+    "de": {"der", "die", "und", "das", "ist", "nicht", "mit", "den", "von", "zu", "sich", "des", "auf", "für", "im", "dem", "ein", "eine", "auch", "es"},
+    "pt": {"o", "a", "de", "que", "e", "do", "da", "em", "um", "para", "com", "não", "uma", "os", "no", "se", "na", "por", "mais", "as"},
+    "it": {"il", "di", "che", "e", "la", "per", "un", "non", "una", "in", "del", "della", "sono", "le", "si", "con", "gli", "da", "al", "anche"},
+}
+
+
+def is_missing(value):
+    # pandas fills absent columns with NaN
+    return value is None or (isinstance(value, float) and value != value)
+
+def is_enriched(article):
+    return all(field in article and not (field != "readability" and is_missing(article[field])) for field in ENRICHED_FIELDS)
+
+def content_length(content):
+    """Characters in the full article, counting what NewsAPI truncated away."""
+    if not content:
+        return 0
+    match = TRUNCATION_MARKER.search(content)
+    if match:
+        return len(content[:match.start()].strip()) + int(match.group(1))
+    return len(content)
+
+def reading_times(char_lengths):
+    """Reading time buckets (0 short, 1 medium, 2 long, None unknown) for many lengths at once."""
+    lengths = np.asarray(char_lengths, dtype=np.int64)
+    buckets = np.where(lengths < SHORT_READ_CHARS, 0, np.where(lengths <= LONG_READ_CHARS, 1, 2))
+    return [int(bucket) if length else None for bucket, length in zip(buckets, lengths)]
+
+def readability(text):
+    if not text or len(text) < MIN_READABILITY_CHARS or TRUNCATION_MARKER.search(text):
+        return None
+    text = text[:READABILITY_SAMPLE_CHARS]
+    return {
+        "fleschReadingEase": textstat.flesch_reading_ease(text),
+        "fleschKincaidGrade": textstat.flesch_kincaid_grade(text),
+        "textStandard": textstat.text_standard(text),
+    }
+
+def detect_language(text):
+    """Best stopword match among a few common languages; "unknown" for too little text."""
+    words = WORD.findall((text or "")[:LANGUAGE_SAMPLE_CHARS].lower())
+    if len(words) < 10:
+        return "unknown"
+    hits = {language: sum(word in stopwords for word in words) for language, stopwords in LANGUAGE_STOPWORDS.items()}
+    language, count = max(hits.items(), key=lambda item: item[1])
+    return language if count >= 0.1 * len(words) else "unknown"
+
+def enrich_records(records, score_readability=True):
+    """Add ENRICHED_FIELDS to every record that lacks them, in place; returns the records."""
+    pending = [record for record in records if not is_enriched(record)]
+    if not pending:
+        return records
+    lengths = [content_length(record.get("content")) for record in pending]
+    for record, length, read_time in zip(pending, lengths, reading_times(lengths)):
+        content = record.get("content")
+        # crawl records carry the seed URL, NewsAPI results an {"id", "name"} dict
+        record["sourceName"], record["biasRating"] = resolve_source(record.get("source"), record.get("url"))
+        record["charLength"] = length or None
+        record["readTime"] = read_time
+        record["readability"] = readability(content) if score_readability else record.get("readability")
+        record["language"] = detect_language(content or record.get("title"))
+    return records
@@ -1,55 +1,91 @@
+from concurrent.futures import ThreadPoolExecutor
 from exa_py import Exa
-from typing import Dict, List
+from threading import Thread
+from typing import Dict, Iterable, List, Optional
 from . import config
-from newspaper import Article
+from .extraction import fetch_and_extract
+from .ttl_cache import TTLCache
+
+# fetched bodies and page metadata by url, so a selection summarized twice (or
+# backfilled in the background) is only fetched once
+CONTENT_TTL = 6 * 3600
+METADATA_WORKERS = 8
+content_cache = TTLCache(ttl=CONTENT_TTL, maxsize=1024)
+
+
+def fetch_texts(exa, url_list: List[str]) -> Dict[str, str]:
+    try:
+      results_data = exa.get_contents(
+          url_list,
+          text={"include_html_tags": False}
+      )
+      return {result.url: result.text for result in results_data.results}
+
+    except ValueError as e:
+      print(f"Failed to fetch contents for some URLs: {e}")
+      print(f"URLs attempted: {url_list}")
+
+      # Retry individual URLs to salvage some results
+      fetched_results = {}
+      for url in url_list:
+          try:
+            result = exa.get_contents([url], text={"include_html_tags": False})
+            if result.results:
+              fetched_results[url] = result.results[0].text
+          except ValueError:
+            print(f"Skipping URL due to failure: {url}")
+      return fetched_results
+
+def fetch_page(url: str, text: str) -> Dict[str, str]:
+    page = {"content": (text or "").strip()}
+    try:
+      # Attempt to get metadata from the page itself
+      extracted = fetch_and_extract(url)
+      page.update({
+          "imageUrl": extracted["imageUrl"],
+          "authors": extracted["authors"],
+          "date": extracted["time"],
+          "title": extracted["title"],
+      })
+    except Exception as e:
+      print(f"Error processing {url}: {e}")
+    return page
 
 # articles: {"url": { "title": "string", "content": "string" }}
-def get_contents(articles: Dict[str, Dict[str, str]]) -> Dict[str, Dict[str, str]]:
-    exa = Exa(api_key=config.EXA_API_KEY)
+# urls: only fetch these (the rest still pick up anything already cached)
+def get_contents(articles: Dict[str, Dict[str, str]], urls: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, str]]:
+    wanted = set(articles) if urls is None else set(urls)
     url_list = []
 
     for url, article_data in articles.items():
-      if not article_data.get("content"):
+      if article_data.get("content"):
+        continue
+      cached = content_cache.get(url)
+      if cached is not None:
+        article_data.update(cached)
+      elif url in wanted:
         url_list.append(url)
         print(f"Processing URL: {url}")
 
-    fetched_results = {}
-    
-    if url_list:
-      try:
-        results_data = exa.get_contents(
-            url_list,
-            text={"include_html_tags": False}
-        )
-        fetched_results = {result.url: result for result in results_data.results}
-        
-      except ValueError as e:
-        print(f"Failed to fetch contents for some URLs: {e}")
-        print(f"URLs attempted: {url_list}")
-
-        # Retry individual URLs to salvage some results
-        for url in url_list:
-            try:
-              result = exa.get_contents([url], text={"include_html_tags": False})
-              if result.results:
-                fetched_results[url] = result.results[0]
-            except ValueError:
-              print(f"Skipping URL due to failure: {url}")
-
-    # modify articles with content of fetched results
-    for url, article_data in articles.items():
-      if url in fetched_results:
-        try:
-          article_data["content"] = fetched_results[url].text.strip()
-          # Attempt to get metadata using newspaper3k
-          article = Article(url)
-          article.download()
-          article.parse()
-          article_data["imageUrl"] = article.top_image
-          article_data["authors"] = article.authors
-          article_data["date"] = article.publish_date
-          article_data["title"] = article.title
-        except Exception as e:
-          print(f"Error processing {url}: {e}") 
-
-    return articles
\ No newline at end of file
+    if not url_list:
+      return articles
+
+    fetched_results = fetch_texts(Exa(api_key=config.EXA_API_KEY), url_list)
+    fetched_urls = [url for url in url_list if url in fetched_results]
+    if not fetched_urls:
+      return articles
+
+    # page metadata means a newspaper download per url; do them side by side
+    with ThreadPoolExecutor(max_workers=min(METADATA_WORKERS, len(fetched_urls))) as executor:
+      pages = executor.map(fetch_page, fetched_urls, [fetched_results[url] for url in fetched_urls])
+      for url, page in zip(fetched_urls, pages):
+        content_cache.set(url, page)
+        articles[url].update(page)
+
+    return articles
+
+def backfill_contents(articles: Dict[str, Dict[str, str]], urls: Iterable[str]) -> None:
+    """Fetch `urls` into content_cache on a background thread, leaving `articles` untouched."""
+    pending = {url: {"title": articles[url].get("title"), "content": None} for url in urls if url in articles and not articles[url].get("content")}
+    if pending:
+      Thread(target=get_contents, args=(pending,), daemon=True).start()
@@ -0,0 +1,191 @@
+import json
+import os
+from urllib.parse import urljoin
+import requests
+from dateutil import parser as date_parser
+from lxml import etree, html as lxml_html
+from .deadline import request_timeout
+
+# Article extraction engines. The default lxml engine pulls title, authors,
+# publish date, top image and body out of a single walk over the parsed tree,
+# preferring JSON-LD and OpenGraph metadata when the page provides them.
+# Pages where it finds too little body text fall back to newspaper3k, which
+# re-uses the already downloaded HTML instead of fetching it again.
+
+DEFAULT_ENGINE = os.environ.get("BITEWISE_EXTRACTION_ENGINE", "lxml")
+MIN_CONTENT_CHARS = 200   # below this the body is considered missed and the fallback runs
+MIN_PARAGRAPH_CHARS = 20
+USER_AGENT = "Mozilla/5.0 (compatible; minicrawl)"
+
+SKIPPED_TAGS = {"script", "style", "noscript", "nav", "header", "footer", "aside", "form", "figcaption", "button", "svg"}
+ARTICLE_TYPES = {"NewsArticle", "Article", "ReportageNewsArticle", "BlogPosting", "AnalysisNewsArticle", "LiveBlogPosting"}
+TITLE_META = ("og:title", "twitter:title")
+IMAGE_META = ("og:image", "og:image:url", "twitter:image", "twitter:image:src")
+DATE_META = ("article:published_time", "og:published_time", "datepublished", "pubdate", "publishdate", "date", "dc.date", "sailthru.date")
+AUTHOR_META = ("author", "article:author", "dc.creator", "sailthru.author", "parsely-author")
+
+
+def empty_result():
+    return {"title": None, "authors": [], "time": None, "content": "", "imageUrl": None}
+
+def parse_datetime(value):
+    if not value:
+        return None
+    try:
+        return date_parser.parse(str(value))
+    except (ValueError, OverflowError):
+        return None
+
+def names(value):
+    # JSON-LD authors come as a string, a Person dict, or a list of either
+    if isinstance(value, list):
+        return [name for item in value for name in names(item)]
+    if isinstance(value, dict):
+        return [value["name"]] if isinstance(value.get("name"), str) else []
+    if isinstance(value, str) and value.strip():
+        return [value.strip()]
+    return []
+
+def find_ld_article(data):
+    if isinstance(data, list):
+        for item in data:
+            found = find_ld_article(item)
+            if found:
+                return found
+    elif isinstance(data, dict):
+        types = data.get("@type")
+        types = types if isinstance(types, list) else [types]
+        if ARTICLE_TYPES.intersection(t for t in types if isinstance(t, str)):
+            return data
+        if "@graph" in data:
+            return find_ld_article(data["@graph"])
+    return None
+
+
+def extract_lxml(html, url):
+    result = empty_result()
+    try:
+        root = lxml_html.fromstring(html)
+    except (etree.ParserError, ValueError):
+        return result
+
+    meta = {}
+    ld_article = None
+    page_title = None
+    h1 = None
+    time_tag = None
+    rel_authors = []
+    paragraphs = {}  # parent element -> [paragraph text]
+    skip_depth = 0
+
+    # one pass over the tree; skip_depth > 0 while inside navigation/boilerplate
+    for event, element in etree.iterwalk(root, events=("start", "end")):
+        tag = element.tag if isinstance(element.tag, str) else ""
+        if event == "end":
+            if tag in SKIPPED_TAGS:
+                skip_depth -= 1
+            continue
+
+        if tag == "meta":
+            key = (element.get("property") or element.get("name") or element.get("itemprop") or "").lower()
+            if key and element.get("content") and key not in meta:
+                meta[key] = element.get("content").strip()
+        elif tag == "script" and (element.get("type") or "").lower() == "application/ld+json" and ld_article is None:
+            try:
+                ld_article = find_ld_article(json.loads(element.text or ""))
+            except ValueError:
+                pass
+        elif tag == "title" and page_title is None:
+            page_title = element.text_content().strip()
+        elif tag == "h1" and h1 is None:
+            h1 = element.text_content().strip()
+        elif tag == "time" and time_tag is None and element.get("datetime"):
+            time_tag = element.get("datetime")
+        elif skip_depth == 0:
+            if tag == "a" and "author" in (element.get("rel") or ""):
+                rel_authors.append(element.text_content().strip())
+            elif tag == "p":
+                text = " ".join(element.text_content().split())
+                if len(text) >= MIN_PARAGRAPH_CHARS:
+                    paragraphs.setdefault(element.getparent(), []).append(text)
+
+        if tag in SKIPPED_TAGS:
+            skip_depth += 1
+
+    ld_article = ld_article or {}
+    ld_image = ld_article.get("image")
+    if isinstance(ld_image, list):
+        ld_image = ld_image[0] if ld_image else None
+    if isinstance(ld_image, dict):
+        ld_image = ld_image.get("url")
+
+    result["title"] = ld_article.get("headline") or next((meta[k] for k in TITLE_META if k in meta), None) or h1 or page_title
+    result["authors"] = list(dict.fromkeys(
+        names(ld_article.get("author"))
+        or [name for k in AUTHOR_META if k in meta and not meta[k].startswith("http") for name in names(meta[k])]
+        or [name for name in rel_authors if name]
+    ))
+    result["time"] = parse_datetime(ld_article.get("datePublished") or next((meta[k] for k in DATE_META if k in meta), None) or time_tag)
+    image = ld_image if isinstance(ld_image, str) else next((meta[k] for k in IMAGE_META if k in meta), None)
+    result["imageUrl"] = urljoin(url, image) if image else None
+
+    # body: the container holding the most paragraph text, unless JSON-LD already carries it
+    body = ld_article.get("articleBody")
+    if isinstance(body, str) and len(body) >= MIN_CONTENT_CHARS:
+        result["content"] = body.strip()
+    elif paragraphs:
+        best = max(paragraphs.values(), key=lambda texts: sum(len(text) for text in texts))
+        result["content"] = "\n\n".join(best)
+    return result
+
+def extract_newspaper(html, url):
+    from newspaper import Article as NewsArticle
+    parsed_article = NewsArticle(url)
+    parsed_article.download(input_html=html)
+    parsed_article.parse()
+    return {
+        "title": parsed_article.title,
+        "authors": parsed_article.authors,
+        "time": parsed_article.publish_date,
+        "content": parsed_article.text,
+        "imageUrl": parsed_article.top_image,
+    }
+
+ENGINES = {
+    "lxml": extract_lxml,
+    "newspaper": extract_newspaper,
+}
+
+def register_engine(name, extractor):
+    """extractor(html, url) -> dict with title, authors, time, content, imageUrl"""
+    ENGINES[name] = extractor
+
+
+def extract(html, url, engine=None, fallback="newspaper"):
+    engine = engine or DEFAULT_ENGINE
+    result = ENGINES[engine](html, url)
+    if fallback and engine != fallback:
+        result = apply_fallback(result, html, url, fallback)
+    return result
+
+def apply_fallback(result, html, url, fallback="newspaper"):
+    """Re-extract with the fallback engine when the first pass missed the body."""
+    if len(result.get("content") or "") < MIN_CONTENT_CHARS:
+        try:
+            fallback_result = ENGINES[fallback](html, url)
+        except Exception as e:
+            print(f"Fallback extraction failed for {url}: {e}")
+            return result
+        # keep metadata the fast engine found, take the body from the fallback
+        for key, value in fallback_result.items():
+            if key == "content" or not result.get(key):
+                result[key] = value
+    return result
+
+def fetch_html(url, session=None, deadline=None):
+    response = (session or requests).get(url, timeout=request_timeout(deadline), headers={"User-Agent": USER_AGENT})
+    response.raise_for_status()
+    return response.text
+
+def fetch_and_extract(url, session=None, engine=None, deadline=None):
+    return extract(fetch_html(url, session=session, deadline=deadline), url, engine=engine)
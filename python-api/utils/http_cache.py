@@ -0,0 +1,86 @@
+import hashlib
+import json
+from flask import current_app, make_response, request
+from .ttl_cache import TTLCache
+
+# Conditional requests for the dashboard endpoints. A cacheable response gets
+# a strong ETag derived from what it was built from: the snapshot or cache
+# entry version plus the request options. A client that sends the tag back in
+# If-None-Match gets a 304 before anything is clustered, searched or
+# summarized. Built bodies are kept per tag so that a tag keeps naming the
+# same bytes (summaries are not deterministic), and compressed variants carry
+# their own tag, "<tag>-gzip" or "<tag>-br", as strong validators require.
+
+DAILY_NEWS_CACHE_CONTROL = "public, max-age=600, stale-while-revalidate=3600"   # snapshots change at most every 12h
+LOCAL_NEWS_CACHE_CONTROL = "public, max-age=600, stale-while-revalidate=3600"
+LOCAL_SEARCH_CACHE_CONTROL = "public, max-age=300"                               # NewsAPI fallback, refreshed every 30 min
+SOURCES_CACHE_CONTROL = "public, max-age=86400"
+TOPICS_CACHE_CONTROL = "private, max-age=900"                                    # per-user topic lists
+NO_STORE = "no-store"
+
+BODY_TTL = 12 * 3600
+ENCODINGS = ("gzip", "br")
+
+response_bodies = TTLCache(ttl=BODY_TTL, maxsize=128)
+
+
+class Uncacheable(Exception):
+    # raised from inside the body cache so an error response isn't stored under the tag
+    def __init__(self, response):
+        self.response = response
+
+
+def make_etag(*parts):
+    """Strong, opaque tag for a response built from `parts` (versions, options, ...)."""
+    key = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+def matching_etag(etag):
+    """The tag of ours the client already holds (any encoding variant), or None."""
+    if_none_match = request.if_none_match
+    if if_none_match.star_tag:
+        return etag
+    for tag in (etag, *(f"{etag}-{encoding}" for encoding in ENCODINGS)):
+        if if_none_match.contains(tag):
+            return tag
+    return None
+
+def variant_etag(response, encoding):
+    # called after compressing: the compressed bytes are a different representation
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f"{etag}-{encoding}")
+
+def not_modified(etag, cache_control):
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    response.vary.add("Accept-Encoding")
+    return response
+
+def conditional_response(parts, cache_control, build):
+    """
+    304 if the client holds the current version of this response; otherwise
+    the body built by `build()` for this version, built once and reused.
+    Non-200 results are returned as is, uncached and untagged.
+    """
+    etag = make_etag(*parts)
+    held = matching_etag(etag)
+    if held:
+        return not_modified(held, cache_control)
+
+    def render():
+        response = make_response(build())
+        if response.status_code != 200:
+            raise Uncacheable(response)
+        return response.get_data(), response.mimetype
+
+    try:
+        body, mimetype = response_bodies.get_or_set(etag, render)
+    except Uncacheable as e:
+        e.response.headers["Cache-Control"] = NO_STORE
+        return e.response
+    response = current_app.response_class(body, mimetype=mimetype)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    return response
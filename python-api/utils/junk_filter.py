@@ -0,0 +1,296 @@
+import argparse
+import json
+import math
+import os
+import random
+import re
+import zlib
+from collections import Counter
+from threading import Lock
+from urllib.parse import urlsplit
+
+# Crawl-time rejection of pages that aren't news articles: newsletter sign-up
+# pages, puzzles, video and gallery pages, advice columns, sponsored content,
+# section indexes and near-empty bodies. These used to be crawled, stored,
+# tokenized, embedded and clustered before filter_topics threw their topics
+# away. Now they are dropped in two cheap steps:
+#
+#   check_candidate: URL path and feed title rules, before the page is fetched
+#   check_page: title rules plus an optional linear model on the fast
+#               extraction, before the newspaper fallback or the snapshot
+#
+# The model is logistic regression over hashed URL, title and body tokens and
+# a few shape features, stored as JSON in data/junk/model.json and scored in
+# pure Python. It is trained only on hand labels (data/junk/labels.jsonl):
+# the rules already run before it, so learning them back would add nothing.
+# Train it with `python -m utils.junk_filter train`; without a model file only
+# the rules run. Reject counts per seed are kept in the discovery state
+# (`python -m utils.junk_filter report`).
+
+current_dir = os.path.dirname(__file__)
+JUNK_DIR = os.path.normpath(os.path.join(current_dir, '../data/junk'))
+MODEL_PATH = os.environ.get("BITEWISE_JUNK_MODEL_PATH") or os.path.join(JUNK_DIR, 'model.json')
+LABELS_PATH = os.path.join(JUNK_DIR, 'labels.jsonl')
+SNAPSHOT_PATHS = [
+    os.path.normpath(os.path.join(current_dir, '../data/articles_data.json')),
+    os.path.normpath(os.path.join(current_dir, '../data/local_articles_data.json')),
+]
+
+MIN_ARTICLE_CHARS = 300          # bodies shorter than this, after the fallback, are not articles
+HASH_BUCKETS = 1 << 14
+CONTENT_SAMPLE_CHARS = 1000      # the model sees the opening of the body only
+SHORT_LINE_CHARS = 40
+DEFAULT_THRESHOLD = 0.8          # favour keeping a real article over dropping junk
+
+# (reason, pattern) over the lowercased URL path
+URL_RULES = [
+    ("newsletter", re.compile(r"/newsletters?(/[^/]+)?/?$")),   # sign-up pages; dated newsletter issues are articles
+    ("signup", re.compile(r"/(subscribe|subscription|sign-?up|login|register|account)(/|$)")),
+    ("puzzle", re.compile(r"/(crosswords?|puzzles?|games|sudoku|wordle|spelling-bee)(/|$)")),
+    ("video", re.compile(r"/(videos?|reel)(/|$)")),
+    ("podcast", re.compile(r"/(podcasts?|audio)(/|$)")),
+    ("gallery", re.compile(r"/(gallery|galleries|photos|slideshows?|pictures)(/|$)")),
+    ("advice", re.compile(r"/(dear-[a-z]+|ask-[a-z]+|horoscopes?|advice)(/|$)")),
+    ("sponsored", re.compile(r"/(sponsored|paid-post|partner-content|brandstudio|coupons?|deals)(/|$)")),
+    ("index", re.compile(r"^/(tags?|topics?|authors?|category|categories|section|search|about|contact|privacy|terms)(/|$)")),
+]
+# (reason, pattern) over the lowercased title
+TITLE_RULES = [
+    ("signup", re.compile(r"^(sign up|subscribe)\b|newsletter sign ?up|\bnewsletter$")),
+    ("puzzle", re.compile(r"\b(crossword|sudoku|wordle)\b")),
+    ("advice", re.compile(r"^(dear|ask) [a-z]+:|\bdear prudence\b|\bhoroscopes?\b")),
+    ("video", re.compile(r"^video:")),
+]
+TOKEN = re.compile(r"[a-z][a-z0-9]+")
+
+
+def url_path(url):
+    path = urlsplit(url or "").path.lower()
+    return re.sub(r"/{2,}", "/", path) or "/"
+
+def rule_reason(url, title=None):
+    path = url_path(url)
+    for reason, pattern in URL_RULES:
+        if pattern.search(path):
+            return reason
+    title = (title or "").strip().lower()
+    for reason, pattern in TITLE_RULES:
+        if title and pattern.search(title):
+            return reason
+    return None
+
+
+def short_line_ratio(content):
+    # menus, bylines and calls to action extract as many short lines
+    lines = [line for line in (content or "").splitlines() if line.strip()]
+    if not lines:
+        return 1.0
+    return sum(len(line) < SHORT_LINE_CHARS for line in lines) / len(lines)
+
+def page_features(url, title, content):
+    """(hashed token buckets, numeric features) shared by training and scoring."""
+    content = content or ""
+    tokens = (
+        [f"u:{token}" for token in TOKEN.findall(url_path(url))]
+        + [f"t:{token}" for token in TOKEN.findall((title or "").lower())]
+        + [f"c:{token}" for token in TOKEN.findall(content[:CONTENT_SAMPLE_CHARS].lower())]
+    )
+    buckets = Counter(zlib.crc32(token.encode("utf-8")) % HASH_BUCKETS for token in tokens)
+    numeric = [
+        math.log1p(len(content)) / 10,
+        short_line_ratio(content),
+        url_path(url).count("/") / 10,
+    ]
+    return buckets, numeric
+
+
+class JunkModel:
+    def __init__(self, weights, numeric_weights, bias, threshold=DEFAULT_THRESHOLD):
+        self.weights = weights                  # {bucket: weight}, nonzero only
+        self.numeric_weights = numeric_weights
+        self.bias = bias
+        self.threshold = threshold
+
+    def probability(self, url, title, content):
+        buckets, numeric = page_features(url, title, content)
+        # binary token presence, matching how the model was trained
+        score = self.bias + sum(self.weights.get(bucket, 0.0) for bucket in buckets)
+        score += sum(w * x for w, x in zip(self.numeric_weights, numeric))
+        return 1 / (1 + math.exp(-max(-30.0, min(30.0, score))))
+
+    def is_junk(self, url, title, content):
+        return self.probability(url, title, content) >= self.threshold
+
+    def to_json(self):
+        return {
+            "hash_buckets": HASH_BUCKETS,
+            "weights": {str(bucket): weight for bucket, weight in self.weights.items()},
+            "numeric_weights": self.numeric_weights,
+            "bias": self.bias,
+            "threshold": self.threshold,
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        if data.get("hash_buckets") != HASH_BUCKETS:
+            raise ValueError("junk model was trained with a different feature hashing")
+        weights = {int(bucket): weight for bucket, weight in data["weights"].items()}
+        return cls(weights, data["numeric_weights"], data["bias"], data.get("threshold", DEFAULT_THRESHOLD))
+
+_model = None
+_model_loaded = False
+_model_lock = Lock()
+
+def get_model():
+    global _model, _model_loaded
+    with _model_lock:
+        if not _model_loaded:
+            _model_loaded = True
+            if os.path.exists(MODEL_PATH):
+                try:
+                    with open(MODEL_PATH, 'r', encoding='utf-8') as f:
+                        _model = JunkModel.from_json(json.load(f))
+                except (ValueError, KeyError) as e:
+                    print(f"Ignoring junk model at {MODEL_PATH}: {e}")
+        return _model
+
+
+def check_candidate(url, title=None):
+    """Reason to skip a discovered link without fetching it, or None."""
+    return rule_reason(url, title)
+
+def check_page(url, title, content):
+    """
+    Reason to drop a fetched page, or None. Run on the fast extraction; a
+    body too short to judge is left to the fallback extractor and
+    check_length.
+    """
+    reason = rule_reason(url, title)
+    if reason:
+        return reason
+    model = get_model()
+    if model and len(content or "") >= MIN_ARTICLE_CHARS and model.is_junk(url, title, content):
+        return "model"
+    return None
+
+def check_length(content):
+    return "too_short" if len((content or "").strip()) < MIN_ARTICLE_CHARS else None
+
+
+### TRAINING ###
+
+def load_records(paths):
+    records = []
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):  # local snapshot: {city: [articles]}
+            data = [article for articles in data.values() for article in articles]
+        records.extend(data)
+    return records
+
+def load_labels(path=LABELS_PATH):
+    """
+    Hand labels by url, one {"url", "junk": true|false, "title", "content"}
+    per line. Junk pages never reach a snapshot, so a label carries its own
+    page; title and content may be left out for articles that are in one.
+    """
+    labels = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    labels[entry["url"]] = entry
+    return labels
+
+def label_records(records, labels):
+    """(page, is junk) pairs for the hand-labelled pages the model would score."""
+    pages = {record.get("url"): record for record in records if record.get("url")}
+    labeled = []
+    for url, label in labels.items():
+        page = {"url": url, **pages.get(url, {}), **{key: label[key] for key in ("title", "content") if key in label}}
+        # shorter bodies are dropped by check_length and never reach the model
+        if len(page.get("content") or "") < MIN_ARTICLE_CHARS:
+            continue
+        labeled.append((page, bool(label["junk"])))
+    return labeled
+
+def feature_matrix(records):
+    from scipy.sparse import csr_matrix, hstack
+    rows, cols, numeric = [], [], []
+    for i, record in enumerate(records):
+        buckets, values = page_features(record.get("url"), record.get("title"), record.get("content"))
+        rows.extend([i] * len(buckets))
+        cols.extend(buckets)
+        numeric.append(values)
+    tokens = csr_matrix(([1.0] * len(rows), (rows, cols)), shape=(len(records), HASH_BUCKETS))
+    return hstack([tokens, csr_matrix(numeric)]).tocsr()
+
+def precision_recall(model, labeled):
+    true_positive = false_positive = false_negative = 0
+    for record, junk in labeled:
+        predicted = model.is_junk(record.get("url"), record.get("title"), record.get("content"))
+        true_positive += predicted and junk
+        false_positive += predicted and not junk
+        false_negative += junk and not predicted
+    precision = true_positive / (true_positive + false_positive) if true_positive + false_positive else 0.0
+    recall = true_positive / (true_positive + false_negative) if true_positive + false_negative else 0.0
+    return precision, recall
+
+def train(snapshot_paths=SNAPSHOT_PATHS, labels_path=LABELS_PATH, output_path=MODEL_PATH, threshold=DEFAULT_THRESHOLD, holdout=0.2, seed=0):
+    from sklearn.linear_model import LogisticRegression
+    labels = load_labels(labels_path)
+    if not labels:
+        raise ValueError(f"no hand labels in {labels_path}; the model is trained on labelled pages only")
+    labeled = label_records(load_records(snapshot_paths), labels)
+    random.Random(seed).shuffle(labeled)
+    junk_count = sum(junk for _, junk in labeled)
+    if junk_count == 0 or junk_count == len(labeled):
+        raise ValueError(f"need both junk and article labels, got {junk_count} junk of {len(labeled)} usable pages")
+
+    split = int(len(labeled) * (1 - holdout))
+    train_set, test_set = labeled[:split], labeled[split:]
+    classifier = LogisticRegression(C=1.0, class_weight="balanced", max_iter=1000)
+    classifier.fit(feature_matrix([record for record, _ in train_set]), [junk for _, junk in train_set])
+
+    coefficients = classifier.coef_[0]
+    weights = {bucket: float(coefficients[bucket]) for bucket in range(HASH_BUCKETS) if abs(coefficients[bucket]) > 1e-6}
+    model = JunkModel(weights, [float(w) for w in coefficients[HASH_BUCKETS:]], float(classifier.intercept_[0]), threshold)
+    precision, recall = precision_recall(model, test_set)
+    print(f"Trained on {len(train_set)} pages ({junk_count} junk overall); held-out precision {precision:.2f}, recall {recall:.2f} at {threshold}")
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(model.to_json(), f)
+    os.replace(output_path + ".tmp", output_path)
+    return model
+
+
+def report(state):
+    """Per-seed reject counts from the discovery state, most rejected first."""
+    rows = [(seed, entry["junk_rejects"]) for seed, entry in state.items() if entry.get("junk_rejects")]
+    for seed, rejects in sorted(rows, key=lambda row: -sum(row[1].values())):
+        reasons = ", ".join(f"{reason} {count}" for reason, count in sorted(rejects.items(), key=lambda item: -item[1]))
+        print(f"{sum(rejects.values()):>5}  {seed}  ({reasons})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl-time junk page filter")
+    parser.add_argument("command", choices=["train", "report"])
+    parser.add_argument("--snapshots", nargs="+", default=SNAPSHOT_PATHS)
+    parser.add_argument("--labels", default=LABELS_PATH)
+    parser.add_argument("--output", default=MODEL_PATH)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    if args.command == "train":
+        train(args.snapshots, args.labels, args.output, args.threshold)
+    else:
+        from .discovery import load_state
+        report(load_state())
+
+if __name__ == "__main__":
+    main()
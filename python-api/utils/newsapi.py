@@ -1,19 +1,16 @@
 import requests
 from datetime import datetime, timedelta
 import json
-import re
-import random
 from .query_processing import parse_query
-import pandas as pd
+from .dedup import canonicalize_url, dedupe_articles
+from .search_index import search_local, MIN_LOCAL_RESULTS
+from .vector_index import search_topics, TOPIC_RESULTS
+from .enrichment import enrich_records
 from . import config 
 
 # API key and global vars
 api_key =  config.NEWSAPI_API_KEY
 BASE_URL = "https://newsapi.org/v2"
-bias_data_path = "data/mediabias/bias.csv"
-bias_data = pd.read_csv(bias_data_path)
-bias_lookup = bias_data.set_index("news_source")["rating"].to_dict()
-bias_translation = {'left' : 0, 'left-center' : 1, 'center' : 2, 'right-center' : 3, 'right' : 4, 'Unknown' : 5}
 
 # DEFINE FUNCTIONS TO CREATE API REQUESTS
 def fetch_search_results(query=None, from_date=None, to_date=None, language=None, sort_by=None, page_size=100, page=1, domains=None, exclude_domains=None):
@@ -77,29 +74,6 @@ def make_request(url, params):
         print(f"Request failed: {e}")
         return None
 
-def char_length(content):
-    if not content:
-        return None
-    match = re.search(r"\[\+(\d+)\s+chars\]", content)
-    additional_chars = 0
-    if match:
-        additional_chars = int(match.group(1))
-    intro_text_length = len(content.split("[+")[0].strip())
-    total_character_count = intro_text_length + additional_chars
-    return total_character_count
-
-def estimate_reading_time(char_length):
-    if not char_length:
-        return None
-    word_count = char_length / 5 # approximate
-    mins = word_count / 250  # 250 words per minute
-    if mins < 2:
-        return 0
-    elif 2 <= mins <= 7:
-        return 1
-    else:
-        return 2
-
 def aggregate_eliminate_dups(responses):
     """
     Aggregate results from multiple API responses, separating articles in preferred user domains
@@ -111,7 +85,7 @@ def aggregate_eliminate_dups(responses):
     for response in responses:
         if response and "articles" in response:
             for article in response["articles"]:
-                article_url = article.get("url")
+                article_url = canonicalize_url(article.get("url"))
 
                 if (article.get("name") == "[Removed]"):
                     continue
@@ -122,18 +96,11 @@ def aggregate_eliminate_dups(responses):
 
                 # Mark URL as seen and add the article to the list
                 seen_urls.add(article_url)
-                
-                # bias rating
-                source_name = article.get("source", {}).get("name", None)
-                article["biasRating"] = bias_translation[bias_lookup.get(source_name, 'Unknown')]
-
-                # add char length and read time
-                chars = char_length(article.get("content", None))
-                article["charLength"] = chars
-                article["readTime"] = estimate_reading_time(chars)
                 general_articles.append(article)
 
-    return general_articles
+    # collapse the same story syndicated across outlets, then add bias, length and
+    # read time to the survivors (local results arrive already enriched)
+    return enrich_records(dedupe_articles(general_articles, text_fields=("title", "description")), score_readability=False)
 
 
 ### SEARCH PROCEDURE ###
@@ -143,16 +110,21 @@ def user_search(question, user_preferences):
     # step 1: parse question
     question = parse_query(question)
 
-    # step 2: set API args
+    # step 2: answer from the local crawl index first
+    local_results = search_local(question, user_preferences)
+    if len(local_results) >= MIN_LOCAL_RESULTS:
+        return aggregate_eliminate_dups([{"articles": local_results}])
+
+    # step 3: set API args
     from_date = (datetime.now() - timedelta(days=8)).strftime('%Y-%m-%d') # results in past week
     language = "en" # defaulting english
 
-    # step 3: make API requests
+    # step 4: make API requests (local recall was low)
     response_popularity = fetch_search_results(question, from_date=from_date, language=language, sort_by="popularity")
     response_relevancy = fetch_search_results(question, from_date=from_date, language=language, sort_by="relevancy")
     
-    # step 4: aggregate results
-    responses = [response_popularity, response_relevancy]
+    # step 5: aggregate results, local hits first
+    responses = [{"articles": local_results}, response_popularity, response_relevancy]
     aggregated_results = aggregate_eliminate_dups(responses)
 
     return aggregated_results
@@ -182,13 +154,18 @@ def get_top_unique_sources(results, max_results=5):
 ### GETS DAILY ARTICLES BASED ON USER'S TOPICS OF INTEREST ###
 def get_topics_articles(topics, search_preferences):
 
+    # every topic is matched against the local embedding index in one batch;
+    # only topics without enough semantic hits fall back to a NewsAPI search
+    local_results = search_topics(topics)
     results = []
 
     for topic in topics:
-        topic_search_results = user_search(topic, search_preferences)
+        topic_search_results = get_top_unique_sources(local_results.get(topic, []), TOPIC_RESULTS)
+        if len(topic_search_results) < TOPIC_RESULTS:
+            topic_search_results = get_top_unique_sources(user_search(topic, search_preferences), TOPIC_RESULTS)
         topic_result = {
             "topic": topic,
-            "results": random.sample(get_top_unique_sources(topic_search_results), 3)
+            "results": topic_search_results
         }
     
         results.append(topic_result)
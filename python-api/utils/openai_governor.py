@@ -0,0 +1,210 @@
+import random
+import time
+from collections import deque
+from threading import BoundedSemaphore, Lock
+import openai
+
+# Client-side limits per model (or call family). Calls share one governor per
+# process so a burst of dashboard/search traffic queues here instead of
+# turning into a cascade of 429s from the provider.
+RATE_LIMITS = {
+    "gpt-4o-mini": {"rpm": 500, "tpm": 200000, "concurrency": 8},
+    "tts-1": {"rpm": 50, "tpm": None, "concurrency": 4},
+    "podcast": {"rpm": 10, "tpm": None, "concurrency": 2},
+}
+DEFAULT_LIMITS = {"rpm": 60, "tpm": None, "concurrency": 4}
+
+MAX_RETRIES = 4
+BASE_DELAY = 0.5    # seconds, doubled on each retry
+MAX_DELAY = 20.0
+QUEUE_TIMEOUT = 60.0  # max seconds a call may wait for a rate-limit slot
+LATENCY_WINDOW = 500  # recent samples kept for percentiles
+
+
+### TYPED ERRORS ###
+class LLMError(Exception):
+    """Base class for failures talking to the model provider."""
+    status_code = 502
+
+class LLMRateLimitError(LLMError):
+    """Provider kept returning 429, or the local queue wait timed out."""
+    status_code = 503
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class LLMTimeoutError(LLMError):
+    status_code = 504
+
+class LLMUnavailableError(LLMError):
+    """Connection errors or 5xx responses that persisted through retries."""
+    status_code = 503
+
+class LLMRequestError(LLMError):
+    """Non-retryable request errors (bad request, auth, content policy)."""
+    status_code = 502
+
+
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)
+
+
+class TokenBucket:
+    """Refills rate_per_minute units per minute, up to one minute's worth."""
+    def __init__(self, rate_per_minute):
+        self.capacity = float(rate_per_minute)
+        self.tokens = float(rate_per_minute)
+        self.fill_rate = rate_per_minute / 60.0
+        self.updated = time.monotonic()
+        self.lock = Lock()
+
+    def acquire(self, amount, deadline):
+        amount = min(float(amount), self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.fill_rate
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LLMRateLimitError("Timed out waiting for a rate limit slot", retry_after=wait)
+            time.sleep(min(wait, remaining))
+
+
+class ModelLimiter:
+    def __init__(self, name, rpm=None, tpm=None, concurrency=4):
+        self.name = name
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.slots = BoundedSemaphore(concurrency)
+        self.metrics_lock = Lock()
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.queue_waits = deque(maxlen=LATENCY_WINDOW)
+
+    def acquire(self, estimated_tokens, timeout=QUEUE_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        if self.requests:
+            self.requests.acquire(1, deadline)
+        if self.tokens and estimated_tokens:
+            self.tokens.acquire(estimated_tokens, deadline)
+        if not self.slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            raise LLMRateLimitError(f"Timed out waiting for a free {self.name} slot")
+
+    def record(self, latency=None, queue_wait=None, error=False, retry=False):
+        with self.metrics_lock:
+            if latency is not None:
+                self.calls += 1
+                self.latencies.append(latency)
+            if queue_wait is not None:
+                self.queue_waits.append(queue_wait)
+            if error:
+                self.errors += 1
+            if retry:
+                self.retries += 1
+
+    def snapshot(self):
+        with self.metrics_lock:
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "retries": self.retries,
+                "latency_seconds": summarize_samples(self.latencies),
+                "queue_wait_seconds": summarize_samples(self.queue_waits),
+            }
+
+
+def summarize_samples(samples):
+    if not samples:
+        return {"avg": 0.0, "p50": 0.0, "p95": 0.0}
+    ordered = sorted(samples)
+    return {
+        "avg": sum(ordered) / len(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+    }
+
+def backoff_delay(attempt, error=None):
+    # honor the provider's Retry-After when present, else jittered exponential backoff
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(MAX_DELAY, float(retry_after))
+        except ValueError:
+            pass
+    return random.uniform(0, min(MAX_DELAY, BASE_DELAY * (2 ** attempt)))
+
+def to_typed_error(error):
+    if isinstance(error, LLMError):
+        return error
+    if isinstance(error, openai.RateLimitError):
+        return LLMRateLimitError(f"OpenAI rate limit: {error}")
+    if isinstance(error, openai.APITimeoutError):
+        return LLMTimeoutError(f"OpenAI request timed out: {error}")
+    if isinstance(error, (openai.APIConnectionError, openai.InternalServerError)):
+        return LLMUnavailableError(f"OpenAI unavailable: {error}")
+    return LLMRequestError(f"OpenAI request failed: {error}")
+
+
+class OpenAIGovernor:
+    def __init__(self, limits=RATE_LIMITS):
+        self.limits = limits
+        self.limiters = {}
+        self.lock = Lock()
+
+    def limiter(self, limit_key):
+        with self.lock:
+            if limit_key not in self.limiters:
+                self.limiters[limit_key] = ModelLimiter(limit_key, **self.limits.get(limit_key, DEFAULT_LIMITS))
+            return self.limiters[limit_key]
+
+    def call(self, limit_key, fn, *args, estimated_tokens=0, retries=MAX_RETRIES, retry_on=RETRYABLE_ERRORS, **kwargs):
+        """
+        Run fn(*args, **kwargs) under the limits for limit_key, retrying
+        transient failures. OpenAI errors are raised as an LLMError subclass;
+        any other exception from fn propagates unchanged.
+        """
+        limiter = self.limiter(limit_key)
+        attempt = 0
+        while True:
+            queued_at = time.perf_counter()
+            limiter.acquire(estimated_tokens)
+            started_at = time.perf_counter()
+            limiter.record(queue_wait=started_at - queued_at)
+            try:
+                result = fn(*args, **kwargs)
+            except retry_on as e:
+                limiter.record(error=True)
+                if attempt >= retries:
+                    raise to_typed_error(e) from e
+                delay = backoff_delay(attempt, e)
+                print(f"{limit_key} call failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                limiter.record(retry=True)
+                attempt += 1
+                time.sleep(delay)
+                continue
+            except Exception as e:
+                limiter.record(error=True)
+                # only provider errors become LLMErrors; bugs and tool failures (podcastfy, S3) keep their type
+                if isinstance(e, openai.OpenAIError):
+                    raise to_typed_error(e) from e
+                raise
+            finally:
+                limiter.slots.release()
+            limiter.record(latency=time.perf_counter() - started_at)
+            return result
+
+    def metrics(self):
+        with self.lock:
+            limiters = list(self.limiters.values())
+        return {limiter.name: limiter.snapshot() for limiter in limiters}
+
+
+governor = OpenAIGovernor()
@@ -1,26 +1,26 @@
 import os
 from openai import OpenAI
 from . import config
-import io
-import sys
 import re
 import textstat
 from pathlib import Path
 from podcastfy.client import generate_podcast
-import boto3
 import uuid
 from typing import Dict
+from .compression import compress_articles
+import time
+from .openai_governor import governor
+from .tts import stream_speech
+from .audio_store import upload_stream, upload_file_streaming
+from .prompt_templates import get_template, record_usage
+from .prompt_budget import build_articles_prompt, count_tokens, truncate_to_tokens, INDIVIDUAL_TOKEN_BUDGET, COLLECTION_TOKEN_BUDGET, DAILY_TOKEN_BUDGET, PODCAST_TOKEN_BUDGET, FILTER_ITEM_TOKENS
 
 os.environ['OPENAI_API_KEY'] = config.OPENAI_API_KEY
 OpenAI.api_key = config.OPENAI_API_KEY 
 
-S3_BUCKET = "bitewise-podcasts"
-S3_REGION = "us-east-1"  
-S3_BASE_URL = f"https://{S3_BUCKET}.s3.amazonaws.com"
-
-client = OpenAI(api_key=config.OPENAI_API_KEY)
-
-s3_client = boto3.client('s3', aws_access_key_id=config.AWS_ACCESS_KEY_ID, aws_secret_access_key=config.AWS_SECRET_ACCESS_KEY, region_name=S3_REGION)
+# retries are handled by the governor, not the SDK
+client = OpenAI(api_key=config.OPENAI_API_KEY, max_retries=0)
+COMPLETION_TOKEN_ESTIMATE = 600  # reserved against the tokens-per-minute limit
 
 # FORMAT FOR USER PREFERENCES:
 # user_preferences = {
@@ -30,18 +30,38 @@ s3_client = boto3.client('s3', aws_access_key_id=config.AWS_ACCESS_KEY_ID, aws_s
 #     "jargon_allowed": True # options: {True, False}
 # }
 
+# Streams a generated file to S3 and removes the local copy
+# Returns None if the upload failed (the local file is kept in that case)
 def upload_to_s3(file_path, folder="podcasts"):
-    file_name = file_path.split("/")[-1]
+    file_name = os.path.basename(file_path)
     s3_file_path = f"{folder}/{file_name}"
     try:
-      s3_client.upload_file(file_path, S3_BUCKET, s3_file_path)
-      return f"{S3_BASE_URL}/{s3_file_path}"
+      s3_url = upload_file_streaming(file_path, s3_file_path)
     except Exception as e: 
-      return f"Error uploading to S3: {str(e)}"
-
+      print(f"Error uploading to S3: {str(e)}")
+      return None
+    os.remove(file_path)
+    return s3_url
+
+
+# Runs a chat completion for a prompt template through the shared rate limiter
+# Raises an LLMError subclass if the call fails after retries
+def chat_completion(template, messages, model="gpt-4o-mini", **kwargs):
+    estimated_tokens = sum(count_tokens(message["content"]) for message in messages) + COMPLETION_TOKEN_ESTIMATE
+    start = time.perf_counter()
+    response = governor.call(
+        model,
+        client.chat.completions.create,
+        model=model,
+        messages=messages,
+        estimated_tokens=estimated_tokens,
+        **kwargs,
+    )
+    record_usage(template, response, time.perf_counter() - start)
+    return response
 
 # Summarizes an individual article based on user preferences
-def generate_summary_individual(input_text, user_preferences):
+def generate_summary_individual(input_text, user_preferences, readability=None):
     # model tuning parameters
     temperature = 0
     top_p = 0
@@ -49,9 +69,17 @@ def generate_summary_individual(input_text, user_preferences):
     presence_penalty = 0
     max_tokens = 100
 
-    fre_score = textstat.flesch_reading_ease(input_text)
-    fkgl_score = textstat.flesch_kincaid_grade(input_text)
-    readability_score = textstat.text_standard(input_text)
+    input_text, _ = truncate_to_tokens(input_text, INDIVIDUAL_TOKEN_BUDGET)
+    # precomputed at ingest for crawled articles; scored here only for fetched text
+    if not isinstance(readability, dict) or not all(key in readability for key in ("fleschReadingEase", "fleschKincaidGrade", "textStandard")):
+        readability = {
+            "fleschReadingEase": textstat.flesch_reading_ease(input_text),
+            "fleschKincaidGrade": textstat.flesch_kincaid_grade(input_text),
+            "textStandard": textstat.text_standard(input_text),
+        }
+    fre_score = readability["fleschReadingEase"]
+    fkgl_score = readability["fleschKincaidGrade"]
+    readability_score = readability["textStandard"]
 
     summary_instruction = ""
 
@@ -85,57 +113,38 @@ def generate_summary_individual(input_text, user_preferences):
     # elif (user_preferences['length'] == 'long'):
     #     max_tokens = 500
     
-    prompt = f"""
-      Summarize the following article based on user preferences:
-      - Length: {user_preferences.get('length', 'Short')}
-      - Tone: {user_preferences.get('tone', 'Formal')}
-
-      {summary_instruction}
-
-      This article has the following readability metrics:
-      - **Flesch Reading Ease Score**: {fre_score}
-      - **Flesch-Kincaid Grade Level**: {fkgl_score}
-      - **Initial Readability Classification**: {readability_score}
-
-      Please follow these instructions:
-      1️⃣ **Generate a structured summary** based on the user's selected format.
-      2️⃣ **Verify and adjust the readability classification** based on the complexity of the text. 
-        - Use the provided metrics as a guideline.
-        - If the text has long sentences, advanced vocabulary, or technical terms, adjust accordingly.
-
-      **Formatting Requirements:**
-      Your response **must** follow this exact structure:
-      ---
-      **Summary**:
-      [Generated summary]
-      **Reading Difficulty**:
-      [Easy/Medium/Hard]
-      ---
-
-      Article Content:
-      {input_text}
-    """
-    
-    
+    template = get_template("summary_individual")
+    messages = template.render(
+        length=user_preferences.get('length', 'Short'),
+        tone=user_preferences.get('tone', 'Formal'),
+        summary_instruction=summary_instruction,
+        fre_score=fre_score,
+        fkgl_score=fkgl_score,
+        readability_score=readability_score,
+        input_text=input_text,
+    )
+
+    response = chat_completion(
+        template,
+        messages,
+        temperature=temperature,
+        top_p=top_p,
+        frequency_penalty=frequency_penalty,
+        presence_penalty=presence_penalty,
+        # max_tokens=max_tokens
+    )
+    summary = response.choices[0].message.content.strip()
+
+    # the audio is optional; a TTS or upload failure still returns the summary
+    filename= f"{uuid.uuid4()}.mp3"
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
-            top_p=top_p,
-            frequency_penalty=frequency_penalty,
-            presence_penalty=presence_penalty,
-            # max_tokens=max_tokens
-        )
-        summary = response.choices[0].message.content.strip()
-
-        filename= f"{uuid.uuid4()}.mp3"
-        result = generate_audio_from_article(summary, filename)
-
-        result["summary"] = summary
-        return result
+      result = generate_audio_from_article(summary, filename)
     except Exception as e:
-        return {"error": f"An error occurred: {str(e)}"}
+      print(f"Error generating audio for summary: {e}")
+      result = {"audio_key": None, "s3_url": None}
+
+    result["summary"] = summary
+    return result
 
 # Summarizes multiple articles and gives an overview based on user preferences
 def generate_summary_collection(input_text, user_preferences):
@@ -146,75 +155,56 @@ def generate_summary_collection(input_text, user_preferences):
     presence_penalty = 0
     max_tokens = 100
 
-    prompt = f"""
-      The provided articles are formatted as follows:
-
-      Each article begins with a title enclosed in triple hashtags (###), followed by its content. Articles are separated by two newlines. Example format:
-
-      ### Article Title 1 ###
-      Article content here.
-
-      ### Article Title 2 ###
-      Article content here.
-
-      **Task:**
-      1. Generate a concise, engaging title (4-8 words) that captures the overall theme of the provided articles. The title should be not be overly long or vague.
-      2. Summarize the main topics and themes discussed across all the articles in a cohesive and engaging manner. The summary should be direct, informative, and engaging. Start the summary by directly addressing the topic without referencing the articles themselves.
-      3. Ensure the summary aligns with the following user preferences:
-        - **Length**: {user_preferences.get('length', 'short')}
-        - **Tone**: {user_preferences.get('tone', 'formal')}
-
-      **Formatting Requirement:**  
-      Your response must follow this exact structure:
-      **Title**: [Generated Title]
-      **Summary**:
-      [Generated Summary]
-    """
+    summary_instruction = ""
 
     if (user_preferences['format'] == 'bullets'):
       temperature = 0.3
       top_p = 0.8
       presence_penalty = 0.7
-      prompt += " Format the summary as a list of concise, bullet points that cover key content and understandings."
+      summary_instruction = "Format the summary as a list of concise, bullet points that cover key content and understandings."
     elif (user_preferences['format'] == 'analysis'):
       temperature = 0.6
       top_p = 1
       frequency_penalty = 0.4
-      prompt += " Format the summary as a thoughtful analysis."
+      summary_instruction = "Format the summary as a thoughtful analysis."
     elif (user_preferences['format'] == 'quotes'):
       temperature = 0.1
       top_p = 0.6
       frequency_penalty = 0
-      prompt += " Format the summary by extracting direct quotes from the articles provided, and then commenting on the quotes."
+      summary_instruction = "Format the summary by extracting direct quotes from the articles provided, and then commenting on the quotes."
     else: #default is highlight summary
       temperature = 0.4
       top_p = 0.9
       frequency_penalty = 0.3
-      prompt += " Format the summary as a highlight summary."
+      summary_instruction = "Format the summary as a highlight summary."
 
     if (not user_preferences.get('jargon_allowed', True)):
-      prompt += " Use clear, simple language and avoid complicated jargon."
-    prompt += f":\n\n{input_text}"
+      summary_instruction += " Use clear, simple language and avoid complicated jargon."
+
+    # input is normally packed by build_articles_prompt already; this only guards raw callers
+    input_text, _ = truncate_to_tokens(input_text, COLLECTION_TOKEN_BUDGET)
+    template = get_template("summary_collection")
+    messages = template.render(
+        length=user_preferences.get('length', 'short'),
+        tone=user_preferences.get('tone', 'formal'),
+        summary_instruction=summary_instruction,
+        input_text=input_text,
+    )
     
     # if (user_preferences['length'] == 'medium'):
     #     max_tokens = 250
     # elif (user_preferences['length'] == 'long'):
     #     max_tokens = 500
     
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
-            top_p=top_p,
-            frequency_penalty=frequency_penalty,
-            presence_penalty=presence_penalty,
-            # max_tokens=max_tokens
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        return f"An error occurred: {str(e)}"
-
+    response = chat_completion(
+        template,
+        messages,
+        temperature=temperature,
+        top_p=top_p,
+        frequency_penalty=frequency_penalty,
+        presence_penalty=presence_penalty,
+        # max_tokens=max_tokens
+    )
     return response.choices[0].message.content.strip()
 
 # Extracts the summary text from the full summary response (removes **Summary** and **Reading Difficulty** labels)
@@ -225,28 +215,33 @@ def extract_summary_text(full_summary):
         return match.group(1).strip()
     return full_summary.strip()  # fallback to full text if pattern not found
 
-# Generates audio file based on given text using TTS
+# Generates audio based on given text using TTS and streams it straight to S3
 def generate_audio_from_article(text: str, filename: str = "text-to-speech.mp3"):
-    
-    audio_dir = Path(__file__).parent.parent / "data/tts"
-    speech_file_path = str(audio_dir / filename)
     summary_text = extract_summary_text(text)
-    response = client.audio.speech.create(
-        model="tts-1",
-        voice="echo",
-        input=summary_text,
-    )
-    
-    # TODO: change to stream to buffer instead of saving locally
-    response.stream_to_file(speech_file_path)
-    s3_url = upload_to_s3(speech_file_path, "ai-summaries") if speech_file_path else None
-    return {"audio_file": speech_file_path, "s3_url": s3_url}
+    audio_key = f"ai-summaries/{filename}"
+    s3_url = upload_stream(stream_speech(client, summary_text), audio_key)
+    return {"audio_key": audio_key, "s3_url": s3_url}
+
+
+# Streams TTS audio for a summary, chunk by chunk, as it is synthesized
+def stream_audio_from_article(text: str):
+    return stream_speech(client, extract_summary_text(text))
+
 
+def podcast_article_header(article_data):
+    header = f"Title: {article_data.get('title')}\n"
+    if article_data.get("authors"):
+        header += f"By {', '.join(article_data['authors'])}\n"
+    if article_data.get("date"):
+        header += f"Published on {article_data['date']}\n\n"
+    return header
 
 # Generates a podcast based on a collection of articles (URLs)
 # Input: list of URLs of articles to be included in the podcast
 # Output: paths to the generated audio file and transcript file
-def generate_podcast_collection(articles: Dict[str, Dict[str, str]]):
+# on_progress(stage, fraction) is called as the generation moves through its stages
+def generate_podcast_collection(articles: Dict[str, Dict[str, str]], on_progress=None):
+    on_progress = on_progress or (lambda stage, fraction: None)
     PROJECT_ROOT = Path(__file__).parent.parent
 
     custom_config = {
@@ -262,46 +257,51 @@ def generate_podcast_collection(articles: Dict[str, Dict[str, str]]):
       }
     }
 
-    article_texts = []
-    for url, article_data in articles.items():
-        if "content" in article_data and article_data["content"]:
-            text = f"Title: {article_data['title']}\n"
-            if article_data.get("authors"):
-                text += f"By {', '.join(article_data['authors'])}\n"
-            if article_data.get("date"):
-                text += f"Published on {article_data['date']}\n\n"
-            text += article_data["content"] + "\n\n"
-            article_texts.append(text)
-
-    if not article_texts:
+    valid_articles = [article_data for article_data in articles.values() if article_data.get("content")]
+    if not valid_articles:
         raise Exception("No valid articles were extracted.")
 
     # merge all articles into one text input for podcastfy function
-    merged_text = "\n\n".join(article_texts)
-
-    stdout_backup = sys.stdout  # backup original stdout
-    sys.stdout = io.StringIO()  # redirect to a StringIO object
-
-
-    audio_path = generate_podcast(
+    merged_text, usage = build_articles_prompt(
+        compress_articles(valid_articles),
+        token_budget=PODCAST_TOKEN_BUDGET,
+        header=podcast_article_header,
+        separator="\n\n\n\n",
+    )
+    print(f"Podcast input: {usage['total_tokens']}/{usage['budget']} tokens across {len(usage['articles'])} articles")
+
+    # podcast runs are long and expensive, so they are rate limited but not retried
+    # generate the transcript first so its path comes back as a return value, then voice it
+    # both steps get the same model and key, or podcastfy falls back to its defaults for the audio step
+    podcast_llm = {"llm_model_name": "gpt-4o-mini", "api_key_label": "OPENAI_API_KEY"}
+    on_progress("transcript", 0.4)
+    transcript_path = governor.call(
+        "podcast",
+        generate_podcast,
         text=merged_text,
-        llm_model_name="gpt-4o-mini",
-        api_key_label="OPENAI_API_KEY",
-        conversation_config=custom_config
+        **podcast_llm,
+        conversation_config=custom_config,
+        transcript_only=True,
+        retries=0,
     )
 
-    # Get the captured output
-    output = sys.stdout.getvalue()
-    sys.stdout = stdout_backup 
-
-    # Extract transcript path using regex
-    match = re.search(r"Transcript saved to (.+)", output)
-    transcript_path = match.group(1) if match else None
+    on_progress("audio", 0.6)
+    audio_path = governor.call(
+        "podcast",
+        generate_podcast,
+        transcript_file=transcript_path,
+        **podcast_llm,
+        conversation_config=custom_config,
+        retries=0,
+    )
 
     # Upload podcast file to S3
+    on_progress("uploading", 0.9)
     s3_url = upload_to_s3(audio_path) if audio_path else None
 
-    return {"audio_file": audio_path, "transcript_file": transcript_path, "s3_url": s3_url}
+    # the local audio file is removed once uploaded, so the result names its S3 key
+    audio_key = f"podcasts/{os.path.basename(audio_path)}" if s3_url else None
+    return {"audio_key": audio_key, "transcript_file": transcript_path, "s3_url": s3_url}
 
 # Summarizes daily news articles
 def daily_news_summary(input_text):
@@ -311,71 +311,32 @@ def daily_news_summary(input_text):
     presence_penalty = 0
     max_tokens = 100
 
-    prompt = f"""
-      The provided articles are formatted as follows:
-
-      Each article begins with a title enclosed in triple hashtags (###), followed by its content. Articles are separated by two newlines. Example format:
-
-      ### Article Title 1 ###
-      Article content here.
-
-      ### Article Title 2 ###
-      Article content here.
-
-      **Task:**
-      Generate a 3-sentence overview of the key topics and themes discussed in the provided articles. Start the summary by overviewing all covered topics in the first sentence with an opening phrase such as "Today, we will cover...". The summary should:
-      1. Be concise, engaging, and informative.
-      2. Cover diverse topics from the articles rather than focusing on a single theme.
-      3. Flow logically, ensuring smooth transitions between sentences.
-      4. Avoid referencing specific articles, titles, or sources.
-    """
-
-    prompt += f":\n\n{input_text}"
-
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
-            top_p=top_p,
-            frequency_penalty=frequency_penalty,
-            presence_penalty=presence_penalty,
-            # max_tokens=max_tokens ### removed max_tokens to allow for longer summaries for now
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        return f"An error occurred: {str(e)}"
-
+    input_text, _ = truncate_to_tokens(input_text, DAILY_TOKEN_BUDGET)
+    template = get_template("daily_news_summary")
+    messages = template.render(input_text=input_text)
+
+    response = chat_completion(
+        template,
+        messages,
+        temperature=temperature,
+        top_p=top_p,
+        frequency_penalty=frequency_penalty,
+        presence_penalty=presence_penalty,
+        # max_tokens=max_tokens ### removed max_tokens to allow for longer summaries for now
+    )
     return response.choices[0].message.content.strip()
 
 # Filters out irrelevant articles using OpenAI
 def filter_irrelevant_articles(articles, query):
-    formatted_articles = "\n".join([f"{article['index']}: {article['text']}" for article in articles])
-
-    prompt = f"""
-    You are an intelligent news classifier. Your task is to filter out articles that do not make sense, based on the given search query, given their title or first sentence.
+    formatted_articles = "\n".join([f"{article['index']}: {truncate_to_tokens(article['text'], FILTER_ITEM_TOKENS)[0]}" for article in articles])
 
-    Here is the search query:
-    "{query}"
+    template = get_template("filter_irrelevant_articles")
+    messages = template.render(query=query, formatted_articles=formatted_articles)
 
-    Below is a list of articles with their index and a short description:
+    response = chat_completion(template, messages)
 
-    {formatted_articles}
+    # Extracting the list of relevant indices from the response
+    relevant_indices = response.choices[0].message.content.strip()
 
-    Return a **comma-separated list** of the indices of articles that are relevant. Order the list based on relevancy to the original search query. Do not include any text, spaces, or additional characters.
-    """
-
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-        )
-
-        # Extracting the list of relevant indices from the response
-        relevant_indices = response.choices[0].message.content.strip()
-
-        # Convert the response from string to a list of integers
-        return [int(idx) for idx in relevant_indices.split(",") if idx.strip().isdigit()]
-
-    except Exception as e:
-        return {"error": f"OpenAI API error: {str(e)}"}
\ No newline at end of file
+    # Convert the response from string to a list of integers
+    return [int(idx) for idx in relevant_indices.split(",") if idx.strip().isdigit()]
\ No newline at end of file
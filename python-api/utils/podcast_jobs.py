@@ -0,0 +1,202 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+
+# Podcast generation takes minutes and podcastfy is not safe to run several
+# times in one process, so each job runs in its own worker process from a
+# bounded pool. Jobs are keyed by a hash of their URL set: submitting the same
+# articles again returns the existing job (or its finished result). Finished
+# jobs are dropped from the registry after JOB_TTL; their results stay in
+# results.json, so the same URL set still comes back done.
+
+PODCAST_WORKERS = int(os.environ.get("BITEWISE_PODCAST_WORKERS", 2))
+JOB_TTL = float(os.environ.get("BITEWISE_PODCAST_JOB_TTL", 3600))   # seconds a finished job stays queryable
+RESULTS_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'podcasts', 'results.json')
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+def normalize_urls(urls):
+    return sorted({url.strip() for url in urls if url and url.strip()})
+
+def url_set_key(urls):
+    return hashlib.sha256("\n".join(normalize_urls(urls)).encode("utf-8")).hexdigest()
+
+
+### WORKER PROCESS ###
+def report_progress(progress, job_id, stage, fraction):
+    progress[job_id] = {"stage": stage, "progress": fraction, "updated_at": time.time()}
+
+def run_podcast_job(job_id, urls, progress):
+    # imported in the worker so the Flask process never loads podcastfy state
+    from .exa import get_contents
+    from .openai_utils import generate_podcast_collection
+
+    report_progress(progress, job_id, "fetching", 0.1)
+    articles_formatted = {url: {"url": url, "content": None} for url in urls}
+    articles_content = get_contents(articles_formatted)
+
+    result = generate_podcast_collection(
+        articles_content,
+        on_progress=lambda stage, fraction: report_progress(progress, job_id, stage, fraction),
+    )
+    report_progress(progress, job_id, DONE, 1.0)
+    return result
+
+
+### JOB REGISTRY (Flask process) ###
+class PodcastJob:
+    def __init__(self, job_id, key, urls):
+        self.id = job_id
+        self.key = key
+        self.urls = urls
+        self.status = QUEUED
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.future = None
+
+    def to_dict(self, progress=None):
+        job = {
+            "job_id": self.id,
+            "key": self.key,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "finished_at": self.finished_at,
+        }
+        if progress:
+            job.update(progress)
+        if self.status == DONE:
+            job["progress"] = 1.0
+            job["result"] = self.result
+        if self.error:
+            job["error"] = self.error
+        return job
+
+
+class PodcastJobManager:
+    def __init__(self, max_workers=PODCAST_WORKERS, results_path=RESULTS_PATH):
+        self.max_workers = max_workers
+        self.results_path = results_path
+        self.lock = Lock()
+        self.jobs = {}
+        self.jobs_by_key = {}
+        self.executor = None
+        self.manager = None
+        self.progress = None
+        self.results = self._load_results()
+
+    def _load_results(self):
+        if not os.path.exists(self.results_path):
+            return {}
+        with open(self.results_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def _save_results(self):
+        os.makedirs(os.path.dirname(self.results_path), exist_ok=True)
+        tmp_path = self.results_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self.results, file, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, self.results_path)
+
+    def _ensure_pool(self):
+        # spawn rather than fork: the Flask process has live threads and sockets
+        if self.executor is None:
+            context = multiprocessing.get_context("spawn")
+            self.manager = context.Manager()
+            self.progress = self.manager.dict()
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+
+    def submit(self, urls):
+        """
+        Submit a podcast job for a set of URLs. Returns the job, which may be
+        an existing queued/running/finished job for the same URL set.
+        """
+        key = url_set_key(urls)
+        with self.lock:
+            self._evict_expired()
+            existing = self.jobs_by_key.get(key)
+            if existing and existing.status != FAILED:
+                return existing
+
+            job = PodcastJob(uuid.uuid4().hex, key, normalize_urls(urls))
+            self.jobs[job.id] = job
+            self.jobs_by_key[key] = job
+
+            # generated before (possibly by an earlier process), reuse the stored result
+            if key in self.results:
+                job.status = DONE
+                job.result = self.results[key]
+                job.finished_at = job.submitted_at
+                return job
+
+            self._ensure_pool()
+            job.future = self.executor.submit(run_podcast_job, job.id, job.urls, self.progress)
+        # outside the lock: a future that is already done runs the callback, and _finish, right here
+        job.future.add_done_callback(lambda future, job=job: self._finish(job, future))
+        return job
+
+    def _evict_expired(self):
+        # caller holds self.lock
+        cutoff = time.time() - JOB_TTL
+        for job_id, job in list(self.jobs.items()):
+            if job.finished_at is not None and job.finished_at < cutoff:
+                del self.jobs[job_id]
+                if self.jobs_by_key.get(job.key) is job:
+                    del self.jobs_by_key[job.key]
+
+    def _finish(self, job, future):
+        with self.lock:
+            job.finished_at = time.time()
+            if self.progress is not None:
+                self.progress.pop(job.id, None)
+            try:
+                result = future.result()
+            except Exception as e:
+                job.status = FAILED
+                job.error = str(e)
+                print(f"Podcast job {job.id} failed: {e}")
+                return
+            if not result.get("s3_url"):
+                job.status = FAILED
+                job.error = "Failed to upload podcast to S3"
+                return
+            job.status = DONE
+            job.result = result
+            self.results[job.key] = result
+            self._save_results()
+
+    def get(self, job_id):
+        with self.lock:
+            self._evict_expired()
+            return self.jobs.get(job_id)
+
+    def status(self, job):
+        with self.lock:
+            progress = None
+            if self.progress is not None and job.status not in (DONE, FAILED):
+                progress = dict(self.progress.get(job.id, {}))
+                if progress and job.status == QUEUED:
+                    job.status = RUNNING
+            return job.to_dict(progress)
+
+    def wait(self, job, timeout=None):
+        if job.future is not None:
+            try:
+                job.future.result(timeout=timeout)
+            except Exception:
+                pass
+            # the done callback may still be running on the executor's thread
+            deadline = time.monotonic() + 1.0
+            while job.status not in (DONE, FAILED) and time.monotonic() < deadline:
+                time.sleep(0.01)
+        return job
+
+
+podcast_jobs = PodcastJobManager()
@@ -0,0 +1,142 @@
+import os
+import re
+from functools import lru_cache
+import tiktoken
+
+# token budgets for the article portion of each prompt (instructions are not counted)
+DEFAULT_MODEL = "gpt-4o-mini"
+COLLECTION_TOKEN_BUDGET = int(os.environ.get("BITEWISE_COLLECTION_TOKEN_BUDGET", 6000))
+DAILY_TOKEN_BUDGET = int(os.environ.get("BITEWISE_DAILY_TOKEN_BUDGET", 8000))
+INDIVIDUAL_TOKEN_BUDGET = int(os.environ.get("BITEWISE_INDIVIDUAL_TOKEN_BUDGET", 4000))
+PODCAST_TOKEN_BUDGET = int(os.environ.get("BITEWISE_PODCAST_TOKEN_BUDGET", 12000))
+FILTER_ITEM_TOKENS = 60
+
+# sentence boundary: end punctuation (plus closing quotes/brackets) followed by whitespace, or a line break
+_sentence_boundary = re.compile(r'(?<=[.!?])["\'”’)\]]*\s+|\n+')
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model=DEFAULT_MODEL):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+def count_tokens(text, model=DEFAULT_MODEL):
+    if not text:
+        return 0
+    return len(get_encoding(model).encode(text, disallowed_special=()))
+
+def split_sentences(text):
+    if not text:
+        return []
+    return [sentence.strip() for sentence in _sentence_boundary.split(text) if sentence and sentence.strip()]
+
+def truncate_to_tokens(text, max_tokens, model=DEFAULT_MODEL):
+    """
+    Truncate text to at most max_tokens, cutting on a sentence boundary.
+    Returns the truncated text and its token count.
+    """
+    if not text or max_tokens <= 0:
+        return "", 0
+    encoding = get_encoding(model)
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text, len(tokens)
+
+    kept = []
+    used = 0
+    for sentence in split_sentences(text):
+        sentence_tokens = len(encoding.encode(sentence + " ", disallowed_special=()))
+        if used + sentence_tokens > max_tokens:
+            break
+        kept.append(sentence)
+        used += sentence_tokens
+
+    # first sentence alone is over budget, fall back to a hard token cut
+    if not kept:
+        truncated = encoding.decode(tokens[:max_tokens])
+        return truncated, max_tokens
+
+    truncated = " ".join(kept)
+    return truncated, count_tokens(truncated, model)
+
+def allocate_budget(token_counts, budget, priorities):
+    """
+    Split a token budget across items proportionally to their priority.
+    Items that need less than their share keep only what they need and the
+    remainder is redistributed to the others. Priority 0 items get nothing.
+    """
+    allocation = [0] * len(token_counts)
+    active = [i for i, weight in enumerate(priorities) if weight > 0 and token_counts[i] > 0]
+    remaining = budget
+
+    while active and remaining > 0:
+        total_weight = sum(priorities[i] for i in active)
+        shares = {i: remaining * priorities[i] / total_weight for i in active}
+        satisfied = [i for i in active if token_counts[i] <= shares[i]]
+        if not satisfied:
+            for i in active:
+                allocation[i] = int(shares[i])
+            break
+        for i in satisfied:
+            allocation[i] = token_counts[i]
+            remaining -= token_counts[i]
+        active = [i for i in active if i not in satisfied]
+
+    return allocation
+
+def default_priorities(count, full=3, partial=7):
+    # same ordering as the old heuristic: first articles weigh most, long tail is dropped
+    return [3 if i < full else 1 if i < full + partial else 0 for i in range(count)]
+
+def default_header(article):
+    return f"### {article.get('title') or 'Untitled'} ###\n"
+
+def build_articles_prompt(articles, token_budget=COLLECTION_TOKEN_BUDGET, priorities=None, header=default_header, separator="\n\n", model=DEFAULT_MODEL):
+    """
+    Pack articles into a prompt section that fits token_budget.
+    articles: list of dicts with at least "title" and "content"
+    priorities: per-article weights (defaults to equal weights)
+    Returns (articles_text, usage) where usage reports the token counts used.
+    """
+    if priorities is None:
+        priorities = [1] * len(articles)
+
+    headers = [header(article) for article in articles]
+    contents = [article.get("content") or "" for article in articles]
+    header_tokens = [count_tokens(h, model) for h in headers]
+    content_tokens = [count_tokens(c, model) for c in contents]
+    separator_tokens = count_tokens(separator, model)
+
+    # headers are reserved up front for every article that is included
+    included = [i for i, weight in enumerate(priorities) if weight > 0]
+    reserved = 0
+    for i in list(included):
+        cost = header_tokens[i] + separator_tokens
+        if reserved + cost > token_budget:
+            included = included[:included.index(i)]
+            break
+        reserved += cost
+
+    included_set = set(included)
+    weights = [priorities[i] if i in included_set else 0 for i in range(len(articles))]
+    allocation = allocate_budget(content_tokens, token_budget - reserved, weights)
+
+    sections = []
+    usage = {"budget": token_budget, "total_tokens": 0, "articles": []}
+    for i in included:
+        content, used = truncate_to_tokens(contents[i], allocation[i], model)
+        if not content and allocation[i] == 0 and content_tokens[i] > 0:
+            continue
+        sections.append(headers[i] + content)
+        usage["articles"].append({
+            "title": articles[i].get("title"),
+            "tokens": header_tokens[i] + used,
+            "original_tokens": header_tokens[i] + content_tokens[i],
+            "truncated": used < content_tokens[i],
+        })
+
+    articles_text = separator.join(sections)
+    usage["total_tokens"] = count_tokens(articles_text, model)
+    return articles_text, usage
@@ -0,0 +1,215 @@
+from threading import Lock
+from .prompt_budget import count_tokens
+
+# Prompt templates are split into static instructions (sent first, identical for
+# every request) and a per-request suffix holding user preferences, metrics and
+# article text. Bump a template's version whenever its instructions change so
+# usage stats stay comparable.
+#
+# OpenAI only caches prompt prefixes of PROMPT_CACHE_MIN_TOKENS or more. These
+# instructions are a few hundred tokens, so no request gets a cache hit and
+# cached_tokens in the usage stats stays 0; /metrics/prompts reports each
+# template's instruction size against the minimum. Padding the instructions
+# up to it would not pay: cached tokens are still billed at half price, so
+# ~1024 cached tokens cost more than ~200 uncached ones. The static-first
+# order is kept so caching applies if the instructions ever grow past it.
+
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+class PromptTemplate:
+    def __init__(self, name, version, instructions, suffix):
+        self.name = name
+        self.version = version
+        self.instructions = instructions.strip()
+        self.suffix = suffix.strip()
+        self._instruction_tokens = None
+
+    @property
+    def key(self):
+        return f"{self.name}@{self.version}"
+
+    @property
+    def instruction_tokens(self):
+        if self._instruction_tokens is None:
+            self._instruction_tokens = count_tokens(self.instructions)
+        return self._instruction_tokens
+
+    def render(self, **values):
+        return [
+            {"role": "system", "content": self.instructions},
+            {"role": "user", "content": self.suffix.format(**values)},
+        ]
+
+
+TEMPLATES = {}
+
+def register_template(template):
+    TEMPLATES[template.name] = template
+    return template
+
+def get_template(name):
+    return TEMPLATES[name]
+
+
+ARTICLE_FORMAT_INSTRUCTIONS = """
+The provided articles are formatted as follows:
+
+Each article begins with a title enclosed in triple hashtags (###), followed by its content. Articles are separated by two newlines. Example format:
+
+### Article Title 1 ###
+Article content here.
+
+### Article Title 2 ###
+Article content here.
+"""
+
+register_template(PromptTemplate(
+    name="summary_individual",
+    version="v2",
+    instructions="""
+You summarize a single news article based on user preferences. The user's length, tone and format preferences and the article's readability metrics are provided with the article.
+
+Please follow these instructions:
+1️⃣ **Generate a structured summary** based on the user's selected format.
+2️⃣ **Verify and adjust the readability classification** based on the complexity of the text.
+  - Use the provided metrics as a guideline.
+  - If the text has long sentences, advanced vocabulary, or technical terms, adjust accordingly.
+
+**Formatting Requirements:**
+Your response **must** follow this exact structure:
+---
+**Summary**:
+[Generated summary]
+**Reading Difficulty**:
+[Easy/Medium/Hard]
+---
+""",
+    suffix="""
+User preferences:
+- Length: {length}
+- Tone: {tone}
+
+{summary_instruction}
+
+This article has the following readability metrics:
+- **Flesch Reading Ease Score**: {fre_score}
+- **Flesch-Kincaid Grade Level**: {fkgl_score}
+- **Initial Readability Classification**: {readability_score}
+
+Article Content:
+{input_text}
+""",
+))
+
+register_template(PromptTemplate(
+    name="summary_collection",
+    version="v2",
+    instructions=ARTICLE_FORMAT_INSTRUCTIONS + """
+**Task:**
+1. Generate a concise, engaging title (4-8 words) that captures the overall theme of the provided articles. The title should be not be overly long or vague.
+2. Summarize the main topics and themes discussed across all the articles in a cohesive and engaging manner. The summary should be direct, informative, and engaging. Start the summary by directly addressing the topic without referencing the articles themselves.
+3. Ensure the summary aligns with the user preferences provided with the articles (length, tone and format).
+
+**Formatting Requirement:**
+Your response must follow this exact structure:
+**Title**: [Generated Title]
+**Summary**:
+[Generated Summary]
+""",
+    suffix="""
+User preferences:
+- **Length**: {length}
+- **Tone**: {tone}
+- **Format**: {summary_instruction}
+
+Articles:
+
+{input_text}
+""",
+))
+
+register_template(PromptTemplate(
+    name="daily_news_summary",
+    version="v2",
+    instructions=ARTICLE_FORMAT_INSTRUCTIONS + """
+**Task:**
+Generate a 3-sentence overview of the key topics and themes discussed in the provided articles. Start the summary by overviewing all covered topics in the first sentence with an opening phrase such as "Today, we will cover...". The summary should:
+1. Be concise, engaging, and informative.
+2. Cover diverse topics from the articles rather than focusing on a single theme.
+3. Flow logically, ensuring smooth transitions between sentences.
+4. Avoid referencing specific articles, titles, or sources.
+""",
+    suffix="""
+Articles:
+
+{input_text}
+""",
+))
+
+register_template(PromptTemplate(
+    name="filter_irrelevant_articles",
+    version="v2",
+    instructions="""
+You are an intelligent news classifier. Your task is to filter out articles that do not make sense, based on the given search query, given their title or first sentence.
+
+You will receive the search query followed by a list of articles with their index and a short description.
+
+Return a **comma-separated list** of the indices of articles that are relevant. Order the list based on relevancy to the original search query. Do not include any text, spaces, or additional characters.
+""",
+    suffix="""
+Here is the search query:
+"{query}"
+
+Below is a list of articles with their index and a short description:
+
+{formatted_articles}
+""",
+))
+
+
+### USAGE INSTRUMENTATION ###
+_usage_lock = Lock()
+_usage_stats = {}
+
+def record_usage(template, response, latency):
+    """
+    Record token usage for one completion, including the prompt tokens the
+    provider served from its prompt cache.
+    """
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = (getattr(details, "cached_tokens", 0) or 0) if details else 0
+
+    with _usage_lock:
+        stats = _usage_stats.setdefault(template.key, {
+            "calls": 0,
+            "prompt_tokens": 0,
+            "cached_tokens": 0,
+            "completion_tokens": 0,
+            "latency_seconds": 0.0,
+        })
+        stats["calls"] += 1
+        stats["prompt_tokens"] += usage.prompt_tokens or 0
+        stats["cached_tokens"] += cached_tokens
+        stats["completion_tokens"] += usage.completion_tokens or 0
+        stats["latency_seconds"] += latency
+
+def get_usage_stats():
+    with _usage_lock:
+        usage = {key: dict(stats) for key, stats in _usage_stats.items()}
+    templates = {template.key: template for template in TEMPLATES.values()}
+    report = {}
+    for key, stats in usage.items():
+        template = templates.get(key)
+        report[key] = dict(
+            stats,
+            cache_hit_ratio=stats["cached_tokens"] / stats["prompt_tokens"] if stats["prompt_tokens"] else 0.0,
+            avg_latency_seconds=stats["latency_seconds"] / stats["calls"] if stats["calls"] else 0.0,
+        )
+        if template is not None:
+            # below the minimum the provider never caches the prefix, whatever the traffic
+            report[key]["instruction_tokens"] = template.instruction_tokens
+            report[key]["prefix_cacheable"] = template.instruction_tokens >= PROMPT_CACHE_MIN_TOKENS
+    return report
@@ -7,6 +7,8 @@ from nltk.corpus import wordnet as wn
 from nltk.stem import WordNetLemmatizer
 from nltk.data import find
 import string
+from functools import lru_cache
+from typing import List
 
 import os
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
@@ -19,8 +21,7 @@ nltk.download('punkt_tab')
 
 lemmatizer = WordNetLemmatizer()
 
-def parse_query(query: str) -> str:
-    # nltk setup
+def ensure_nltk_data():
     try:
         find('tokenizers/punkt')
     except LookupError:
@@ -35,11 +36,20 @@ def parse_query(query: str) -> str:
         nltk.download('wordnet')
         nltk.download('omw-1.4')
 
-    # 1. Tokenization
-    tokens = word_tokenize(query)
+stop_words = set(stopwords.words('english'))
+punctuation = set(string.punctuation)
+
+@lru_cache(maxsize=100000)
+def lemmatize(token: str) -> str:
+    return lemmatizer.lemmatize(token)
 
-    stop_words = set(stopwords.words('english'))
-    punctuation = set(string.punctuation)
+# shared normalization for search queries and the local search index
+def normalize_tokens(text: str, lowercase: bool = False) -> List[str]:
+    if lowercase:
+        text = text.lower()
+
+    # 1. Tokenization
+    tokens = word_tokenize(text)
 
     # 2. Stopword removal
     tokens = [
@@ -48,6 +58,9 @@ def parse_query(query: str) -> str:
     ]
 
     # 3. Lemmatization
-    tokens = [lemmatizer.lemmatize(token) for token in tokens]
+    return [lemmatize(token) for token in tokens]
 
-    return " ".join(tokens)
+def parse_query(query: str) -> str:
+    # nltk setup
+    ensure_nltk_data()
+    return " ".join(normalize_tokens(query))
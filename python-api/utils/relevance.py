@@ -0,0 +1,57 @@
+import os
+from threading import Lock
+import numpy as np
+from .vector_index import embed
+
+# Local relevance scoring for /irrelevant-articles. Query and article texts are
+# embedded with the same model as the vector index and compared by cosine
+# similarity; an optional cross-encoder then rescores the articles that pass,
+# on CPU, when more precision is worth a few extra milliseconds per article.
+# The LLM filter stays available as an opt-in fallback.
+
+# a starting point, not a tuned value: benchmarks/eval_relevance.py prints
+# precision/recall per threshold on saved searches to choose one
+RELEVANCE_THRESHOLD = float(os.environ.get("BITEWISE_RELEVANCE_THRESHOLD", "0.3"))
+CROSS_ENCODER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+USE_CROSS_ENCODER = os.environ.get("BITEWISE_RELEVANCE_RERANKER", "false").lower() == "true"
+CROSS_ENCODER_THRESHOLD = 0.0  # logit; 0.0 is a 50% relevance probability
+# let the LLM answer when the local models can't be loaded
+LLM_FALLBACK = os.environ.get("BITEWISE_RELEVANCE_LLM_FALLBACK", "false").lower() == "true"
+
+_cross_encoder_lock = Lock()
+_cross_encoder = None
+
+def get_cross_encoder():
+    global _cross_encoder
+    with _cross_encoder_lock:
+        if _cross_encoder is None:
+            from sentence_transformers import CrossEncoder
+            _cross_encoder = CrossEncoder(CROSS_ENCODER_MODEL, device="cpu")
+        return _cross_encoder
+
+def similarity_scores(query, texts):
+    if not texts:
+        return np.zeros(0, dtype=np.float32)
+    vectors = embed([query] + list(texts))
+    return vectors[1:] @ vectors[0]
+
+def cross_encoder_scores(query, texts):
+    if not texts:
+        return np.zeros(0, dtype=np.float32)
+    return np.asarray(get_cross_encoder().predict([(query, text) for text in texts]), dtype=np.float32)
+
+def rank_relevant(articles, query, threshold=None, use_cross_encoder=None):
+    """
+    articles: [{"index": int, "text": str}] as sent by the webapp backend.
+    Returns the indices of relevant articles, most relevant first. `threshold`
+    is the cosine cut; the cross-encoder, when on, reranks what passes it.
+    """
+    use_cross_encoder = USE_CROSS_ENCODER if use_cross_encoder is None else use_cross_encoder
+    threshold = RELEVANCE_THRESHOLD if threshold is None else threshold
+    texts = [article.get("text") or "" for article in articles]
+    scores = similarity_scores(query, texts)
+    kept = [i for i in np.argsort(-scores, kind="stable") if scores[i] >= threshold]
+    if use_cross_encoder and kept:
+        rescored = cross_encoder_scores(query, [texts[i] for i in kept])
+        kept = [kept[j] for j in np.argsort(-rescored, kind="stable") if rescored[j] >= CROSS_ENCODER_THRESHOLD]
+    return [articles[i]["index"] for i in kept]
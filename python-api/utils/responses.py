@@ -0,0 +1,171 @@
+import gzip
+from flask.json.provider import DefaultJSONProvider
+from .http_cache import variant_etag
+
+try:
+    import orjson
+except ImportError:  # falls back to the stdlib encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Response shaping for the dashboard and search endpoints: field projection,
+# pagination, a faster JSON encoder, and compression of large bodies.
+
+SUMMARY_SNIPPET_CHARS = 280
+BODY_FIELDS = ("content",)              # dropped in summary mode
+MIN_COMPRESS_BYTES = 1024
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5                      # fast enough per request, still well ahead of gzip
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    jsonify through orjson, keeping Flask's output: sorted keys, compact
+    separators, and Flask's handling of dates, UUIDs and dataclasses.
+    Non-ASCII text is written as UTF-8 instead of \\u escapes.
+    """
+    def options(self, indent=False):
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+    def dumps(self, obj, **kwargs):
+        # jsonify asks for compact separators, or indent=2 in debug mode; anything else goes to the stdlib
+        if orjson is None or kwargs not in ({}, {"separators": (",", ":")}, {"indent": 2}):
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self.options("indent" in kwargs)).decode("utf-8")
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        # straight to bytes: decoding a multi-megabyte payload only for Flask to encode it again costs more than the encoding
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=self.default, option=self.options(indent)) + b"\n"
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def parse_fields(value):
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = value.split(",")
+    return [field.strip() for field in value if field and field.strip()]
+
+def shape_options(data):
+    """
+    Shaping options from a request body or query args:
+      mode: "full" (default, unchanged payload) or "summary" (no bodies, adds "snippet")
+      fields: list or comma-separated article keys to keep; overrides mode
+      page / page_size: pagination of the top-level list (clusters or results)
+      articles_limit / articles_offset: pagination of articles inside each cluster
+    """
+    data = data or {}
+
+    def as_int(key):
+        try:
+            return max(0, int(data.get(key)))
+        except (TypeError, ValueError):
+            return None
+
+    return {
+        "mode": data.get("mode") or "full",
+        "fields": parse_fields(data.get("fields")),
+        "page": as_int("page"),
+        "page_size": as_int("page_size"),
+        "articles_limit": as_int("articles_limit"),
+        "articles_offset": as_int("articles_offset") or 0,
+    }
+
+def project_article(article, options):
+    if options["fields"]:
+        projected = {field: article[field] for field in options["fields"] if field in article}
+        if "snippet" in options["fields"] and "snippet" not in article:
+            projected["snippet"] = snippet(article)
+        return projected
+    if options["mode"] == "summary":
+        projected = {key: value for key, value in article.items() if key not in BODY_FIELDS}
+        projected["snippet"] = snippet(article)
+        return projected
+    return article
+
+def snippet(article):
+    text = article.get("description") or article.get("content") or ""
+    if len(text) <= SUMMARY_SNIPPET_CHARS:
+        return text
+    return text[:SUMMARY_SNIPPET_CHARS].rsplit(" ", 1)[0] + "…"
+
+def paginate(items, page=None, page_size=None):
+    """Returns (items on the page, pagination metadata or None when not paginating)."""
+    if not page and not page_size:
+        return items, None
+    page = max(1, page or 1)
+    page_size = max(1, page_size or len(items) or 1)
+    start = (page - 1) * page_size
+    return items[start:start + page_size], {
+        "page": page,
+        "page_size": page_size,
+        "total": len(items),
+        "has_more": start + page_size < len(items),
+    }
+
+def shape_articles(articles, options):
+    return [project_article(article, options) for article in articles]
+
+def shape_clusters(clusters, options):
+    """Paginate clusters and their articles, projecting every article."""
+    page, pagination = paginate(clusters, options["page"], options["page_size"])
+    shaped = []
+    for cluster in page:
+        articles = cluster["articles"]
+        start = options["articles_offset"]
+        end = start + options["articles_limit"] if options["articles_limit"] else None
+        shaped_cluster = dict(cluster, articles=shape_articles(articles[start:end], options))
+        if options["articles_limit"] or start:
+            shaped_cluster["article_count"] = len(articles)
+        shaped.append(shaped_cluster)
+    return shaped, pagination
+
+
+def accepted_encoding(accept_encoding):
+    accepted = {part.split(";")[0].strip().lower() for part in (accept_encoding or "").split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+def compress_response(response, accept_encoding):
+    """Compress a buffered text/JSON response in place when the client accepts it."""
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code < 200
+        or response.status_code in (204, 206, 304)
+        or "Content-Encoding" in response.headers
+        or not (response.mimetype or "").startswith(COMPRESSIBLE_TYPES)
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = accepted_encoding(accept_encoding)
+    if encoding is None:
+        return response
+    body = response.get_data()
+    if len(body) < MIN_COMPRESS_BYTES:
+        return response
+    if encoding == "br":
+        compressed = brotli.compress(body, quality=BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(body, compresslevel=GZIP_LEVEL)
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    variant_etag(response, encoding)
+    return response
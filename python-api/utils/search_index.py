@@ -0,0 +1,221 @@
+import json
+import math
+import os
+from collections import Counter
+from datetime import datetime
+import numpy as np
+from .query_processing import normalize_tokens, ensure_nltk_data
+from .enrichment import enrich_records
+from .storage import snapshot_info, snapshot_path
+from .dedup import canonicalize_url
+from .background_index import BackgroundIndex
+
+# Local BM25 index over the crawl snapshots, so /search can answer from
+# articles we already hold before spending NewsAPI quota.
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+SNAPSHOTS = ["articles_data.json", "local_articles_data.json"]
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+TITLE_WEIGHT = 2  # title tokens are counted this many extra times
+MIN_LOCAL_RESULTS = 10  # below this, user_search merges in NewsAPI results
+
+
+def load_snapshot_articles(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):  # local snapshot: {city: [articles]}
+        data = [dict(article, city=city) for city, articles in data.items() for article in articles]
+    # no-op for snapshots crawled with enrichment; older ones are enriched on load
+    return enrich_records(data, score_readability=False)
+
+def parse_time(value):
+    if not value or value == "unknown":
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d") if value else None
+
+
+class SearchIndex:
+    """
+    Inverted index with compact postings: for each term, a slice of one
+    shared int32 doc-id array and uint16 term-frequency array.
+    """
+    def __init__(self, articles):
+        self.articles = articles
+        self.vocabulary = {}
+        postings = []
+        doc_lengths = []
+
+        for doc_id, article in enumerate(articles):
+            tokens = normalize_tokens(article.get("content") or "", lowercase=True)
+            title_tokens = normalize_tokens(article.get("title") or "", lowercase=True)
+            counts = Counter(tokens)
+            for token in title_tokens:
+                counts[token] += TITLE_WEIGHT
+            doc_lengths.append(len(tokens) + TITLE_WEIGHT * len(title_tokens))
+            for term, tf in counts.items():
+                term_id = self.vocabulary.setdefault(term, len(self.vocabulary))
+                postings.append((term_id, doc_id, min(tf, 65535)))
+
+        postings.sort()
+        entries = np.array(postings, dtype=np.int64).reshape(-1, 3)
+        self.doc_ids = entries[:, 1].astype(np.int32)
+        self.term_freqs = entries[:, 2].astype(np.uint16)
+        self.offsets = np.searchsorted(entries[:, 0], np.arange(len(self.vocabulary) + 1)).astype(np.int64)
+        self.doc_lengths = np.array(doc_lengths, dtype=np.float32)
+        self.avg_doc_length = float(self.doc_lengths.mean()) if len(doc_lengths) else 0.0
+
+        self.by_url = {canonicalize_url(article.get("url")): doc_id for doc_id, article in enumerate(articles) if article.get("url")}
+
+        # per-document filter columns
+        self.sources = []             # source names, casefolded for preference matching
+        self.biases = np.zeros(len(articles), dtype=np.int8)
+        self.times = []
+        for doc_id, article in enumerate(articles):
+            self.sources.append((article["sourceName"] or "").casefold())
+            self.biases[doc_id] = article["biasRating"]
+            self.times.append(parse_time(article.get("time")))
+
+    def postings(self, term):
+        term_id = self.vocabulary.get(term)
+        if term_id is None:
+            return None, None
+        start, end = self.offsets[term_id], self.offsets[term_id + 1]
+        return self.doc_ids[start:end], self.term_freqs[start:end]
+
+    def source_mask(self, names):
+        wanted = {name.casefold() for name in names if isinstance(name, str)}
+        return np.array([source in wanted for source in self.sources], dtype=bool)
+
+    def filter_mask(self, from_date=None, to_date=None, exclude_sources=None, bias=None, city=None):
+        mask = np.ones(len(self.articles), dtype=bool)
+        if from_date or to_date:
+            start, end = parse_date(from_date), parse_date(to_date)
+            for doc_id, published in enumerate(self.times):
+                if published is None:
+                    continue  # undated crawl results are kept
+                if (start and published < start) or (end and published.date() > end.date()):
+                    mask[doc_id] = False
+        if exclude_sources:
+            mask &= ~self.source_mask(exclude_sources)
+        if bias:
+            mask &= np.isin(self.biases, list(bias))
+        if city:
+            mask &= np.array([article.get("city") == city for article in self.articles], dtype=bool)
+        return mask
+
+    def search(self, query, limit=50, prefer_sources=None, **filters):
+        """
+        Rank documents with BM25. Returns (doc_id, score) pairs for documents
+        matching at least half of the query terms; articles from
+        `prefer_sources` come first, each group by score.
+        """
+        terms = list(dict.fromkeys(normalize_tokens(query, lowercase=True)))
+        if not terms or not self.articles:
+            return []
+
+        total_docs = len(self.articles)
+        scores = np.zeros(total_docs, dtype=np.float32)
+        matched = np.zeros(total_docs, dtype=np.int16)
+        for term in terms:
+            doc_ids, term_freqs = self.postings(term)
+            if doc_ids is None:
+                continue
+            idf = math.log(1 + (total_docs - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            tf = term_freqs.astype(np.float32)
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[doc_ids] / self.avg_doc_length)
+            scores[doc_ids] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+            matched[doc_ids] += 1
+
+        candidates = (matched >= math.ceil(len(terms) / 2)) & self.filter_mask(**filters)
+        candidate_ids = np.flatnonzero(candidates)
+        if len(candidate_ids) == 0:
+            return []
+        order = candidate_ids[np.argsort(-scores[candidate_ids], kind="stable")]
+        if prefer_sources:
+            preferred = self.source_mask(prefer_sources)[order]
+            order = np.concatenate([order[preferred], order[~preferred]])
+        order = order[:limit]
+        return [(int(doc_id), float(scores[doc_id])) for doc_id in order]
+
+
+def to_search_result(article, score):
+    # shaped like a NewsAPI article so it merges with, or stands in for, API results
+    content = article.get("content") or ""
+    return {
+        "source": {"id": None, "name": article["sourceName"]},
+        "author": ", ".join(article.get("authors") or []) or None,
+        "title": article.get("title"),
+        "description": content[:300],
+        "url": article.get("url"),
+        "urlToImage": article.get("imageUrl"),
+        "publishedAt": article.get("time"),
+        "content": content,
+        "biasRating": article["biasRating"],
+        "charLength": article["charLength"],
+        "readTime": article["readTime"],
+        "readability": article["readability"],
+        "language": article["language"],
+        "sourceName": article["sourceName"],
+        "score": score,
+        "origin": "local",
+    }
+
+
+def snapshot_version():
+    # (name, version, local path) of every published snapshot
+    version = []
+    for name in SNAPSHOTS:
+        info = snapshot_info(name)
+        if info:
+            version.append((name, info["version"], snapshot_path(name)))
+    return tuple(version)
+
+def build_search_index(version):
+    ensure_nltk_data()
+    articles = []
+    for _, _, path in version:
+        articles.extend(load_snapshot_articles(path))
+    index = SearchIndex(articles)
+    print(f"Built local search index: {len(articles)} articles, {len(index.vocabulary)} terms")
+    return index
+
+# rebuilt off the request path whenever a crawl publishes a new snapshot
+search_index = BackgroundIndex("search index", snapshot_version, build_search_index)
+
+def get_index():
+    return search_index.get()
+
+def search_local(query, user_preferences=None, limit=50):
+    user_preferences = user_preferences or {}
+    index = get_index()
+    if index is None:
+        # until the first build finishes, user_search answers from NewsAPI alone
+        return []
+    hits = index.search(
+        query,
+        limit=limit,
+        from_date=user_preferences.get("from_date") or None,
+        to_date=user_preferences.get("to_date") or None,
+        # the webapp's "sources" are sources to prioritize, not a whitelist (see applySourcePreferences)
+        prefer_sources=user_preferences.get("sources") or None,
+        exclude_sources=user_preferences.get("exclude_domains") or None,
+        # bias filters arrive as rating ints; labels are filtered by the webapp backend
+        bias=[rating for rating in user_preferences.get("bias") or [] if isinstance(rating, int)] or None,
+    )
+    return [to_search_result(index.articles[doc_id], score) for doc_id, score in hits]
+
+def find_article(url):
+    """The snapshot article with this URL (tracking params etc. ignored), or None."""
+    index = get_index()
+    if index is None:
+        return None
+    doc_id = index.by_url.get(canonicalize_url(url))
+    return index.articles[doc_id] if doc_id is not None else None
@@ -0,0 +1,172 @@
+import json
+import os
+
+# Incremental snapshot writing for the crawler. Articles are appended to a
+# JSON Lines spool as they are crawled; the final snapshot is then streamed
+# from the spool into a temp file and swapped in with os.replace, so readers
+# see either the old snapshot or the complete new one. The output matches
+# json.dump(..., ensure_ascii=False, indent=4) byte for byte. Published
+# snapshots are read back the same way, one record at a time.
+
+INDENT = " " * 4
+READ_CHUNK = 64 * 1024
+
+
+class JsonlSpool:
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = None
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(self.path, 'w', encoding='utf-8')
+        return self
+
+    def write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.count += 1
+
+    def __exit__(self, *exc):
+        self._file.close()
+        return False
+
+    def records(self):
+        return read_jsonl(self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def read_jsonl(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+class JsonStream:
+    """
+    Reads a JSON document's containers a value at a time, buffering only the
+    current value. Array elements and object keys are decoded whole, so this
+    is meant for arrays of objects and string keys, as in our snapshots.
+    """
+    def __init__(self, f):
+        self.f = f
+        self.buffer = ""
+        self.pos = 0
+        self.decoder = json.JSONDecoder()
+
+    def fill(self):
+        chunk = self.f.read(READ_CHUNK)
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        # next non-whitespace character, "" at the end of the file
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos}, found {found!r}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, self.pos = self.decoder.raw_decode(self.buffer, self.pos)
+                return value
+            except json.JSONDecodeError:
+                # value runs past the buffer; read on unless the file is done
+                if not self.fill():
+                    raise
+
+    def array(self):
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == "]":
+                self.pos += 1
+                return
+            self.expect(",")
+
+def read_json_array(path):
+    """Stream a [records] file one record at a time without loading it."""
+    with open(path, 'r', encoding='utf-8') as f:
+        yield from JsonStream(f).array()
+
+def read_json_object(path):
+    """
+    Stream a {key: [records]} file as (key, records) pairs without loading it.
+    Each pair's records are read lazily; whatever the caller leaves unread is
+    skipped before the next pair.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        stream = JsonStream(f)
+        stream.expect("{")
+        if stream.peek() == "}":
+            return
+        while True:
+            key = stream.value()
+            stream.expect(":")
+            records = stream.array()
+            yield key, records
+            for _ in records:
+                pass
+            if stream.peek() == "}":
+                return
+            stream.expect(",")
+
+def indented(value, depth):
+    # json.dumps(indent=4) of a nested value, shifted right to sit at `depth`
+    return json.dumps(value, ensure_ascii=False, indent=4).replace("\n", "\n" + INDENT * depth)
+
+def write_array(f, records, depth):
+    count = 0
+    for record in records:
+        f.write(("[\n" if count == 0 else ",\n") + INDENT * (depth + 1) + indented(record, depth + 1))
+        count += 1
+    f.write(("\n" + INDENT * depth + "]") if count else "[]")
+    return count
+
+def publish(path, write):
+    # per process: a crawl CLI and the app may publish the same snapshot
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            result = write(f)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return result
+
+def publish_json_array(records, path):
+    """Stream records into `path` as a JSON array; returns the count written."""
+    return publish(path, lambda f: write_array(f, records, 0))
+
+def publish_json_object(groups, path):
+    """Stream (key, records) pairs into `path` as {key: [records]}; returns the count written."""
+    def write(f):
+        total = 0
+        first = True
+        for key, records in groups:
+            f.write(("{\n" if first else ",\n") + INDENT + json.dumps(key, ensure_ascii=False) + ": ")
+            total += write_array(f, records, 1)
+            first = False
+        f.write("\n}" if not first else "{}")
+        return total
+    return publish(path, write)
@@ -0,0 +1,212 @@
+import csv
+import os
+import re
+from functools import lru_cache
+from threading import Lock
+
+# One registry for source names and media bias, shared by the crawler, search
+# and the dashboard. Any of a seed URL, an article URL, a NewsAPI source name
+# or a NewsAPI source id resolves to the canonical (bias.csv) name and bias
+# rating. URLs are matched by host suffix, so www., edition., news. and other
+# subdomains land on the outlet's entry; names are matched after
+# normalization plus a table of NewsAPI spellings.
+
+BIAS_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'mediabias', 'bias.csv')
+BIAS_RATINGS = {'left': 0, 'left-center': 1, 'center': 2, 'right-center': 3, 'right': 4}
+UNKNOWN_BIAS = 5   # also used for bias.csv's "allsides" (mixed) ratings
+UNKNOWN_SOURCE = "UNKNOWN"
+
+# outlet host -> canonical name; subdomains match through the suffix walk
+SOURCE_DOMAINS = {
+    "abcnews.go.com": "ABC News",
+    "apnews.com": "Associated Press",
+    "arstechnica.com": "Ars Technica",
+    "fortune.com": "Fortune",
+    "mashable.com": "Mashable",
+    "nationalgeographic.com": "National Geographic",
+    "vice.com": "Vice",
+    "nymag.com": "New York Magazine",
+    "techcrunch.com": "TechCrunch",
+    "thehill.com": "The Hill",
+    "thenextweb.com": "The Next Web",
+    "time.com": "Time Magazine",
+    "aljazeera.com": "Al Jazeera",
+    "axios.com": "Axios",
+    "bbc.com": "BBC News",
+    "bbc.co.uk": "BBC News",
+    "bleacherreport.com": "Bleacher Report",
+    "bloomberg.com": "Bloomberg",
+    "breitbart.com": "Breitbart News",
+    "buzzfeed.com": "BuzzFeed News",
+    "buzzfeednews.com": "BuzzFeed News",
+    "cbsnews.com": "CBS News",
+    "ccn.com": "CCN",
+    "cnn.com": "CNN (Web News)",
+    "engadget.com": "Engadget",
+    "foxnews.com": "Fox Online News",
+    "huffingtonpost.com": "HuffPost",
+    "huffpost.com": "HuffPost",
+    "medicalnewstoday.com": "Medical News Today",
+    "msnbc.com": "MSNBC",
+    "mtv.com": "MTV News Online",
+    "nationalreview.com": "National Review",
+    "nbcnews.com": "NBCNews.com",
+    "newscientist.com": "New Scientist",
+    "newsweek.com": "Newsweek",
+    "nextbigfuture.com": "Next Big Future",
+    "npr.org": "NPR Online News",
+    "nytimes.com": "New York Times - News",
+    "politico.com": "Politico",
+    "reuters.com": "Reuters",
+    "theamericanconservative.com": "The American Conservative",
+    "theguardian.com": "The Guardian",
+    "theverge.com": "The Verge",
+    "usatoday.com": "USA TODAY",
+    "washingtonpost.com": "Washington Post",
+    "washingtontimes.com": "Washington Times",
+    "wired.com": "Wired",
+    "wsj.com": "Wall Street Journal - News",
+    "news.yahoo.com": "Yahoo! News",
+    "atlanticcouncil.org": "Atlantic Council",
+    "csmonitor.com": "Christian Science Monitor",
+    "foreignpolicy.com": "Foreign Policy",
+    "theatlantic.com": "The Atlantic",
+    "vox.com": "Vox",
+    "nature.com": "Nature",
+    "pbs.org": "PBS NewsHour",
+    "rollingstone.com": "RollingStone.com",
+    "esquire.com": "Esquire",
+    "vogue.com": "Vogue",
+    "salon.com": "Salon",
+    "slate.com": "Slate",
+}
+
+# NewsAPI source names and ids (normalized) that differ from the bias.csv name
+SOURCE_ALIASES = {
+    "ap": "Associated Press",
+    "cnn": "CNN (Web News)",
+    "foxnews": "Fox Online News",
+    "newyorktimes": "New York Times - News",
+    "nytimes": "New York Times - News",
+    "wallstreetjournal": "Wall Street Journal - News",
+    "wsj": "Wall Street Journal - News",
+    "nbcnews": "NBCNews.com",
+    "npr": "NPR Online News",
+    "washingtonpost": "Washington Post",
+    "time": "Time Magazine",
+    "huffingtonpost": "HuffPost",
+    "yahoonews": "Yahoo! News",
+    "rollingstone": "RollingStone.com",
+    "buzzfeed": "BuzzFeed News",
+    "breitbart": "Breitbart News",
+    "bbc": "BBC News",
+    "guardian": "The Guardian",
+}
+
+
+def normalize_name(name):
+    # "The New York Times", "the-new-york-times" and "New York Times" all become "newyorktimes"
+    name = re.sub(r"[^a-z0-9]+", " ", name.lower().replace("&", " and ")).strip()
+    if name.startswith("the "):
+        name = name[4:]
+    return name.replace(" ", "")
+
+def url_host(url):
+    # string slicing rather than urlsplit: this runs for every article in a batch
+    start = url.find("://")
+    start = start + 3 if start >= 0 else 0
+    end = len(url)
+    for delimiter in "/?#":
+        found = url.find(delimiter, start, end)
+        if found >= 0:
+            end = found
+    host = url[start:end].rpartition("@")[2].partition(":")[0].lower()
+    return host[4:] if host.startswith("www.") else host
+
+def looks_like_url(value):
+    return "://" in value or value.startswith("www.") or ("." in value and " " not in value and "/" in value)
+
+
+class SourceRegistry:
+    """
+    Canonical sources in two dicts: host -> source id and normalized name ->
+    source id, with names and bias ratings in parallel lists.
+    """
+    def __init__(self, ratings, domains=SOURCE_DOMAINS, aliases=SOURCE_ALIASES):
+        self.names = []
+        self.biases = []
+        self.by_host = {}
+        self.by_name = {}
+        ids = {}
+
+        def source_id(name):
+            if name not in ids:
+                ids[name] = len(self.names)
+                self.names.append(name)
+                self.biases.append(BIAS_RATINGS.get(ratings.get(name), UNKNOWN_BIAS))
+                self.by_name.setdefault(normalize_name(name), ids[name])
+            return ids[name]
+
+        for name in ratings:
+            source_id(name)
+        for host, name in domains.items():
+            self.by_host[host] = source_id(name)
+        for alias, name in aliases.items():
+            self.by_name[normalize_name(alias)] = source_id(name)
+        # resolution depends only on the host, so repeat hosts cost one dict hit
+        self.host_source = lru_cache(maxsize=65536)(self._host_source)
+
+    def _host_source(self, host):
+        # "edition.cnn.com" -> "edition.cnn.com", then "cnn.com"
+        labels = host.split(".")
+        for i in range(len(labels) - 1):
+            source = self.by_host.get(".".join(labels[i:]))
+            if source is not None:
+                return source
+        return None
+
+    def from_url(self, url):
+        return self.host_source(url_host(url)) if url else None
+
+    def from_name(self, name):
+        return self.by_name.get(normalize_name(name)) if name else None
+
+    def resolve(self, source, url=None):
+        """
+        (canonical name, bias rating) for a seed URL, NewsAPI {"id", "name"}
+        dict or source name, falling back to the article URL. Unmatched
+        names are kept as they are; unmatched URLs become UNKNOWN.
+        """
+        name = None
+        if isinstance(source, dict):
+            name = source.get("name")
+            lookups = ((self.from_url, url), (self.from_name, name), (self.from_name, source.get("id")))
+        elif source and looks_like_url(source.strip()):
+            lookups = ((self.from_url, source.strip()), (self.from_url, url))
+        else:
+            name = source.strip() if source else None
+            lookups = ((self.from_url, url), (self.from_name, name))
+        for lookup, value in lookups:
+            source_id = lookup(value)
+            if source_id is not None:
+                return self.names[source_id], self.biases[source_id]
+        return name or UNKNOWN_SOURCE, UNKNOWN_BIAS
+
+
+def load_ratings(path=BIAS_PATH):
+    with open(path, newline='', encoding='utf-8') as f:
+        return {row["news_source"]: row["rating"] for row in csv.DictReader(f)}
+
+_registry = None
+_registry_lock = Lock()
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = SourceRegistry(load_ratings())
+    return _registry
+
+def resolve_source(source, url=None):
+    return get_registry().resolve(source, url)
@@ -0,0 +1,243 @@
+import hashlib
+import json
+import os
+import shutil
+import socket
+import time
+import uuid
+from threading import Lock
+
+# Shared storage for crawl snapshots, so one node's crawl serves the fleet.
+#
+# A published snapshot is an immutable object under a versioned key,
+# snapshots/<name>/<version>.json, plus a small CURRENT pointer naming the
+# live version. Writing the pointer is the publish step: a single put on S3
+# and an os.replace locally, so readers see the old version or the new one,
+# never a partial file. Readers download a version once into a local cache
+# and reuse it until the pointer moves. Only the newest KEPT_VERSIONS of a
+# snapshot stay in the store.
+#
+# Leases under leases/<name> let one node at a time do work meant for the
+# whole fleet, such as a crawl. They are best effort: two nodes that write a
+# lease at the same moment are settled by reading it back after a short
+# pause (last writer wins), not by an atomic compare-and-set.
+#
+# BITEWISE_STORAGE=local (default) keeps everything under data/store;
+# BITEWISE_STORAGE=s3 uses the audio bucket (or BITEWISE_STORAGE_BUCKET),
+# including local S3 stand-ins via BITEWISE_S3_ENDPOINT_URL.
+
+current_dir = os.path.dirname(__file__)
+DATA_DIR = os.path.normpath(os.path.join(current_dir, '..', 'data'))
+STORAGE_BACKEND = os.environ.get("BITEWISE_STORAGE", "local").lower()
+LOCAL_STORE_DIR = os.environ.get("BITEWISE_STORAGE_DIR") or os.path.join(DATA_DIR, 'store')
+CACHE_DIR = os.path.join(DATA_DIR, 'cache', 'snapshots')
+S3_PREFIX = os.environ.get("BITEWISE_STORAGE_PREFIX", "bitewise")
+POINTER_TTL = 15          # seconds a CURRENT pointer is trusted before re-reading it
+CACHED_VERSIONS = 2       # versions of each snapshot kept in the local cache
+KEPT_VERSIONS = 3         # versions of each snapshot kept in the store; readers may still be on older ones
+LEASE_SETTLE = 1.0        # seconds between writing a lease and checking it was ours that stuck
+
+
+class LocalStorage:
+    def __init__(self, root=LOCAL_STORE_DIR):
+        self.root = root
+
+    def path(self, key):
+        return os.path.join(self.root, *key.split("/"))
+
+    def put_file(self, key, source_path):
+        target = self.path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(source_path, target + ".tmp")
+        os.replace(target + ".tmp", target)
+
+    def put_bytes(self, key, data):
+        target = self.path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(target + ".tmp", target)
+
+    def get_bytes(self, key):
+        try:
+            with open(self.path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def list_keys(self, prefix):
+        directory = self.path(prefix)
+        if not os.path.isdir(directory):
+            return []
+        return [f"{prefix.rstrip('/')}/{name}" for name in os.listdir(directory) if not name.endswith(".tmp")]
+
+    def local_path(self, key):
+        # objects are already on local disk; nothing to cache
+        return self.path(key)
+
+
+class S3Storage:
+    def __init__(self, bucket=None, prefix=S3_PREFIX, client=None):
+        from .audio_store import s3_client, S3_BUCKET
+        self.bucket = bucket or os.environ.get("BITEWISE_STORAGE_BUCKET") or S3_BUCKET
+        self.prefix = prefix.strip("/")
+        self.client = client or s3_client
+
+    def key(self, key):
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def put_file(self, key, source_path):
+        self.client.upload_file(source_path, self.bucket, self.key(key), ExtraArgs={"ContentType": "application/json"})
+
+    def put_bytes(self, key, data):
+        self.client.put_object(Bucket=self.bucket, Key=self.key(key), Body=data, ContentType="application/json")
+
+    def get_bytes(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self.key(key))["Body"].read()
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            raise
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(key))
+
+    def list_keys(self, prefix):
+        keys = []
+        full_prefix = self.key(prefix.rstrip("/") + "/")
+        for page in self.client.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=full_prefix):
+            keys.extend(obj["Key"][len(self.key("")):] for obj in page.get("Contents", []))
+        return keys
+
+    def local_path(self, key):
+        # read-through: versions are immutable, so a cached copy never goes stale
+        target = os.path.join(CACHE_DIR, *key.split("/"))
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            self.client.download_file(self.bucket, self.key(key), target + ".tmp")
+            os.replace(target + ".tmp", target)
+            prune_cache(os.path.dirname(target))
+        return target
+
+
+def prune_cache(directory, keep=CACHED_VERSIONS):
+    versions = sorted((entry for entry in os.scandir(directory) if entry.name.endswith(".json")), key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in versions[keep:]:
+        os.remove(entry.path)
+
+_storage = None
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        _storage = S3Storage() if STORAGE_BACKEND == "s3" else LocalStorage()
+    return _storage
+
+
+def pointer_key(name):
+    return f"snapshots/{name}/CURRENT"
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def publish_snapshot(name, source_path, **metadata):
+    """
+    Upload source_path as a new version of snapshot `name` and make it current.
+    `metadata` is stored in the pointer, e.g. the version of the snapshot a
+    derived file was built from.
+    """
+    storage = get_storage()
+    sha256 = file_sha256(source_path)
+    version = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{sha256[:12]}"
+    key = f"snapshots/{name}/{version}.json"
+    storage.put_file(key, source_path)
+    info = {"version": version, "key": key, "sha256": sha256, "size": os.path.getsize(source_path), "published_at": time.time(), **metadata}
+    storage.put_bytes(pointer_key(name), json.dumps(info).encode("utf-8"))
+    with _pointer_lock:
+        _pointers[name] = (time.monotonic(), info)
+    prune_versions(name)
+    print(f"Published snapshot {name} version {version}")
+    return info
+
+def prune_versions(name, keep=KEPT_VERSIONS):
+    # version names start with the publish time, so they sort oldest first
+    storage = get_storage()
+    versions = sorted(key for key in storage.list_keys(f"snapshots/{name}") if key.endswith(".json"))
+    for key in versions[:-keep]:
+        storage.delete(key)
+
+_pointer_lock = Lock()
+_pointers = {}  # name -> (read at, pointer info)
+
+def snapshot_info(name):
+    """
+    The current version's pointer: {"version", "key", "published_at", ...}.
+    Falls back to the legacy data/<name> file when nothing was published yet.
+    """
+    with _pointer_lock:
+        cached = _pointers.get(name)
+    if cached and time.monotonic() - cached[0] < POINTER_TTL:
+        return cached[1]
+
+    raw = get_storage().get_bytes(pointer_key(name))
+    if raw is not None:
+        info = json.loads(raw)
+    else:
+        legacy_path = os.path.join(DATA_DIR, name)
+        if not os.path.exists(legacy_path):
+            return None
+        stat = os.stat(legacy_path)
+        info = {"version": f"local-{stat.st_mtime_ns}-{stat.st_size}", "key": None, "path": legacy_path, "published_at": stat.st_mtime}
+    with _pointer_lock:
+        _pointers[name] = (time.monotonic(), info)
+    return info
+
+def snapshot_path(name):
+    """Local path of the current version of snapshot `name`, or None."""
+    info = snapshot_info(name)
+    if info is None:
+        return None
+    return info.get("path") or get_storage().local_path(info["key"])
+
+def snapshot_age(name):
+    """Seconds since the current version was published; None if there is none."""
+    info = snapshot_info(name)
+    return time.time() - info["published_at"] if info else None
+
+
+def lease_key(name):
+    return f"leases/{name}"
+
+def acquire_lease(name, seconds):
+    """
+    Take the fleet-wide lease `name` for `seconds`. Returns a token for
+    release_lease, or None when another node holds an unexpired lease.
+    """
+    storage = get_storage()
+    raw = storage.get_bytes(lease_key(name))
+    if raw is not None and json.loads(raw)["expires_at"] > time.time():
+        return None
+    token = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    storage.put_bytes(lease_key(name), json.dumps({"token": token, "expires_at": time.time() + seconds}).encode("utf-8"))
+    # a node that read the old lease alongside us may have written its own; the one left standing wins
+    time.sleep(LEASE_SETTLE)
+    raw = storage.get_bytes(lease_key(name))
+    return token if raw is not None and json.loads(raw)["token"] == token else None
+
+def release_lease(name, token):
+    storage = get_storage()
+    raw = storage.get_bytes(lease_key(name))
+    if raw is not None and json.loads(raw)["token"] == token:
+        storage.delete(lease_key(name))
@@ -0,0 +1,74 @@
+from concurrent.futures import ThreadPoolExecutor
+from .openai_governor import governor
+from .prompt_budget import split_sentences
+
+TTS_MODEL = "tts-1"
+TTS_VOICE = "echo"
+TTS_CHUNK_CHARS = 1500        # provider limit is 4096 chars per request
+TTS_FIRST_CHUNK_CHARS = 300   # short first chunk so playback can start quickly
+TTS_CONCURRENCY = 4
+
+
+def split_long_sentence(sentence, max_chars):
+    # fallback for run-on text with no sentence punctuation
+    pieces = []
+    current = ""
+    for word in sentence.split():
+        if current and len(current) + 1 + len(word) > max_chars:
+            pieces.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        pieces.append(current)
+    return pieces
+
+def chunk_text(text, max_chars=TTS_CHUNK_CHARS, first_chunk_chars=TTS_FIRST_CHUNK_CHARS):
+    """
+    Group sentences into chunks of at most max_chars. The first chunk is
+    capped at first_chunk_chars so the first audio is ready fast.
+    """
+    chunks = []
+    current = ""
+    for sentence in split_sentences(text):
+        limit = first_chunk_chars if not chunks else max_chars
+        for piece in split_long_sentence(sentence, max_chars) if len(sentence) > max_chars else [sentence]:
+            if current and len(current) + 1 + len(piece) > limit:
+                chunks.append(current)
+                current = piece
+                limit = max_chars
+            else:
+                current = f"{current} {piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+def synthesize_chunk(client, text):
+    response = governor.call(
+        TTS_MODEL,
+        client.audio.speech.create,
+        model=TTS_MODEL,
+        voice=TTS_VOICE,
+        input=text,
+        response_format="mp3",
+    )
+    return response.content
+
+def stream_speech(client, text, concurrency=TTS_CONCURRENCY):
+    """
+    Synthesize text chunk by chunk in parallel and yield MP3 bytes in order.
+    The first chunk is yielded as soon as it is ready, while the rest are
+    still being synthesized. MP3 is frame based, so chunks concatenate into
+    one playable stream.
+    """
+    chunks = chunk_text(text)
+    if not chunks:
+        return
+    executor = ThreadPoolExecutor(max_workers=min(concurrency, len(chunks)))
+    try:
+        futures = [executor.submit(synthesize_chunk, client, chunk) for chunk in chunks]
+        for future in futures:
+            yield future.result()
+    finally:
+        # stop pending chunks if the consumer disconnects or a chunk fails
+        executor.shutdown(wait=False, cancel_futures=True)
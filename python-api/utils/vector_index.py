@@ -0,0 +1,208 @@
+import json
+import os
+from threading import Lock
+import numpy as np
+from .background_index import BackgroundIndex
+from .search_index import DATA_DIR, load_snapshot_articles, snapshot_version, to_search_result
+
+# Semantic retrieval over the crawl snapshots. Embeddings are L2-normalized
+# float32 rows in a memory-mapped .npy matrix, so cosine similarity is a dot
+# product and a batch of queries is one matrix product. Rows are cached by
+# URL and reused across rebuilds, so only new articles are embedded. Search is
+# exact and exhaustive: every row is scored. Large corpora score an int8 copy
+# first (a quarter of the memory traffic) and rescore a shortlist in float32;
+# that is still a full scan, not an approximate nearest-neighbour structure.
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"  # same model BERTopic uses for clustering
+INDEX_DIR = os.path.join(DATA_DIR, 'index')
+EMBEDDINGS_PATH = os.path.join(INDEX_DIR, 'embeddings.npy')
+QUANTIZED_PATH = os.path.join(INDEX_DIR, 'embeddings_int8.npy')
+METADATA_PATH = os.path.join(INDEX_DIR, 'embeddings_meta.json')
+
+EMBED_BATCH_SIZE = 64
+SCORE_BLOCK_ROWS = 65536        # rows scored per block, bounds temporary memory
+QUANTIZE_ABOVE_ROWS = 200000    # scan an int8 copy first for large corpora
+QUANTIZED_CANDIDATES = 4        # int8 pass keeps k * this candidates for exact rescoring
+MIN_TOPIC_SCORE = 0.3
+TOPIC_RESULTS = 3
+
+_model_lock = Lock()
+_model = None
+
+def get_model():
+    global _model
+    with _model_lock:
+        if _model is None:
+            from sentence_transformers import SentenceTransformer
+            _model = SentenceTransformer(EMBEDDING_MODEL)
+        return _model
+
+def embed(texts):
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    vectors = get_model().encode(texts, batch_size=EMBED_BATCH_SIZE, normalize_embeddings=True, show_progress_bar=False)
+    return np.asarray(vectors, dtype=np.float32)
+
+def article_text(article):
+    return f"{article.get('title') or ''}. {(article.get('content') or article.get('description') or '')[:1000]}"
+
+
+class VectorIndex:
+    def __init__(self, matrix, articles, quantized=None):
+        self.matrix = matrix          # (n, d) float32, possibly memory-mapped
+        self.articles = articles
+        self.quantized = quantized    # optional (n, d) int8 copy for coarse scoring
+        self.rows = {article.get("url"): i for i, article in enumerate(articles) if article.get("url")}
+
+    def _exact_top_k(self, queries, k, rows=None):
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        count = matrix.shape[0]
+        k = min(k, count)
+        best_scores = np.full((queries.shape[0], 0), -np.inf, dtype=np.float32)
+        best_ids = np.zeros((queries.shape[0], 0), dtype=np.int64)
+        for start in range(0, count, SCORE_BLOCK_ROWS):
+            block = np.asarray(matrix[start:start + SCORE_BLOCK_ROWS])
+            scores = queries @ block.T
+            ids = np.broadcast_to(np.arange(start, start + block.shape[0]), scores.shape)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_ids = np.concatenate([best_ids, ids], axis=1)
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_ids = np.take_along_axis(best_ids, keep, axis=1)
+        order = np.argsort(-best_scores, axis=1)
+        best_ids = np.take_along_axis(best_ids, order, axis=1)
+        if rows is not None:
+            best_ids = rows[best_ids]
+        return np.take_along_axis(best_scores, order, axis=1), best_ids
+
+    def top_k(self, queries, k=10):
+        """
+        Batched top-k cosine search. queries: (m, d) normalized float32.
+        Returns (scores, ids), each (m, k), best first.
+        """
+        if len(self.articles) == 0:
+            empty = np.zeros((queries.shape[0], 0))
+            return empty, empty.astype(np.int64)
+        if self.quantized is None:
+            return self._exact_top_k(queries, k)
+
+        # full int8 scan for a shortlist, then exact float32 rescoring of it
+        candidates = min(len(self.articles), k * QUANTIZED_CANDIDATES)
+        query_int8 = np.round(queries * 127).astype(np.int32)
+        coarse = np.zeros((queries.shape[0], len(self.articles)), dtype=np.int32)
+        for start in range(0, len(self.articles), SCORE_BLOCK_ROWS):
+            block = np.asarray(self.quantized[start:start + SCORE_BLOCK_ROWS], dtype=np.int32)
+            coarse[:, start:start + block.shape[0]] = query_int8 @ block.T
+        shortlist = np.argpartition(-coarse, candidates - 1, axis=1)[:, :candidates]
+        all_scores, all_ids = [], []
+        for row, query in enumerate(queries):
+            rows = np.sort(shortlist[row])
+            scores, ids = self._exact_top_k(query[None, :], k, rows=rows)
+            all_scores.append(scores[0])
+            all_ids.append(ids[0])
+        return np.vstack(all_scores), np.vstack(all_ids)
+
+
+def build_index(version):
+    """
+    Embed the current snapshots, reusing cached rows for URLs embedded
+    before, and write the matrix + metadata to data/index.
+    """
+    articles = []
+    for _, _, path in version:
+        articles.extend(load_snapshot_articles(path))
+
+    cached = {}
+    if os.path.exists(METADATA_PATH) and os.path.exists(EMBEDDINGS_PATH):
+        with open(METADATA_PATH, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        if previous.get("model") == EMBEDDING_MODEL:
+            old_matrix = np.load(EMBEDDINGS_PATH, mmap_mode="r")
+            cached = {url: old_matrix[i] for i, url in enumerate(previous["urls"])}
+
+    missing = [i for i, article in enumerate(articles) if article.get("url") not in cached]
+    new_vectors = embed([article_text(articles[i]) for i in missing])
+    dimension = new_vectors.shape[1] if len(missing) else next(iter(cached.values())).shape[0] if cached else 0
+    matrix = np.zeros((len(articles), dimension), dtype=np.float32)
+    for i, article in enumerate(articles):
+        if article.get("url") in cached:
+            matrix[i] = cached[article["url"]]
+    if len(missing):
+        matrix[missing] = new_vectors
+    print(f"Vector index: embedded {len(missing)} new articles, reused {len(articles) - len(missing)}")
+
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    # write to temp files and swap in so readers never see a half-written index
+    np.save(EMBEDDINGS_PATH + ".tmp.npy", matrix)
+    os.replace(EMBEDDINGS_PATH + ".tmp.npy", EMBEDDINGS_PATH)
+    if len(articles) > QUANTIZE_ABOVE_ROWS:
+        np.save(QUANTIZED_PATH + ".tmp.npy", np.round(matrix * 127).astype(np.int8))
+        os.replace(QUANTIZED_PATH + ".tmp.npy", QUANTIZED_PATH)
+    with open(METADATA_PATH + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump({"model": EMBEDDING_MODEL, "version": version, "urls": [article.get("url") for article in articles]}, f)
+    os.replace(METADATA_PATH + ".tmp", METADATA_PATH)
+    return articles
+
+
+def load_index(version):
+    version = [list(entry) for entry in version]
+    articles = build_index(version)
+    # loaded here even when every row was cached, so queries never load the model themselves
+    get_model()
+    matrix = np.load(EMBEDDINGS_PATH, mmap_mode="r")
+    quantized = np.load(QUANTIZED_PATH, mmap_mode="r") if len(articles) > QUANTIZE_ABOVE_ROWS else None
+    return VectorIndex(matrix, articles, quantized)
+
+# embedding a new snapshot takes minutes on CPU, so it happens off the request path
+vector_index = BackgroundIndex("vector index", snapshot_version, load_index)
+
+def get_vector_index():
+    return vector_index.get()
+
+def search_topics(topics, k=30, min_score=MIN_TOPIC_SCORE):
+    """
+    Look up every tracked topic with one batched embedding + matrix product.
+    Returns {topic: [search results]} ordered by similarity, or {} while
+    there is no index yet.
+    """
+    index = get_vector_index()
+    if not topics or index is None:
+        # no index until the first background build finishes; callers fall back to NewsAPI
+        return {}
+    scores, ids = index.top_k(embed(list(topics)), k)
+    results = {}
+    for row, topic in enumerate(topics):
+        results[topic] = [
+            to_search_result(index.articles[doc_id], float(score))
+            for score, doc_id in zip(scores[row], ids[row])
+            if score >= min_score
+        ]
+    return results
+
+def rerank(query, results):
+    """
+    Order search results by cosine similarity of their title/description to
+    the query. Best effort: results keep their order while the vector index
+    (and with it the model) is still loading, or if embedding fails.
+    """
+    index = get_vector_index()
+    if len(results) < 2 or index is None:
+        return results
+    try:
+        query_vector = embed([query])[0]
+        # local results reuse their indexed rows; only NewsAPI results are embedded here
+        missing = [i for i, result in enumerate(results) if result.get("url") not in index.rows]
+        result_vectors = np.zeros((len(results), query_vector.shape[0]), dtype=np.float32)
+        for i, result in enumerate(results):
+            if result.get("url") in index.rows:
+                result_vectors[i] = index.matrix[index.rows[result["url"]]]
+        if missing:
+            result_vectors[missing] = embed([article_text(results[i]) for i in missing])
+    except Exception as e:
+        print(f"Reranking skipped: {e}")
+        return results
+    similarity = result_vectors @ query_vector
+    for result, score in zip(results, similarity):
+        result["semanticScore"] = float(score)
+    return [results[i] for i in np.argsort(-similarity, kind="stable")]